@@ -0,0 +1,559 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import httpx
+
+from metrics import registry as metrics
+from scheduler import (DEFAULT_RATE_LIMIT_PAUSE, MAX_RATE_LIMIT_RETRIES, MAX_TRANSIENT_RETRIES, AimdLimit,
+                       RateBudget, backoff_seconds, is_rate_limit_error, is_transient_error, is_unsent_error,
+                       provider_limits, retry_after_seconds)
+
+DEFAULT_MAX_IN_FLIGHT = 32
+DEFAULT_TIMEOUT = 300
+DEFAULT_ESTIMATED_TOKENS = 2000
+QUEUE_DEPTH_PER_WORKER = 2
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com"
+# Vida de los cachedContents de Gemini; se renuevan antes de vencer y se borran al cerrar
+GEMINI_CACHE_TTL = 900
+GEMINI_CACHE_RENEW_MARGIN = 60
+GEMINI_CACHE_MISSING_STATUS = (400, 403, 404)
+GEMINI_CACHE_MISSING_REASONS = ("not found", "expired", "does not exist")
+
+_DONE = object()
+
+
+class ProviderError(Exception):
+    # Error HTTP de un proveedor llamado sin SDK; expone status_code y response como los SDKs
+    def __init__(self, status_code, message, response=None):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.response = response
+
+
+class Completion:
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage = usage
+
+    def __repr__(self):
+        return f"Completion(usage={self.usage})"
+
+
+async def aiter_sync(iterable):
+    # Consume un iterable bloqueante (p. ej. el stream de ingesta) sin frenar el event loop
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    while True:
+        item = await loop.run_in_executor(None, next, iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
+
+
+def _gemini_parts(payload):
+    candidates = payload.get("candidates") or [{}]
+    return candidates[0].get("content", {}).get("parts", [])
+
+
+def _gemini_cache_missing(response):
+    # Gemini responde 404 NOT_FOUND, o 400/403 con un mensaje que nombra al cachedContent,
+    # cuando el caché ya no existe o venció
+    if response.status_code not in GEMINI_CACHE_MISSING_STATUS:
+        return False
+    try:
+        error = response.json().get("error") or {}
+    except ValueError:
+        return False
+    message = str(error.get("message", "")).lower()
+    return "cache" in message and any(reason in message for reason in GEMINI_CACHE_MISSING_REASONS)
+
+
+def _prefix_hash(prefix):
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+
+# Cuerpos de request por proveedor: los usa el motor y también el modo batch (batch_jobs.py),
+# que manda exactamente el mismo request en una línea del JSONL del proveedor
+
+def openai_request(model, parts, max_tokens=None, temperature=None, cache_prefix=False):
+    content = []
+    for part in parts:
+        if isinstance(part, str):
+            content.append({"type": "text", "text": part})
+        else:
+            data = part["inline_data"]
+            content.append({"type": "image_url",
+                            "image_url": {"url": f"data:{data['mime_type']};base64,{data['data']}"}})
+    if len(content) == 1 and content[0]["type"] == "text":
+        content = content[0]["text"]
+
+    request = {"model": model, "messages": [{"role": "user", "content": content}]}
+    if max_tokens is not None:
+        request["max_completion_tokens"] = max_tokens
+    if temperature is not None:
+        request["temperature"] = temperature
+    if cache_prefix:
+        # El caché de OpenAI es automático sobre el prefijo; la clave agrupa los requests
+        # con el mismo prefijo en el mismo servidor
+        request["prompt_cache_key"] = _prefix_hash(parts[0])[:32]
+    return request
+
+
+def anthropic_request(model, parts, max_tokens=None, temperature=None, cache_prefix=False):
+    content = []
+    for i, part in enumerate(parts):
+        if isinstance(part, str):
+            content.append({"type": "text", "text": part})
+            if cache_prefix and i == 0:
+                content[-1]["cache_control"] = {"type": "ephemeral"}
+        else:
+            data = part["inline_data"]
+            content.append({"type": "image", "source": {
+                "type": "base64", "media_type": data["mime_type"], "data": data["data"]}})
+
+    request = {"model": model, "max_tokens": max_tokens or 4096, "messages": [{"role": "user", "content": content}]}
+    if temperature is not None:
+        request["temperature"] = temperature
+    return request
+
+
+def gemini_request(parts, max_tokens=None, temperature=None, response_schema=None):
+    generation_config = {}
+    if max_tokens is not None:
+        generation_config["max_output_tokens"] = max_tokens
+    if temperature is not None:
+        generation_config["temperature"] = temperature
+    if response_schema is not None:
+        generation_config["response_mime_type"] = "application/json"
+        generation_config["response_schema"] = response_schema
+    return {
+        "contents": [{"role": "user", "parts": [{"text": part} if isinstance(part, str) else part for part in parts]}],
+        "generation_config": generation_config,
+    }
+
+
+class AsyncEngine:
+    """Motor asyncio para OpenAI, Anthropic y Gemini.
+
+    Todas las llamadas comparten un pool de conexiones HTTP y pasan por el
+    mismo control de flujo: presupuesto de requests/tokens por minuto y un
+    límite de requests en vuelo que se adapta (AIMD) ante 429s y latencia.
+    ``base_url`` (o ``<PROVEEDOR>_BASE_URL``) permite apuntarlo a un servidor
+    mock local.
+
+    Con ``cache_prefix=True`` la primera parte del prompt se trata como un
+    prefijo estable y se cachea del lado del proveedor: ``cachedContents`` en
+    Gemini, ``cache_control`` en Anthropic y prefijo + ``prompt_cache_key``
+    en OpenAI (que cachea automáticamente).
+    """
+
+    def __init__(self, provider, model, max_in_flight=DEFAULT_MAX_IN_FLIGHT, base_url=None,
+                 api_key=None, timeout=DEFAULT_TIMEOUT, rpm=None, tpm=None, initial_concurrency=None):
+        limits = provider_limits(provider)
+        self.provider = provider
+        self.model = model
+        self.max_in_flight = max_in_flight
+        self.base_url = base_url or os.getenv(f"{provider.upper()}_BASE_URL")
+        self.api_key = api_key or os.getenv(f"{provider.upper()}_API_KEY")
+        self.timeout = timeout
+        self.budget = RateBudget(rpm or limits["rpm"], tpm or limits["tpm"])
+        self.concurrency = AimdLimit(initial_concurrency or max(1, max_in_flight // 2), maximum=max_in_flight)
+
+        self.completed = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.cache_requests = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+        self._client = None
+        self._in_flight = 0
+        self._gate = None
+        self._tasks = []
+        # Gemini: hash del prefijo -> (nombre del cachedContent, vencimiento) o None si no se puede cachear
+        self._gemini_caches = {}
+        self._gemini_cache_lock = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        self._gate = asyncio.Condition()
+        self._gemini_cache_lock = asyncio.Lock()
+        # Un único cliente por motor: todas las corrutinas comparten su pool de conexiones
+        if self.provider == "openai":
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                       timeout=self.timeout, max_retries=0)
+        elif self.provider == "anthropic":
+            from anthropic import AsyncAnthropic
+            self._client = AsyncAnthropic(api_key=self.api_key, base_url=self.base_url,
+                                          timeout=self.timeout, max_retries=0)
+        elif self.provider == "gemini":
+            # google.generativeai solo ofrece async sobre gRPC; la API REST va por un pool httpx
+            self.base_url = (self.base_url or GEMINI_BASE_URL).rstrip("/")
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_in_flight,
+                                    max_keepalive_connections=self.max_in_flight),
+            )
+        else:
+            raise ValueError(f"Proveedor no soportado: {self.provider}")
+
+    async def close(self):
+        if self._client is not None:
+            if self.provider == "gemini":
+                await self._delete_gemini_caches()
+                await self._client.aclose()
+            else:
+                await self._client.close()
+            self._client = None
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
+    async def _acquire(self, estimated_tokens):
+        # Espera por concurrencia y cuota propia, no del proveedor
+        start = time.perf_counter()
+        async with self._gate:
+            await self._gate.wait_for(lambda: self._in_flight < self.concurrency.slots)
+            self._in_flight += 1
+            metrics.set_gauge("cv_api_in_flight", self._in_flight, provider=self.provider)
+        try:
+            while True:
+                wait = self.budget.reserve(estimated_tokens)
+                if wait <= 0:
+                    metrics.observe("cv_stage_seconds", time.perf_counter() - start, stage="throttle")
+                    return
+                await asyncio.sleep(min(wait, 1.0))
+        except BaseException:
+            await self._release()
+            raise
+
+    async def _release(self):
+        async with self._gate:
+            self._in_flight -= 1
+            metrics.set_gauge("cv_api_in_flight", self._in_flight, provider=self.provider)
+            self._gate.notify_all()
+
+    async def generate(self, parts, max_tokens=None, temperature=None, response_schema=None,
+                       estimated_tokens=DEFAULT_ESTIMATED_TOKENS, cache_prefix=False, on_text=None):
+        """Envía ``parts`` (strings o dicts ``inline_data`` como los de Gemini) y devuelve un Completion.
+
+        Con ``cache_prefix`` la primera parte (un string) es el prefijo que se
+        repite entre requests. Con ``on_text`` la respuesta llega en streaming y
+        cada fragmento de texto se pasa al callback apenas se recibe.
+
+        Los 429 y los errores transitorios (5xx, timeouts, conexiones cortadas)
+        se reintentan aquí mismo con backoff exponencial con jitter, respetando
+        Retry-After. Un stream que ya entregó texto no se reintenta: el callback
+        lo vería dos veces. Cualquier otro error se propaga al llamador.
+        """
+        attempt = 0
+        while True:
+            streamed = False
+
+            def forward(delta):
+                nonlocal streamed
+                streamed = True
+                on_text(delta)
+
+            await self._acquire(estimated_tokens)
+            start = time.monotonic()
+            retry_in = None
+            # Tokens a descontar de la reserva: None la deja como está (el request llegó al
+            # proveedor pero no informó uso), 0 la devuelve entera
+            actual_tokens = None
+            try:
+                completion = await self._call(parts, max_tokens, temperature, response_schema, cache_prefix,
+                                              forward if on_text is not None else None)
+                actual_tokens = completion.usage.get("total_tokens")
+            except Exception as e:
+                if is_unsent_error(e):
+                    # El request no salió (conexión rechazada o que no llegó a abrirse): no
+                    # consumió cuota. Un timeout o un corte a mitad de respuesta conservan la reserva
+                    actual_tokens = 0
+                rate_limited = is_rate_limit_error(e)
+                self._record_request(start, "rate_limited" if rate_limited else "error")
+                retries = MAX_RATE_LIMIT_RETRIES if rate_limited else MAX_TRANSIENT_RETRIES
+                if streamed or attempt >= retries or not (rate_limited or is_transient_error(e)):
+                    raise
+                attempt += 1
+                metrics.inc("cv_api_retries_total", provider=self.provider,
+                            reason="rate_limit" if rate_limited else "transient")
+                if rate_limited:
+                    pause = backoff_seconds(attempt, retry_after_seconds(e), base=DEFAULT_RATE_LIMIT_PAUSE)
+                    # La pausa frena a todas las corrutinas del motor, no solo a esta
+                    self.budget.pause(pause)
+                    self.rate_limited += 1
+                    self.concurrency.on_overload()
+                    metrics.set_gauge("cv_api_concurrency", self.concurrency.slots, provider=self.provider)
+                    print(f"🚦 Rate limit de {self.provider}, reintentando en {pause:.0f}s "
+                          f"(concurrencia {self.concurrency.slots})")
+                    continue
+                retry_in = backoff_seconds(attempt, retry_after_seconds(e))
+                print(f"🔁 Error transitorio de {self.provider} ({e}); reintento {attempt}/{retries} "
+                      f"en {retry_in:.1f}s")
+            finally:
+                # La reserva se ajusta siempre, también si el request falla o la tarea se cancela;
+                # si no, cada error dejaría tokens tomados hasta que el bucket se recargue
+                self.budget.settle(estimated_tokens, actual_tokens)
+                # También se libera el slot si la tarea se cancela a mitad de la llamada
+                await self._release()
+
+            if retry_in is not None:
+                # Se espera sin ocupar un slot de concurrencia
+                await asyncio.sleep(retry_in)
+                continue
+
+            self.concurrency.on_success(time.monotonic() - start)
+            self._record_cache_usage(cache_prefix, completion.usage)
+            self._record_request(start, "ok", completion.usage)
+            return completion
+
+    def _record_request(self, start, outcome, usage=None):
+        metrics.observe("cv_api_request_seconds", time.monotonic() - start, provider=self.provider, model=self.model)
+        metrics.inc("cv_api_requests_total", provider=self.provider, outcome=outcome)
+        metrics.set_gauge("cv_api_concurrency", self.concurrency.slots, provider=self.provider)
+        for kind in ("prompt", "cached", "response"):
+            if usage and usage.get(f"{kind}_tokens"):
+                metrics.inc("cv_tokens_total", usage[f"{kind}_tokens"], provider=self.provider, kind=kind)
+
+    def _record_cache_usage(self, cache_prefix, usage):
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        if not cache_prefix:
+            return
+        self.cache_requests += 1
+        if usage.get("cached_tokens"):
+            self.cache_hits += 1
+            self.cached_tokens += usage["cached_tokens"]
+
+    async def _call(self, parts, max_tokens, temperature, response_schema, cache_prefix, on_text):
+        if self.provider == "openai":
+            return await self._call_openai(parts, max_tokens, temperature, cache_prefix, on_text)
+        if self.provider == "anthropic":
+            return await self._call_anthropic(parts, max_tokens, temperature, cache_prefix, on_text)
+        return await self._call_gemini(parts, max_tokens, temperature, response_schema, cache_prefix, on_text)
+
+    async def _call_openai(self, parts, max_tokens, temperature, cache_prefix, on_text):
+        kwargs = {}
+        if on_text is not None:
+            kwargs["stream"] = True
+            kwargs["stream_options"] = {"include_usage": True}
+        response = await self._client.chat.completions.create(
+            **openai_request(self.model, parts, max_tokens, temperature, cache_prefix),
+            **kwargs
+        )
+
+        if on_text is None:
+            text = response.choices[0].message.content
+            usage = response.usage
+        else:
+            chunks = []
+            usage = None
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunks.append(chunk.choices[0].delta.content)
+                    on_text(chunk.choices[0].delta.content)
+                # El último chunk trae el uso y ninguna choice
+                usage = chunk.usage or usage
+            text = "".join(chunks)
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        return Completion(text, {
+            "prompt_tokens": usage.prompt_tokens if usage else 0,
+            "cached_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+            "response_tokens": usage.completion_tokens if usage else 0,
+            "total_tokens": usage.total_tokens if usage else 0,
+        })
+
+    async def _call_anthropic(self, parts, max_tokens, temperature, cache_prefix, on_text):
+        kwargs = {}
+        if on_text is not None:
+            kwargs["stream"] = True
+        response = await self._client.messages.create(
+            **anthropic_request(self.model, parts, max_tokens, temperature, cache_prefix),
+            **kwargs
+        )
+
+        if on_text is None:
+            text = "".join(block.text for block in response.content if block.type == "text")
+            usage = response.usage
+            output_tokens = usage.output_tokens
+        else:
+            chunks = []
+            usage = None
+            output_tokens = 0
+            async for event in response:
+                if event.type == "message_start":
+                    usage = event.message.usage
+                elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                    chunks.append(event.delta.text)
+                    on_text(event.delta.text)
+                elif event.type == "message_delta":
+                    output_tokens = event.usage.output_tokens
+            text = "".join(chunks)
+
+        # input_tokens excluye lo leído y lo escrito en caché; prompt_tokens es el total del prompt
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        prompt_tokens = (usage.input_tokens if usage else 0) + cache_read + cache_write
+        return Completion(text, {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cache_read,
+            "response_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+        })
+
+    async def _gemini_cache(self, prefix):
+        # Un cachedContent por prefijo, creado una sola vez aunque haya muchas corrutinas en vuelo
+        key = _prefix_hash(prefix)
+        async with self._gemini_cache_lock:
+            entry = self._gemini_caches.get(key, ())
+            if entry is None:
+                return None
+            if entry and entry[1] - GEMINI_CACHE_RENEW_MARGIN > time.monotonic():
+                return entry[0]
+
+            response = await self._client.post(
+                f"{self.base_url}/v1beta/cachedContents",
+                json={
+                    "model": f"models/{self.model}",
+                    "contents": [{"role": "user", "parts": [{"text": prefix}]}],
+                    "ttl": f"{GEMINI_CACHE_TTL}s",
+                },
+                headers={"x-goog-api-key": self.api_key or ""},
+            )
+            if response.status_code != 200:
+                # Típicamente un prefijo por debajo del mínimo cacheable: se manda completo
+                print(f"⚠️ Gemini no cacheó el prefijo ({response.status_code}); se envía completo")
+                self._gemini_caches[key] = None
+                return None
+            name = response.json()["name"]
+            self._gemini_caches[key] = (name, time.monotonic() + GEMINI_CACHE_TTL)
+            return name
+
+    async def _delete_gemini_caches(self):
+        for entry in self._gemini_caches.values():
+            if entry is None:
+                continue
+            try:
+                await self._client.delete(f"{self.base_url}/v1beta/{entry[0]}",
+                                          headers={"x-goog-api-key": self.api_key or ""})
+            except httpx.HTTPError:
+                pass
+        self._gemini_caches = {}
+
+    async def _call_gemini(self, parts, max_tokens, temperature, response_schema, cache_prefix, on_text):
+        cached_content = await self._gemini_cache(parts[0]) if cache_prefix else None
+        body = gemini_request(parts[1:] if cached_content else parts, max_tokens, temperature, response_schema)
+        if cached_content:
+            body["cachedContent"] = cached_content
+
+        method = "streamGenerateContent?alt=sse" if on_text is not None else "generateContent"
+        request = self._client.build_request(
+            "POST",
+            f"{self.base_url}/v1beta/models/{self.model}:{method}",
+            json=body,
+            headers={"x-goog-api-key": self.api_key or ""},
+        )
+        response = await self._client.send(request, stream=True)
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                if cached_content and _gemini_cache_missing(response):
+                    # El cachedContent venció o se borró: se descarta y se reintenta con el prompt completo.
+                    # Cualquier otro 4xx (request inválido, permisos) se propaga y el caché se conserva
+                    self._gemini_caches.pop(_prefix_hash(parts[0]), None)
+                    return await self._call_gemini(parts, max_tokens, temperature, response_schema, False, on_text)
+                raise ProviderError(response.status_code, response.text, response)
+
+            if on_text is None:
+                await response.aread()
+                payloads = [response.json()]
+            else:
+                # Server-sent events: cada "data:" es un GenerateContentResponse parcial
+                payloads = []
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = json.loads(line[5:])
+                    payloads.append(payload)
+                    for part in _gemini_parts(payload):
+                        if part.get("text"):
+                            on_text(part["text"])
+        finally:
+            await response.aclose()
+
+        # El último fragmento trae el uso acumulado
+        usage = next((p["usageMetadata"] for p in reversed(payloads) if "usageMetadata" in p), {})
+        return Completion("".join(part.get("text", "") for p in payloads for part in _gemini_parts(p)), {
+            "prompt_tokens": usage.get("promptTokenCount", 0),
+            "cached_tokens": usage.get("cachedContentTokenCount", 0),
+            "response_tokens": usage.get("candidatesTokenCount", 0),
+            "total_tokens": usage.get("totalTokenCount", 0),
+        })
+
+    async def run(self, handler, items):
+        """Ejecuta ``await handler(item)`` para cada item con ``max_in_flight`` corrutinas.
+
+        ``items`` puede ser un iterable bloqueante: se consume desde un thread
+        con una cola acotada, así la ingesta no se adelanta sin límite.
+        """
+        work = asyncio.Queue(maxsize=self.max_in_flight * QUEUE_DEPTH_PER_WORKER)
+
+        async def produce():
+            async for item in aiter_sync(items):
+                start = time.perf_counter()
+                await work.put((item, start))
+                # Tiempo con la cola llena: la red no da abasto y la ingesta deja de adelantarse
+                metrics.observe("cv_stage_seconds", time.perf_counter() - start, stage="backpressure")
+            for _ in range(self.max_in_flight):
+                await work.put((_DONE, None))
+
+        async def consume():
+            while True:
+                item, queued = await work.get()
+                if item is _DONE:
+                    return
+                # Tiempo en la cola: alto si los workers (la API) no dan abasto
+                metrics.observe("cv_stage_seconds", time.perf_counter() - queued, stage="queue")
+                try:
+                    await handler(item)
+                    self.completed += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    print(f"❌ Error en el motor async: {e}")
+
+        self._tasks = [asyncio.create_task(produce())]
+        self._tasks += [asyncio.create_task(consume()) for _ in range(self.max_in_flight)]
+        try:
+            await asyncio.gather(*self._tasks)
+        except BaseException:
+            self.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            raise
+        finally:
+            self._tasks = []
+
+        print(f"📈 {self.provider}: {self.completed} OK, {self.failed} con error, "
+              f"{self.rate_limited} rate limits, concurrencia final {self.concurrency.slots}")
+        if self.cache_requests:
+            print(f"🗄️ Caché de prompt: {self.cache_hits}/{self.cache_requests} requests con hit, "
+                  f"{self.cache_hit_rate:.0%} de los tokens de entrada desde caché")
+
+    @property
+    def cache_hit_rate(self):
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
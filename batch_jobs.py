@@ -0,0 +1,538 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+
+import httpx
+
+from async_engine import (DEFAULT_TIMEOUT, GEMINI_BASE_URL, Completion, ProviderError, aiter_sync, anthropic_request,
+                          gemini_request, openai_request)
+from metrics import registry as metrics
+from result_sink import JsonlSink, read_jsonl
+from scheduler import MAX_TRANSIENT_RETRIES, backoff_seconds, is_rate_limit_error, is_transient_error, retry_after_seconds
+
+# Primera consulta del estado de un job y tope entre consultas: la espera crece mientras no termine
+BATCH_POLL_INTERVAL = 30
+BATCH_MAX_POLL_INTERVAL = 600
+BATCH_POLL_GROWTH = 1.5
+# Límites por job, por debajo de los de los proveedores (OpenAI: 50k requests y 200 MB por archivo)
+MAX_REQUESTS_PER_JOB = 10_000
+MAX_JOB_BYTES = 100 * 1024 * 1024
+
+# Stand-in local: jobs en archivos, ejecutados contra el endpoint en tiempo real (o el mock)
+LOCAL_BATCH_DIR = "batch_jobs"
+LOCAL_POLL_INTERVAL = 1
+LOCAL_CONCURRENCY = 8
+
+REALTIME_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "anthropic": "https://api.anthropic.com",
+    "gemini": GEMINI_BASE_URL,
+}
+ANTHROPIC_VERSION = "2023-06-01"
+GEMINI_ENDED_STATES = {"BATCH_STATE_SUCCEEDED", "BATCH_STATE_FAILED", "BATCH_STATE_CANCELLED",
+                       "BATCH_STATE_EXPIRED", "JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED"}
+
+RUNNING = "running"
+ENDED = "ended"
+SUBMITTED = "submitted"
+COLLECTED = "collected"
+
+
+def request_line(provider, model, custom_id, parts, max_tokens=None, temperature=None, response_schema=None,
+                 cache_prefix=False):
+    """Una línea del JSONL de entrada en el formato de batch de ``provider``,
+    con el mismo cuerpo que mandaría el motor en tiempo real."""
+    if provider == "openai":
+        return {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions",
+                "body": openai_request(model, parts, max_tokens, temperature, cache_prefix)}
+    if provider == "anthropic":
+        return {"custom_id": custom_id,
+                "params": anthropic_request(model, parts, max_tokens, temperature, cache_prefix)}
+    # Sin cachedContent: el descuento de batch ya aplica sobre el prompt entero
+    return {"key": custom_id, "request": gemini_request(parts, max_tokens, temperature, response_schema)}
+
+
+def _error_message(error):
+    # Los proveedores anidan el error ({"error": {"error": {"message": ...}}}): se busca el mensaje
+    while isinstance(error, dict) and "message" not in error and isinstance(error.get("error"), dict):
+        error = error["error"]
+    if isinstance(error, dict):
+        return str(error.get("message") or json.dumps(error, ensure_ascii=False))
+    return str(error or "sin resultado")
+
+
+def _openai_completion(body):
+    usage = body.get("usage") or {}
+    details = usage.get("prompt_tokens_details") or {}
+    return Completion(body["choices"][0]["message"].get("content") or "", {
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "cached_tokens": details.get("cached_tokens") or 0,
+        "response_tokens": usage.get("completion_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+    })
+
+
+def _anthropic_completion(message):
+    usage = message.get("usage") or {}
+    cache_read = usage.get("cache_read_input_tokens") or 0
+    cache_write = usage.get("cache_creation_input_tokens") or 0
+    prompt_tokens = (usage.get("input_tokens") or 0) + cache_read + cache_write
+    output_tokens = usage.get("output_tokens") or 0
+    text = "".join(block.get("text", "") for block in message.get("content", []) if block.get("type") == "text")
+    return Completion(text, {
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cache_read,
+        "response_tokens": output_tokens,
+        "total_tokens": prompt_tokens + output_tokens,
+    })
+
+
+def _gemini_completion(response):
+    usage = response.get("usageMetadata", {})
+    candidates = response.get("candidates") or [{}]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return Completion("".join(part.get("text", "") for part in parts), {
+        "prompt_tokens": usage.get("promptTokenCount", 0),
+        "cached_tokens": usage.get("cachedContentTokenCount", 0),
+        "response_tokens": usage.get("candidatesTokenCount", 0),
+        "total_tokens": usage.get("totalTokenCount", 0),
+    })
+
+
+def parse_result_line(provider, record):
+    """``(custom_id, Completion o None, error o None)`` de una línea de resultados."""
+    if provider == "openai":
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            return record["custom_id"], None, _error_message(record.get("error") or response.get("body"))
+        return record["custom_id"], _openai_completion(response["body"]), None
+    if provider == "anthropic":
+        result = record.get("result") or {}
+        if result.get("type") != "succeeded":
+            return record["custom_id"], None, _error_message(result.get("error") or result.get("type"))
+        return record["custom_id"], _anthropic_completion(result["message"]), None
+    if "response" not in record:
+        return record.get("key"), None, _error_message(record.get("error"))
+    return record.get("key"), _gemini_completion(record["response"]), None
+
+
+async def _requests_body(input_path):
+    # {"requests": [...]} de a una línea: cada línea del JSONL de entrada ya es un request serializado,
+    # así que se copia tal cual sin parsearla ni tener el archivo entero (con sus imágenes) en memoria
+    yield b'{"requests": ['
+    with open(input_path, "rb") as f:
+        for i, line in enumerate(line for line in f if line.strip()):
+            yield (b"," if i else b"") + line.rstrip()
+    yield b"]}"
+
+
+class OpenAIBatchService:
+    """Batch API de OpenAI: se sube el JSONL, se crea el batch sobre
+    /v1/chat/completions y los resultados llegan en un archivo de salida (y
+    otro de errores)."""
+
+    name = "openai"
+    poll_interval = BATCH_POLL_INTERVAL
+
+    def __init__(self, model, api_key=None, base_url=None):
+        from openai import AsyncOpenAI
+        self.provider = "openai"
+        self.model = model
+        # Sin reintentos del SDK: BatchJobs reintenta con el mismo backoff que el motor
+        self._client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"),
+                                   base_url=base_url or os.getenv("OPENAI_BASE_URL"), max_retries=0)
+
+    async def submit(self, input_path):
+        with open(input_path, "rb") as f:
+            uploaded = await self._client.files.create(file=(os.path.basename(input_path), f), purpose="batch")
+        job = await self._client.batches.create(input_file_id=uploaded.id, endpoint="/v1/chat/completions",
+                                                completion_window="24h")
+        return job.id
+
+    async def poll(self, job_id):
+        job = await self._client.batches.retrieve(job_id)
+        ended = job.status in ("completed", "failed", "expired", "cancelled")
+        return ENDED if ended else RUNNING, job.status
+
+    async def results(self, job_id):
+        job = await self._client.batches.retrieve(job_id)
+        # Un batch vencido o cancelado igual trae en la salida los requests que llegó a completar
+        for file_id in (job.output_file_id, job.error_file_id):
+            if not file_id:
+                continue
+            async with self._client.files.with_streaming_response.content(file_id) as response:
+                async for line in response.iter_lines():
+                    if line.strip():
+                        yield parse_result_line(self.provider, json.loads(line))
+
+    async def close(self):
+        await self._client.close()
+
+
+class AnthropicBatchService:
+    """Message Batches de Anthropic: los requests van en el cuerpo del POST y
+    los resultados se leen como JSONL, uno por ``custom_id``."""
+
+    name = "anthropic"
+    poll_interval = BATCH_POLL_INTERVAL
+
+    def __init__(self, model, api_key=None, base_url=None):
+        from anthropic import AsyncAnthropic
+        self.provider = "anthropic"
+        self.model = model
+        self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY") or ""
+        self.base_url = (base_url or os.getenv("ANTHROPIC_BASE_URL") or REALTIME_BASE_URLS["anthropic"]).rstrip("/")
+        self._client = AsyncAnthropic(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        # El SDK arma el cuerpo entero en memoria; el envío va por httpx con el cuerpo en streaming
+        self._http = httpx.AsyncClient(timeout=DEFAULT_TIMEOUT)
+
+    async def submit(self, input_path):
+        response = await self._http.post(f"{self.base_url}/v1/messages/batches", content=_requests_body(input_path),
+                                         headers={"x-api-key": self.api_key, "anthropic-version": ANTHROPIC_VERSION,
+                                                  "content-type": "application/json"})
+        if response.status_code != 200:
+            raise ProviderError(response.status_code, response.text, response)
+        return response.json()["id"]
+
+    async def poll(self, job_id):
+        job = await self._client.messages.batches.retrieve(job_id)
+        return ENDED if job.processing_status == "ended" else RUNNING, job.processing_status
+
+    async def results(self, job_id):
+        async for entry in await self._client.messages.batches.results(job_id):
+            yield parse_result_line(self.provider, entry.model_dump())
+
+    async def close(self):
+        await self._client.close()
+        await self._http.aclose()
+
+
+class GeminiBatchService:
+    """Batch mode de Gemini por REST: el JSONL se sube con la API de archivos,
+    ``batchGenerateContent`` crea el job y la salida es otro archivo JSONL."""
+
+    name = "gemini"
+    poll_interval = BATCH_POLL_INTERVAL
+
+    def __init__(self, model, api_key=None, base_url=None):
+        self.provider = "gemini"
+        self.model = model
+        self.base_url = (base_url or os.getenv("GEMINI_BASE_URL") or GEMINI_BASE_URL).rstrip("/")
+        self._headers = {"x-goog-api-key": api_key or os.getenv("GEMINI_API_KEY") or ""}
+        self._client = httpx.AsyncClient(timeout=DEFAULT_TIMEOUT)
+
+    async def _request(self, method, url, headers=None, **kwargs):
+        response = await self._client.request(method, url, headers=dict(self._headers, **(headers or {})), **kwargs)
+        if response.status_code != 200:
+            raise ProviderError(response.status_code, response.text, response)
+        return response
+
+    async def submit(self, input_path):
+        with open(input_path, "rb") as f:
+            data = f.read()
+        # Subida resumable: se pide la URL de subida y se manda el archivo entero en un paso
+        start = await self._request("POST", f"{self.base_url}/upload/v1beta/files", headers={
+            "X-Goog-Upload-Protocol": "resumable",
+            "X-Goog-Upload-Command": "start",
+            "X-Goog-Upload-Header-Content-Length": str(len(data)),
+            "X-Goog-Upload-Header-Content-Type": "application/jsonl",
+        }, json={"file": {"display_name": os.path.basename(input_path)}})
+        upload = await self._request("POST", start.headers["x-goog-upload-url"], headers={
+            "X-Goog-Upload-Command": "upload, finalize",
+            "X-Goog-Upload-Offset": "0",
+        }, content=data)
+        job = await self._request("POST", f"{self.base_url}/v1beta/models/{self.model}:batchGenerateContent", json={
+            "batch": {"display_name": os.path.basename(input_path),
+                      "input_config": {"file_name": upload.json()["file"]["name"]}},
+        })
+        return job.json()["name"]
+
+    async def _job(self, job_id):
+        return (await self._request("GET", f"{self.base_url}/v1beta/{job_id}")).json()
+
+    async def poll(self, job_id):
+        job = await self._job(job_id)
+        state = (job.get("metadata") or {}).get("state") or job.get("state", "")
+        return ENDED if job.get("done") or state in GEMINI_ENDED_STATES else RUNNING, state
+
+    async def results(self, job_id):
+        job = await self._job(job_id)
+        output = job.get("response") or (job.get("metadata") or {}).get("output") or {}
+        file_name = output.get("responsesFile")
+        if not file_name:
+            return
+        async with self._client.stream("GET", f"{self.base_url}/download/v1beta/{file_name}:download",
+                                       params={"alt": "media"}, headers=self._headers) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise ProviderError(response.status_code, response.text, response)
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield parse_result_line(self.provider, json.loads(line))
+
+    async def close(self):
+        await self._client.aclose()
+
+
+class LocalBatchService:
+    """Stand-in del servicio de batch en archivos locales, para probar el modo
+    batch de punta a punta sin la API de batch.
+
+    Cada job es un directorio con el JSONL de entrada (en el formato del
+    proveedor) y un ``job.json`` con su estado. La primera consulta ejecuta
+    sus requests contra el endpoint en tiempo real del proveedor, o contra
+    ``mock_provider.py`` con ``<PROVEEDOR>_BASE_URL``, y deja la salida en el
+    formato de resultados del proveedor. Si se corta a mitad, la próxima
+    consulta lo vuelve a ejecutar.
+    """
+
+    name = "local"
+    poll_interval = LOCAL_POLL_INTERVAL
+
+    def __init__(self, provider, model, directory=LOCAL_BATCH_DIR, api_key=None, base_url=None,
+                 concurrency=LOCAL_CONCURRENCY):
+        self.provider = provider
+        self.model = model
+        self.directory = directory
+        self.concurrency = concurrency
+        self.api_key = api_key or os.getenv(f"{provider.upper()}_API_KEY") or ""
+        self.base_url = (base_url or os.getenv(f"{provider.upper()}_BASE_URL") or REALTIME_BASE_URLS[provider]).rstrip("/")
+        self._client = httpx.AsyncClient(timeout=DEFAULT_TIMEOUT)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id, name):
+        return os.path.join(self.directory, job_id, name)
+
+    def _state(self, job_id):
+        with open(self._path(job_id, "job.json"), "r", encoding="utf-8") as f:
+            return json.load(f)["state"]
+
+    def _set_state(self, job_id, state):
+        path = self._path(job_id, "job.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"state": state, "provider": self.provider, "model": self.model, "ts": time.time()}, f)
+        os.replace(path + ".tmp", path)
+
+    async def submit(self, input_path):
+        job_id = f"local-{self.provider}-{time.time_ns()}"
+        os.makedirs(os.path.join(self.directory, job_id))
+        shutil.copyfile(input_path, self._path(job_id, "input.jsonl"))
+        self._set_state(job_id, RUNNING)
+        return job_id
+
+    async def poll(self, job_id):
+        if self._state(job_id) == RUNNING:
+            await self._process(job_id)
+            self._set_state(job_id, ENDED)
+        return ENDED, "completed"
+
+    async def _process(self, job_id):
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(record):
+            async with semaphore:
+                return await self._execute(record)
+
+        outputs = await asyncio.gather(*(run(record) for record in read_jsonl(self._path(job_id, "input.jsonl"))))
+        path = self._path(job_id, "output.jsonl")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(output, ensure_ascii=False) + "\n" for output in outputs)
+        os.replace(path + ".tmp", path)
+
+    async def _execute(self, record):
+        if self.provider == "openai":
+            custom_id, body = record["custom_id"], record["body"]
+            url, headers = f"{self.base_url}/chat/completions", {"Authorization": f"Bearer {self.api_key}"}
+        elif self.provider == "anthropic":
+            custom_id, body = record["custom_id"], record["params"]
+            url, headers = f"{self.base_url}/v1/messages", {"x-api-key": self.api_key,
+                                                            "anthropic-version": ANTHROPIC_VERSION}
+        else:
+            custom_id, body = record["key"], record["request"]
+            url, headers = (f"{self.base_url}/v1beta/models/{self.model}:generateContent",
+                            {"x-goog-api-key": self.api_key})
+
+        # Como el servicio real, reintenta por su cuenta los 429 y los errores transitorios
+        attempt = 0
+        while True:
+            try:
+                response = await self._client.post(url, json=body, headers=headers)
+                status = response.status_code
+                payload = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                status, payload, response = 503, {"error": {"message": f"{type(e).__name__}: {e}"}}, None
+            error = ProviderError(status, _error_message(payload), response)
+            if status == 200 or attempt >= MAX_TRANSIENT_RETRIES or not (
+                    is_rate_limit_error(error) or is_transient_error(error)):
+                break
+            attempt += 1
+            await asyncio.sleep(backoff_seconds(attempt, retry_after_seconds(error)))
+
+        if self.provider == "openai":
+            return {"id": f"batch_req_{time.time_ns()}", "custom_id": custom_id,
+                    "response": {"status_code": status, "body": payload}, "error": None}
+        if self.provider == "anthropic":
+            result = ({"type": "succeeded", "message": payload} if status == 200
+                      else {"type": "errored", "error": payload})
+            return {"custom_id": custom_id, "result": result}
+        return {"key": custom_id, "response": payload} if status == 200 else {"key": custom_id, "error": payload}
+
+    async def results(self, job_id):
+        for record in read_jsonl(self._path(job_id, "output.jsonl")):
+            yield parse_result_line(self.provider, record)
+
+    async def close(self):
+        await self._client.aclose()
+
+
+BATCH_SERVICES = {
+    "openai": OpenAIBatchService,
+    "anthropic": AnthropicBatchService,
+    "gemini": GeminiBatchService,
+}
+
+
+def batch_service(provider, model, service="provider"):
+    if service == "local":
+        return LocalBatchService(provider, model)
+    return BATCH_SERVICES[provider](model)
+
+
+def _cv_fields(cv):
+    # Lo necesario para cerrar el CV al recoger el job, sin texto ni imágenes
+    return {key: cv.get(key) for key in ("id", "path", "filename", "sha256", "cache_key")}
+
+
+class BatchJobs:
+    """Jobs enviados a la API de batch del proveedor (mitad de precio y cuota
+    propia, resultados en horas en lugar de segundos).
+
+    Cada batch empaquetado es un request del JSONL de entrada, y un job lleva
+    hasta ``max_requests`` requests o ``max_bytes``. Los jobs enviados y
+    todavía sin recoger quedan en un log JSONL append-only, como el manifest,
+    con los CVs de cada request: una corrida que se cortó los retoma por ID,
+    no reenvía esos CVs y solo espera a que terminen para recoger resultados.
+    """
+
+    def __init__(self, service, path, fresh=False, max_requests=MAX_REQUESTS_PER_JOB, max_bytes=MAX_JOB_BYTES,
+                 max_poll_interval=BATCH_MAX_POLL_INTERVAL):
+        self.service = service
+        self.path = path
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_poll_interval = max_poll_interval
+        # job_id -> registro del envío ({"requests": {custom_id: [CVs]}, ...}) hasta que se recoge
+        self.jobs = {}
+        if not fresh:
+            self._load()
+        self._sink = JsonlSink(path, truncate=fresh, stage="batch_jobs")
+
+    def _load(self):
+        for record in read_jsonl(self.path):
+            if record["state"] == SUBMITTED:
+                self.jobs[record["job_id"]] = record
+            else:
+                self.jobs.pop(record["job_id"], None)
+        for job_id, job in list(self.jobs.items()):
+            if job.get("service") != self.service.name:
+                # Solo el servicio que lo recibió puede devolverlo: sus CVs se vuelven a enviar
+                print(f"⚠️ Job {job_id} es de {job.get('service')}, no de {self.service.name}; se descarta")
+                del self.jobs[job_id]
+        if self.jobs:
+            print(f"📮 Retomando {len(self.jobs)} jobs de batch sin recoger: {', '.join(self.jobs)}")
+
+    def outstanding_sha256(self):
+        return {cv["sha256"] for job in self.jobs.values() for cvs in job["requests"].values() for cv in cvs}
+
+    async def _retrying(self, call, *args):
+        attempt = 0
+        while True:
+            try:
+                return await call(*args)
+            except Exception as e:
+                if attempt >= MAX_TRANSIENT_RETRIES or not (is_rate_limit_error(e) or is_transient_error(e)):
+                    raise
+                attempt += 1
+                delay = backoff_seconds(attempt, retry_after_seconds(e))
+                print(f"🔁 Error transitorio del servicio de batch ({e}); reintento {attempt} en {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def submit(self, batches, line_for):
+        """Escribe ``line_for(custom_id, cvs)`` por cada batch de CVs y envía
+        los jobs a medida que se llenan. Devuelve los IDs de los jobs."""
+        job_ids = []
+        pending = None
+        async for cvs in aiter_sync(batches):
+            custom_id = f"batch-{len(pending['requests']) + 1}" if pending else "batch-1"
+            line = json.dumps(line_for(custom_id, cvs), ensure_ascii=False) + "\n"
+            if pending and (len(pending["requests"]) >= self.max_requests
+                            or pending["bytes"] + len(line) > self.max_bytes):
+                job_ids.append(await self._send(pending))
+                pending = None
+                custom_id = "batch-1"
+                line = json.dumps(line_for(custom_id, cvs), ensure_ascii=False) + "\n"
+            if pending is None:
+                input_path = f"{os.path.splitext(self.path)[0]}-{time.time_ns()}.input.jsonl"
+                pending = {"path": input_path, "file": open(input_path, "w", encoding="utf-8"),
+                           "requests": {}, "bytes": 0}
+            # Las imágenes van al archivo, no a memoria: un job puede pesar cientos de MB
+            pending["file"].write(line)
+            pending["bytes"] += len(line)
+            pending["requests"][custom_id] = [_cv_fields(cv) for cv in cvs]
+        if pending:
+            job_ids.append(await self._send(pending))
+        return job_ids
+
+    async def _send(self, pending):
+        pending["file"].close()
+        job_id = await self._retrying(self.service.submit, pending["path"])
+        record = {"job_id": job_id, "state": SUBMITTED, "service": self.service.name,
+                  "requests": pending["requests"], "ts": time.time()}
+        self._sink.write(record)
+        self._sink.flush()
+        self.jobs[job_id] = record
+        os.remove(pending["path"])
+        metrics.inc("cv_batch_jobs_total", state=SUBMITTED)
+        cvs = sum(len(cvs) for cvs in pending["requests"].values())
+        print(f"📮 Job {job_id}: {len(pending['requests'])} requests, {cvs} CVs, "
+              f"{pending['bytes'] / 1024 / 1024:.1f} MB")
+        return job_id
+
+    def members(self, job_id):
+        return [cv for cvs in self.jobs[job_id]["requests"].values() for cv in cvs]
+
+    async def collect(self, job_id, on_result):
+        """Consulta el job con esperas crecientes hasta que termine y llama a
+        ``on_result(cvs, completion, error)`` por cada request (``error`` si
+        el request falló o el job terminó sin su resultado)."""
+        delay = self.service.poll_interval
+        while True:
+            state, detail = await self._retrying(self.service.poll, job_id)
+            if state == ENDED:
+                break
+            print(f"⏳ Job {job_id}: {detail}; próxima consulta en {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * BATCH_POLL_GROWTH, self.max_poll_interval)
+
+        requests = self.jobs[job_id]["requests"]
+        seen = set()
+        async for custom_id, completion, error in self.service.results(job_id):
+            if custom_id not in requests or custom_id in seen:
+                continue
+            seen.add(custom_id)
+            on_result(requests[custom_id], completion, error)
+        for custom_id, cvs in requests.items():
+            if custom_id not in seen:
+                on_result(cvs, None, f"el job terminó ({detail}) sin resultado para {custom_id}")
+
+        elapsed = time.time() - self.jobs[job_id]["ts"]
+        print(f"📬 Job {job_id} recogido ({detail}): {len(seen)}/{len(requests)} requests con resultado, "
+              f"{elapsed / 60:.0f} min desde el envío")
+        self._sink.write({"job_id": job_id, "state": COLLECTED, "ts": time.time()})
+        del self.jobs[job_id]
+        metrics.inc("cv_batch_jobs_total", state=COLLECTED)
+
+    def close(self):
+        self._sink.close()
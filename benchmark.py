@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from mock_provider import DEFAULT_BEHAVIOUR, MockProviderServer, Replay
+from result_sink import read_jsonl
+from synthetic_corpus import DEFAULT_COUNT, generate_corpus, write_job_description
+from work_manifest import DONE, FAILED, SKIPPED
+
+# Corre cada entry point contra el mock (latencia, 429s y límites por minuto configurables)
+# sobre un corpus sintético y mide throughput, latencia de cola, CPU y memoria, para comparar
+# un cambio contra el reporte anterior antes de usarlo con cuota real.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = ["poc_gemini_images.py", "poc_classify_and_score.py", "cv_classifier.py",
+                "poc_gemini.py", "poc_openai.py", "poc-claude.py"]
+BENCH_DIR = "bench"
+REPORT_FILE = "benchmark-report.json"
+RUN_TIMEOUT = 1800
+REPEAT = 1
+# Latencia por defecto del mock en los benchmarks: mediana de 1.5s con cola larga
+BENCH_MOCK = {"latency": 1.5, "jitter": 0.5, "latency_dist": "lognormal"}
+# Lo que se compara contra el reporte base: (campo, True si más es mejor)
+COMPARED = [("cvs_per_second", True), ("api_p95", False), ("api_p99", False), ("cpu_seconds", False),
+            ("max_rss_mb", False)]
+
+# Aplica las constantes de --set en los módulos del repo y después corre el script como __main__.
+# Sirve para constantes que se leen al usarse (PREFETCH_PER_WORKER, QUEUE_DEPTH_PER_WORKER, ...);
+# las del propio script se fijan al importarlo y no se pueden pisar desde afuera.
+BOOTSTRAP = """
+import importlib, json, runpy, sys
+script, overrides = sys.argv[1], json.loads(sys.argv[2])
+for name, value in overrides.items():
+    module_name, attr = name.rsplit(".", 1)
+    module = importlib.import_module(module_name)
+    if not hasattr(module, attr):
+        raise AttributeError(f"{module_name} no tiene {attr}")
+    setattr(module, attr, value)
+sys.argv = [script] + sys.argv[3:]
+runpy.run_path(script, run_name="__main__")
+"""
+
+
+class MockThread:
+    # El mock en su propio event loop: el proceso del benchmark queda libre para esperar al script
+    def __init__(self, behaviour, replay=None, seed=None):
+        self.server = MockProviderServer(
+            behaviour={provider: behaviour for provider in ("openai", "anthropic", "gemini")}, seed=seed,
+            replay=replay)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self._loop).result()
+        return self.server
+
+    def __exit__(self, exc_type, exc, tb):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def prepare_corpus(bench_dir, params):
+    # Se regenera solo si cambian los parámetros: las corridas a comparar usan los mismos archivos
+    corpus_dir = os.path.join(bench_dir, "corpus")
+    params_file = os.path.join(corpus_dir, "params.json")
+    if os.path.exists(params_file):
+        with open(params_file) as f:
+            if json.load(f) == params:
+                return corpus_dir
+    shutil.rmtree(corpus_dir, ignore_errors=True)
+    print(f"📄 Generando corpus sintético ({params.get('count', DEFAULT_COUNT)} CVs)...")
+    generate_corpus(os.path.join(corpus_dir, "cvs"), **params)
+    write_job_description(os.path.join(corpus_dir, "job_description.pdf"))
+    with open(params_file, "w") as f:
+        json.dump(params, f)
+    return corpus_dir
+
+
+def _slug(name):
+    return re.sub(r"[^\w.-]+", "-", name).strip("-")
+
+
+def _manifest_counts(run_dir):
+    states = {}
+    for path in glob.glob(os.path.join(run_dir, "*.manifest.jsonl")):
+        for record in read_jsonl(path):
+            if "state" in record:
+                states[record["sha256"]] = record["state"]
+    values = list(states.values())
+    return {"done": values.count(DONE), "failed": values.count(FAILED), "skipped": values.count(SKIPPED)}
+
+
+def _api_latency(run_dir):
+    # La serie de cv_api_request_seconds con más llamadas (el modelo principal si hay cascada)
+    for path in glob.glob(os.path.join(run_dir, "*metrics-summary.json")):
+        with open(path) as f:
+            series = json.load(f)["histograms"].get("cv_api_request_seconds", [])
+        if series:
+            busiest = max(series, key=lambda s: s["count"])
+            return {"api_calls": busiest["count"], "api_p50": busiest["p50"], "api_p95": busiest["p95"],
+                    "api_p99": busiest["p99"], "api_max": busiest["max"]}
+    return {}
+
+
+def _wait(proc, timeout):
+    # wait4 devuelve el uso de recursos del script y de sus workers de ingesta ya terminados
+    timer = threading.Timer(timeout, proc.kill)
+    timer.start()
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    finally:
+        timer.cancel()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return usage
+
+
+def run_once(run, corpus_dir, run_dir, mock, replay=None, timeout=RUN_TIMEOUT):
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+    os.symlink(os.path.abspath(os.path.join(corpus_dir, "cvs")), os.path.join(run_dir, "cvs"))
+    shutil.copyfile(os.path.join(corpus_dir, "job_description.pdf"), os.path.join(run_dir, "job_description.pdf"))
+
+    script = os.path.join(REPO_DIR, run["script"])
+    if run.get("set"):
+        command = [sys.executable, "-c", BOOTSTRAP, script, json.dumps(run["set"])] + run.get("args", [])
+    else:
+        command = [sys.executable, script] + run.get("args", [])
+
+    with MockThread({**DEFAULT_BEHAVIOUR, **mock}, replay, seed=run.get("seed", 0)) as server:
+        env = dict(os.environ, PYTHONPATH=REPO_DIR, OPENAI_BASE_URL=f"{server.url}/v1",
+                   ANTHROPIC_BASE_URL=server.url, GEMINI_BASE_URL=server.url,
+                   OPENAI_API_KEY="mock", ANTHROPIC_API_KEY="mock", GEMINI_API_KEY="mock")
+        env.pop("METRICS_PORT", None)
+        env.update({name: str(value) for name, value in run.get("env", {}).items()})
+        with open(os.path.join(run_dir, "output.log"), "w") as log:
+            start = time.perf_counter()
+            proc = subprocess.Popen(command, cwd=run_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+            usage = _wait(proc, timeout)
+            wall = time.perf_counter() - start
+        stats = dict(server.stats)
+
+    counts = _manifest_counts(run_dir)
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return dict(
+        exit_code=proc.returncode,
+        wall_seconds=round(wall, 2),
+        cvs_per_second=round(counts["done"] / wall, 3) if wall else None,
+        cpu_seconds=round(usage.ru_utime + usage.ru_stime, 2),
+        max_rss_mb=round(rss_mb, 1),
+        mock_requests=stats["requests"],
+        mock_rate_limited=stats["rate_limited"],
+        mock_errors=stats["errors"],
+        mock_max_in_flight=stats["max_in_flight"],
+        **counts,
+        **_api_latency(run_dir),
+    )
+
+
+def _median(results):
+    # Mediana de cada campo numérico entre las repeticiones; el exit code es el peor
+    merged = {}
+    for field in results[0]:
+        values = [r[field] for r in results if isinstance(r.get(field), (int, float))]
+        if field == "exit_code":
+            merged[field] = max((abs(v) for v in values), default=0)
+        elif values:
+            merged[field] = round(statistics.median(values), 3)
+    return merged
+
+
+def run_suite(config, bench_dir=BENCH_DIR, timeout=RUN_TIMEOUT):
+    corpus_dir = prepare_corpus(bench_dir, config.get("corpus", {}))
+    replay_config = config.get("replay")
+    replay = Replay(replay_config.get("results", []), replay_config.get("usage", [])) if replay_config else None
+    repeat = config.get("repeat", REPEAT)
+    report = {"started_at": time.time(), "corpus": config.get("corpus", {}), "repeat": repeat, "results": []}
+
+    for run in config["runs"]:
+        name = run.get("name") or run["script"]
+        overridden = {target.rsplit(".", 1)[0] for target in run.get("set", {})}
+        if os.path.splitext(run["script"])[0] in overridden:
+            raise ValueError(f"{name}: las constantes del script se fijan al importarlo; --set solo aplica a módulos")
+        mock = {**BENCH_MOCK, **config.get("mock", {}), **run.get("mock", {})}
+        results = []
+        for i in range(repeat):
+            print(f"⏱️ {name} ({i + 1}/{repeat})...")
+            result = run_once(run, corpus_dir, os.path.join(bench_dir, "runs", f"{_slug(name)}-{i + 1}"),
+                              mock, replay, timeout)
+            if result["exit_code"]:
+                print(f"⚠️ {name} terminó con código {result['exit_code']}; ver {bench_dir}/runs/{_slug(name)}-{i + 1}/output.log")
+            results.append(result)
+        report["results"].append(dict(name=name, script=run["script"], args=run.get("args", []),
+                                      env=run.get("env", {}), set=run.get("set", {}), mock=mock,
+                                      **_median(results)))
+    return report
+
+
+def print_report(report, baseline=None):
+    previous = {r["name"]: r for r in (baseline or {}).get("results", [])}
+    for r in report["results"]:
+        print(f"\n📈 {r['name']}: {r.get('done', 0)} CVs en {r['wall_seconds']}s → {r['cvs_per_second']} CVs/s "
+              f"(exit {r['exit_code']})")
+        print(f"   API   n={r.get('api_calls', 0)} p50={r.get('api_p50')}s p95={r.get('api_p95')}s "
+              f"p99={r.get('api_p99')}s; mock: {r['mock_requests']} requests, {r['mock_rate_limited']} 429, "
+              f"{r['mock_errors']} errores, {r['mock_max_in_flight']} en vuelo como máximo")
+        print(f"   CPU   {r['cpu_seconds']}s, memoria máxima {r['max_rss_mb']} MB")
+        base = previous.get(r["name"])
+        if base:
+            deltas = []
+            for field, higher_is_better in COMPARED:
+                old, new = base.get(field), r.get(field)
+                if old and new is not None:
+                    change = (new - old) / old * 100
+                    better = change > 0 if higher_is_better else change < 0
+                    # Por debajo del 5% es ruido entre corridas
+                    mark = "" if abs(change) < 5 else " ✅" if better else " ❌"
+                    deltas.append(f"{field} {change:+.1f}%{mark}")
+            print(f"   vs base  {', '.join(deltas)}")
+
+
+def _config_from_args(args):
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    else:
+        config = {"runs": [{"script": script} for script in (args.script or ENTRY_POINTS)]}
+    if args.count is not None:
+        config.setdefault("corpus", {})["count"] = args.count
+    if args.repeat is not None:
+        config["repeat"] = args.repeat
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de los entry points contra el mock provider")
+    parser.add_argument("--config", help="JSON con corpus, mock, replay, repeat y la lista de runs (ver README)")
+    parser.add_argument("--script", action="append", help="entry point a medir (por defecto, todos); repetible")
+    parser.add_argument("-n", "--count", type=int, help=f"CVs del corpus sintético ({DEFAULT_COUNT} por defecto)")
+    parser.add_argument("--repeat", type=int, help="repeticiones por configuración; se informa la mediana")
+    parser.add_argument("--bench-dir", default=BENCH_DIR)
+    parser.add_argument("--timeout", type=float, default=RUN_TIMEOUT, help="segundos máximos por corrida")
+    parser.add_argument("--output", default=REPORT_FILE)
+    parser.add_argument("--baseline", help="reporte anterior contra el que comparar")
+    args = parser.parse_args()
+
+    report = run_suite(_config_from_args(args), args.bench_dir, args.timeout)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Reporte en {args.output}")
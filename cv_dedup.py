@@ -0,0 +1,285 @@
+import json
+import re
+import threading
+import zlib
+from io import BytesIO
+
+import fitz
+import numpy as np
+import PIL.Image
+
+from cv_images import A4_WIDTH_PT, CROP_MARGIN, content_rect, trim_whitespace
+from response_cache import participant_id_for
+from result_sink import DetailLog
+
+# MinHash sobre shingles de palabras: 64 permutaciones en 16 bandas de 4 filas.
+# Dos textos con Jaccard 0.8 caen en algún bucket común con probabilidad > 0.999.
+SHINGLE_WORDS = 5
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+MINHASH_SEED = 1
+MIN_TEXT_SIMILARITY = 0.8
+
+# dHash de 16x16 (256 bits) sobre una miniatura en escala de grises del contenido.
+# Con 16 bandas de 16 bits, dos hashes a distancia < 16 comparten al menos una banda.
+DHASH_SIZE = 16
+DHASH_BANDS = 16
+MAX_DHASH_DISTANCE = 12
+THUMBNAIL_DPI = 24
+
+_WORD_RE = re.compile(r"\w+")
+# Primo más grande por debajo de 2**32: a * h + b no desborda uint64
+_PRIME = np.uint64(4294967291)
+_rng = np.random.RandomState(MINHASH_SEED)
+_PERM_A = _rng.randint(1, 4294967291, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 4294967291, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def minhash_signature(text):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    # crc32 y no hash(): la firma se calcula en los workers y tiene que ser estable entre procesos
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    signature = ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+    # Cada valor es menor que _PRIME: entra en uint32. Como bytes ocupa 256 B por CV en vez
+    # de una lista de 64 ints de Python, y el índice guarda una por representante
+    return signature.astype(np.uint32).tobytes()
+
+
+def text_similarity(a, b):
+    return float(np.mean(np.frombuffer(a, dtype=np.uint32) == np.frombuffer(b, dtype=np.uint32)))
+
+
+def dhash(img):
+    gray = img.convert("L").resize((DHASH_SIZE + 1, DHASH_SIZE), PIL.Image.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = np.packbits(pixels[:, 1:] > pixels[:, :-1])
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def pdf_dhash(page):
+    # Miniatura del área con contenido, para que los márgenes no cuenten
+    pix = page.get_pixmap(dpi=THUMBNAIL_DPI, clip=content_rect(page), colorspace=fitz.csGRAY)
+    return dhash(PIL.Image.frombytes("L", (pix.width, pix.height), pix.samples))
+
+
+def image_dhash(data):
+    with PIL.Image.open(BytesIO(data)) as img:
+        img.load()
+        return dhash(trim_whitespace(img, int(CROP_MARGIN * img.width / A4_WIDTH_PT)))
+
+
+def _bands(signature, bands):
+    # Las bandas son rebanadas de los bytes de la firma: claves de bucket chicas y hasheables
+    size = len(signature) // bands
+    return [(i, signature[i * size:(i + 1) * size]) for i in range(bands)]
+
+
+def _dhash_bands(value):
+    bits = DHASH_SIZE * DHASH_SIZE // DHASH_BANDS
+    mask = (1 << bits) - 1
+    return [(i, (value >> (i * bits)) & mask) for i in range(DHASH_BANDS)]
+
+
+class DuplicateIndex:
+    """Agrupa CVs repetidos antes de llamar a la API: mismo hash de contenido,
+    textos casi iguales (MinHash/LSH) o la misma página como imagen (dHash).
+
+    El primer CV de cada grupo es el representante y es el único que se evalúa.
+    Cuando su evaluación llega (``resolve``) se llama a ``on_copy(miembro, copia)``
+    por cada duplicado, también para los que aparecen después. Si el
+    representante falla (``fail``), ``on_failed(miembro, error)`` (salvo para los
+    duplicados exactos, que comparten su entrada del manifest) y el grupo se
+    olvida, así el próximo duplicado pasa a ser el representante.
+
+    Dos CVs con texto solo se agrupan por texto: dos currículums distintos hechos
+    con la misma plantilla se ven casi iguales en una miniatura.
+
+    El índice crece con el corpus (firmas y evaluación de cada representante),
+    pero los duplicados no: un miembro queda en memoria solo hasta recibir su
+    copia, y se anota en ``members_file`` (JSONL), si se indica.
+    """
+
+    def __init__(self, on_copy, on_failed, min_text_similarity=MIN_TEXT_SIMILARITY,
+                 max_dhash_distance=MAX_DHASH_DISTANCE, members_file=None):
+        self.on_copy = on_copy
+        self.on_failed = on_failed
+        self.min_text_similarity = min_text_similarity
+        self.max_dhash_distance = max_dhash_distance
+        self.members_file = members_file
+        self.groups = {}
+        self._text_buckets = {}
+        self._image_buckets = {}
+        self._lock = threading.Lock()
+        # Totales de duplicados resueltos (los de grupos cuyo representante falló no cuentan)
+        self.duplicates = 0
+        self.duplicate_groups = 0
+        self.by_match = {}
+        self._log = DetailLog(members_file)
+
+    def _find(self, doc):
+        group = self.groups.get(doc["sha256"])
+        if group is not None:
+            return group, "exact", 1.0
+
+        minhash = doc.get("minhash")
+        best = None
+        if minhash is not None:
+            candidates = {sha for band in _bands(minhash, MINHASH_BANDS) for sha in self._text_buckets.get(band, ())}
+            for sha in candidates:
+                group = self.groups.get(sha)
+                if group is None:
+                    continue
+                similarity = text_similarity(minhash, group["minhash"])
+                if similarity >= self.min_text_similarity and (best is None or similarity > best[2]):
+                    best = (group, "text", similarity)
+            if best:
+                return best
+
+        if doc.get("dhash") is not None:
+            candidates = {sha for band in _dhash_bands(doc["dhash"]) for sha in self._image_buckets.get(band, ())}
+            for sha in candidates:
+                group = self.groups.get(sha)
+                if group is None or (minhash is not None and group["minhash"] is not None):
+                    continue
+                distance = hamming(doc["dhash"], group["dhash"])
+                if distance <= self.max_dhash_distance and (best is None or distance < best[2]):
+                    best = (group, "image", distance)
+            if best:
+                group, kind, distance = best
+                return group, kind, 1 - distance / (DHASH_SIZE * DHASH_SIZE)
+        return None
+
+    def _register(self, doc):
+        group = {
+            "sha256": doc["sha256"],
+            "id": participant_id_for(doc["sha256"]),
+            "filename": doc["filename"],
+            "minhash": doc.get("minhash"),
+            "dhash": doc.get("dhash"),
+            "evaluation": None,
+            # Duplicados que esperan la evaluación del representante
+            "members": [],
+            "copies": 0,
+        }
+        self.groups[doc["sha256"]] = group
+        if group["minhash"] is not None:
+            for band in _bands(group["minhash"], MINHASH_BANDS):
+                self._text_buckets.setdefault(band, []).append(doc["sha256"])
+        if group["dhash"] is not None:
+            for band in _dhash_bands(group["dhash"]):
+                self._image_buckets.setdefault(band, []).append(doc["sha256"])
+
+    def assign(self, doc):
+        """Devuelve False si ``doc`` es un representante nuevo (hay que evaluarlo)
+        o True si es un duplicado, que se completa cuando llegue la evaluación."""
+        with self._lock:
+            found = self._find(doc)
+            if found is None:
+                self._register(doc)
+                return False
+            group, kind, similarity = found
+            member = {
+                "sha256": doc["sha256"],
+                "id": participant_id_for(doc["sha256"]),
+                "path": doc["path"],
+                "filename": doc["filename"],
+                "cache_key": doc.get("cache_key"),
+                "match": kind,
+                "similarity": round(similarity, 3),
+            }
+            evaluation = group["evaluation"]
+            if evaluation is None:
+                group["members"].append(member)
+
+        print(f"🪞 {doc['filename']} es duplicado ({kind}) de {group['filename']}")
+        if evaluation is not None:
+            self._deliver(group, member, evaluation)
+        return True
+
+    def _deliver(self, group, member, evaluation):
+        self.on_copy(member, self._copy(group, member, evaluation))
+        with self._lock:
+            group["copies"] += 1
+            self.duplicates += 1
+            self.duplicate_groups += group["copies"] == 1
+            self.by_match[member["match"]] = self.by_match.get(member["match"], 0) + 1
+        self._log.write({
+            "representative": {"participant_id": group["id"], "filename": group["filename"]},
+            "participant_id": member["id"],
+            "filename": member["filename"],
+            "match": member["match"],
+            "similarity": member["similarity"],
+        })
+
+    def _copy(self, group, member, evaluation):
+        # También para un duplicado exacto (mismo participant_id): el parser decide si su archivo
+        # necesita una fila propia, p. ej. cuando el output se identifica por nombre de archivo
+        return dict(evaluation, participant_id=member["id"], duplicate_of=group["id"],
+                    duplicate_match=member["match"], duplicate_similarity=member["similarity"])
+
+    def has_result(self, sha256):
+        with self._lock:
+            group = self.groups.get(sha256)
+            return group is not None and group["evaluation"] is not None
+
+    def seed(self, doc, evaluation, filename=None):
+        """Registra ``doc`` como representante ya evaluado (su resultado vino de
+        la caché), para que sus duplicados de esta corrida reciban una copia."""
+        with self._lock:
+            if doc["sha256"] in self.groups:
+                return
+            self._register(doc)
+            group = self.groups[doc["sha256"]]
+            group["evaluation"] = evaluation
+            if filename:
+                group["filename"] = filename
+
+    def resolve(self, sha256, evaluation):
+        with self._lock:
+            group = self.groups.get(sha256)
+            if group is None:
+                return
+            group["evaluation"] = evaluation
+            members, group["members"] = group["members"], []
+        for member in members:
+            self._deliver(group, member, evaluation)
+
+    def fail(self, sha256, error):
+        with self._lock:
+            group = self.groups.pop(sha256, None)
+        if group is None:
+            return
+        for member in group["members"]:
+            # Un duplicado exacto es el mismo sha256 en el manifest: quien llamó a ``fail`` ya
+            # lo marcó como fallido, y marcarlo de nuevo gastaría otro de sus intentos
+            if member["sha256"] != group["sha256"]:
+                self.on_failed(member, error)
+
+    def summary(self):
+        with self._lock:
+            return {
+                "groups": self.duplicate_groups,
+                "duplicates": self.duplicates,
+                "by_match": dict(self.by_match),
+                # Cada duplicado es una evaluación que no se pidió a la API
+                "calls_avoided": self.duplicates,
+            }
+
+    def print_summary(self):
+        s = self.summary()
+        print(f"🪞 Duplicados: {s['duplicates']} CVs en {s['groups']} grupos no se evaluaron de nuevo {s['by_match']}")
+
+    def save(self, path):
+        self._log.flush()
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "members_file": self.members_file}, f, indent=2, ensure_ascii=False)
+
+    def close(self):
+        self._log.close()
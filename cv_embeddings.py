@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+import zlib
+
+import numpy as np
+
+from cv_ingest import extract_text_from_pdf, iter_cv_documents, iter_cv_files, load_cv_text
+from cv_prerank import tokenize
+from cv_routing import route_for, text_layer_quality
+from work_manifest import WATCH_INTERVAL, PathStream, file_signature, run_passes, settled_paths
+
+INDEX_DIR = "cv_index"
+EMBEDDING_BACKEND = "hashing"
+HASHING_DIM = 1024
+SENTENCE_TRANSFORMER_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+# Filas por bloque al buscar: la matriz mapeada nunca se carga entera en memoria
+SEARCH_CHUNK_ROWS = 65536
+# CVs por bloque al indexar: los textos se embeben y se descartan de a un bloque
+INDEX_CHUNK_DOCS = 256
+TOP_K = 20
+
+MATRIX_FILE = "embeddings.f32"
+IDS_FILE = "ids.jsonl"
+META_FILE = "meta.json"
+
+
+class HashingEmbedder:
+    """Embedding local sin dependencias: unigramas y bigramas con feature hashing
+    (crc32 con signo) y tf sublineal. No usa IDF, así los vectores ya guardados
+    no cambian a medida que crece el índice."""
+
+    name = "hashing"
+
+    def __init__(self, dim=HASHING_DIM):
+        self.dim = dim
+
+    def _features(self, text):
+        words = tokenize(text)
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = {}
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                slot = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+                counts[slot] = counts.get(slot, 0) + 1
+            for (column, sign), tf in counts.items():
+                vectors[row, column] += sign * (1 + math.log(tf))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+
+class SentenceTransformerEmbedder:
+    name = "sentence-transformers"
+
+    def __init__(self, model=SENTENCE_TRANSFORMER_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model)
+        self.name = f"sentence-transformers/{model}"
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts):
+        return self._model.encode(list(texts), normalize_embeddings=True).astype(np.float32)
+
+
+BACKENDS = {
+    "hashing": HashingEmbedder,
+    "sentence-transformers": SentenceTransformerEmbedder,
+}
+
+
+def get_backend(name=EMBEDDING_BACKEND):
+    try:
+        return BACKENDS[name]()
+    except ImportError as e:
+        # Igual que con tiktoken: sin la dependencia opcional se usa el backend local
+        print(f"⚠️ Backend de embeddings {name!r} no disponible ({e}); se usa 'hashing'")
+        return HashingEmbedder()
+
+
+class EmbeddingIndex:
+    """Índice de embeddings de CVs en disco: una matriz float32 (filas x dim)
+    que se lee con ``np.memmap`` y un sidecar JSONL con el ID de cada fila.
+
+    Agregar CVs es un append a los dos archivos; ``meta.json`` guarda cuántas
+    filas están completas y se escribe al final, así un corte a mitad de un
+    append no deja filas a medias a la vista. Si cambia el backend (o su
+    dimensión) el índice se reconstruye.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR, backend=None):
+        self.index_dir = index_dir
+        self.backend = backend or get_backend()
+        os.makedirs(index_dir, exist_ok=True)
+        self._matrix_path = os.path.join(index_dir, MATRIX_FILE)
+        self._ids_path = os.path.join(index_dir, IDS_FILE)
+        self._meta_path = os.path.join(index_dir, META_FILE)
+
+        meta = self._read_meta()
+        if meta.get("backend") != self.backend.name or meta.get("dim") != self.backend.dim:
+            meta = {"backend": self.backend.name, "dim": self.backend.dim, "rows": 0}
+        self.rows = meta["rows"]
+        self.dim = self.backend.dim
+        self._truncate(self.rows)
+
+        self.ids = []
+        self._row_by_key = {}
+        self._row_by_path = {}
+        self._signatures = {}
+        # Filas de versiones anteriores de un archivo que después cambió: no se devuelven
+        self._stale = set()
+        with open(self._ids_path, "r", encoding="utf-8") as f:
+            for line in f:
+                self._append_entry(json.loads(line))
+
+    def _read_meta(self):
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _write_meta(self):
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"backend": self.backend.name, "dim": self.dim, "rows": self.rows}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _truncate(self, rows):
+        # Descarta lo que haya quedado después de la última fila confirmada
+        with open(self._matrix_path, "ab") as f:
+            f.truncate(rows * self.dim * 4)
+        lines = []
+        if os.path.exists(self._ids_path):
+            with open(self._ids_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()[:rows]
+        with open(self._ids_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    def _append_entry(self, entry):
+        row = len(self.ids)
+        if entry["path"] in self._row_by_path:
+            self._stale.add(self._row_by_path[entry["path"]])
+        self._row_by_path[entry["path"]] = row
+        self._row_by_key[(entry["sha256"], entry["path"])] = row
+        self._signatures[entry["path"]] = entry["signature"]
+        self.ids.append(entry)
+
+    def __len__(self):
+        return self.rows - len(self._stale)
+
+    def contains(self, doc):
+        row = self._row_by_key.get((doc["sha256"], doc["path"]))
+        return row is not None and row not in self._stale
+
+    def is_indexed(self, path):
+        try:
+            return self._signatures.get(path) == file_signature(path)
+        except OSError:
+            return False
+
+    def add(self, docs):
+        """Agrega los CVs con texto usable que no estén ya en el índice."""
+        new = [doc for doc in docs if not self.contains(doc)]
+        if not new:
+            return 0
+        vectors = self.backend.embed([doc["text"] for doc in new])
+        entries = [{
+            "sha256": doc["sha256"],
+            "filename": doc["filename"],
+            "path": doc["path"],
+            "signature": file_signature(doc["path"]),
+        } for doc in new]
+
+        with open(self._matrix_path, "ab") as f:
+            f.write(vectors.astype(np.float32).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._ids_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+            f.flush()
+            os.fsync(f.fileno())
+        for entry in entries:
+            self._append_entry(entry)
+        self.rows += len(new)
+        self._write_meta()
+        return len(new)
+
+    def matrix(self):
+        if not self.rows:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self._matrix_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+
+    def search(self, query, k=TOP_K):
+        """Top-k por similitud coseno (los vectores ya están normalizados)."""
+        vector = self.backend.embed([query])[0]
+        matrix = self.matrix()
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, self.rows, SEARCH_CHUNK_ROWS):
+            scores = np.asarray(matrix[start:start + SEARCH_CHUNK_ROWS] @ vector)
+            stale = [row - start for row in self._stale if start <= row < start + len(scores)]
+            scores[stale] = -np.inf
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows = np.concatenate([best_rows, np.arange(start, start + len(scores))])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+        order = [i for i in np.argsort(-best_scores, kind="stable") if np.isfinite(best_scores[i])]
+        return [dict(self.ids[best_rows[i]], score=round(float(best_scores[i]), 4)) for i in order]
+
+
+def index_documents(index, paths, workers=None):
+    """Extrae el texto de ``paths`` y agrega al índice los que tienen capa de
+    texto usable. Devuelve ``(agregados, rutas sin texto)``."""
+    added = 0
+    docs = []
+    without_text = []
+    for doc in iter_cv_documents(paths, loader=load_cv_text, workers=workers):
+        if "error" in doc:
+            print(f"❌ Error leyendo {doc['filename']}: {doc['error']}")
+        elif doc.get("text") and route_for(text_layer_quality(doc["text"]))[0] == "text":
+            docs.append(doc)
+            if len(docs) >= INDEX_CHUNK_DOCS:
+                added += index.add(docs)
+                docs = []
+        else:
+            # Los escaneos no tienen texto para embeber; el scorer por imagen los sigue cubriendo
+            without_text.append(doc["path"])
+    return added + index.add(docs), without_text
+
+
+async def watch_index(index, cv_dir, watch=False, interval=WATCH_INTERVAL):
+    # Escaneos ya vistos en esta corrida, para no volver a abrirlos en cada revisión
+    without_text = {}
+
+    async def run_pass():
+        paths = (p for p in iter_cv_files(cv_dir)
+                 if not index.is_indexed(p) and without_text.get(p) != file_signature(p))
+        if watch:
+            paths = settled_paths(paths)
+        paths = PathStream(paths)
+        if not paths:
+            return 0
+        added, scans = index_documents(index, paths)
+        without_text.update((p, file_signature(p)) for p in scans)
+        print(f"🧬 Índice: {added} CVs nuevos, {len(scans)} sin texto, {len(index)} en total")
+        return added
+    await run_passes(run_pass, watch, interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice de embeddings de CVs para preseleccionar contra puestos nuevos")
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    parser.add_argument("--backend", default=EMBEDDING_BACKEND, choices=sorted(BACKENDS))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = commands.add_parser("index", help="agrega al índice los CVs nuevos o modificados")
+    index_parser.add_argument("--cv-dir", default="cvs")
+    index_parser.add_argument("--watch", action="store_true")
+    index_parser.add_argument("--interval", type=float, default=WATCH_INTERVAL)
+
+    search_parser = commands.add_parser("search", help="rankea el índice contra una descripción de puesto")
+    search_parser.add_argument("job_description", help="PDF o texto de la descripción del puesto")
+    search_parser.add_argument("--top-k", type=int, default=TOP_K)
+    search_parser.add_argument("--output", help="guardar la preselección como JSON")
+    search_parser.add_argument("--score", metavar="PROVEEDOR:MODELO",
+                               help="evaluar los top-k con el scorer de siempre, p. ej. gemini:gemini-2.5-flash-preview-04-17")
+    search_parser.add_argument("--score-output", default="output-shortlist.json")
+    args = parser.parse_args()
+
+    index = EmbeddingIndex(args.index_dir, get_backend(args.backend))
+    if args.command == "index":
+        asyncio.run(watch_index(index, args.cv_dir, args.watch, args.interval))
+    else:
+        if args.job_description.lower().endswith(".pdf"):
+            job_description = extract_text_from_pdf(args.job_description)
+        else:
+            with open(args.job_description, "r", encoding="utf-8") as f:
+                job_description = f.read()
+
+        start = time.perf_counter()
+        shortlist = index.search(job_description, args.top_k)
+        print(f"🔎 {len(shortlist)} de {len(index)} CVs en {(time.perf_counter() - start) * 1000:.1f} ms")
+        for rank, entry in enumerate(shortlist, start=1):
+            print(f"{rank:>4}  {entry['score']:.4f}  {entry['filename']}")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(shortlist, f, indent=2, ensure_ascii=False)
+
+        if args.score:
+            if not args.job_description.lower().endswith(".pdf"):
+                parser.error("--score necesita la descripción del puesto en PDF")
+            from text_scorer import run_text_scorer
+
+            provider, model = args.score.split(":", 1)
+            run_text_scorer(provider, model, None, args.job_description, args.score_output,
+                            cv_paths=[entry["path"] for entry in shortlist])
@@ -0,0 +1,184 @@
+import base64
+import math
+import time
+from io import BytesIO
+
+import fitz
+import PIL.Image
+import PIL.ImageChops
+
+RENDER_DPI = 150
+# JPEG desde el pixmap es bastante más rápido que PNG y el texto sigue legible a esta calidad
+IMAGE_FORMAT = "jpeg"
+IMAGE_QUALITY = 85
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "webp": "image/webp"}
+PASSTHROUGH_EXTENSIONS = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+# Límite por imagen más restrictivo entre proveedores (Anthropic: 5 MB, 8000 px)
+MAX_PASSTHROUGH_BYTES = 5 * 1024 * 1024
+MAX_PASSTHROUGH_SIDE = 8000
+
+# Geometría: se recortan los márgenes en blanco y se elige la resolución, entre la
+# mínima legible y RENDER_DPI, que ocupe menos tokens según las reglas del proveedor.
+TARGET_PROVIDER = "gemini"
+MIN_LEGIBLE_DPI = 100
+CROP_MARGIN = 12
+GRAYSCALE = False
+# Umbral de diferencia contra el blanco para considerar que un píxel tiene contenido
+BLANK_THRESHOLD = 24
+# Los escaneos no traen DPI confiable: se asume que el ancho completo es una hoja A4
+A4_WIDTH_PT = 595
+
+# Gemini 2.5 factura un monto fijo por imagen con la resolución por defecto: los ~357 tokens
+# "de imagen" de token-usage.json son 258 de la imagen más texto subestimado por len // 4.
+GEMINI_IMAGE_TOKENS = 258
+
+
+def image_tokens(provider, width, height):
+    if provider == "openai":
+        # Detalle alto: encaja en 2048x2048, lado corto a 768, tiles de 512
+        scale = min(1.0, 2048 / max(width, height))
+        width, height = width * scale, height * scale
+        scale = min(1.0, 768 / min(width, height))
+        width, height = width * scale, height * scale
+        return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+    if provider == "anthropic":
+        scale = min(1.0, 1568 / max(width, height))
+        return math.ceil(width * scale * height * scale / 750)
+    return GEMINI_IMAGE_TOKENS
+
+
+def best_dpi(provider, width_pt, height_pt, max_dpi=RENDER_DPI, min_dpi=MIN_LEGIBLE_DPI):
+    # Menos tokens primero; a igualdad de tokens, la mayor resolución (es gratis)
+    min_dpi = min(min_dpi, max_dpi)
+    best = None
+    for dpi in range(int(min_dpi), int(max_dpi) + 1):
+        tokens = image_tokens(provider, width_pt * dpi / 72, height_pt * dpi / 72)
+        if best is None or tokens <= best[1]:
+            best = (dpi, tokens)
+    return best
+
+
+def content_rect(page, margin=CROP_MARGIN):
+    page_rect = page.rect
+    rect = fitz.Rect()
+    for _, bbox in page.get_bboxlog():
+        r = fitz.Rect(bbox) & page_rect
+        # Un fondo que cubre toda la hoja no cuenta como contenido
+        if r.is_empty or r.get_area() >= 0.95 * page_rect.get_area():
+            continue
+        rect |= r
+    if rect.is_empty:
+        return page_rect
+    return (rect + (-margin, -margin, margin, margin)) & page_rect
+
+
+def encode_pixmap(pix, fmt=IMAGE_FORMAT, quality=IMAGE_QUALITY):
+    if fmt == "png":
+        return pix.tobytes("png")
+    if fmt in ("jpeg", "webp"):
+        # PIL lee el buffer del pixmap sin copiarlo; su libjpeg-turbo es varias veces más
+        # rápido que el encoder JPEG de PyMuPDF
+        mode = "L" if pix.n == 1 else "RGB"
+        image = PIL.Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+        buffer = BytesIO()
+        image.save(buffer, format=fmt.upper(), quality=quality)
+        return buffer.getvalue()
+    raise ValueError(f"Formato de imagen no soportado: {fmt}")
+
+
+def _add_timings(timings, **seconds):
+    if timings is None:
+        return
+    for stage, value in seconds.items():
+        timings[stage] = timings.get(stage, 0.0) + value
+
+
+def _stats(provider, width, height, dpi, baseline_tokens):
+    tokens = image_tokens(provider, width, height)
+    return {
+        "provider": provider,
+        "width": width,
+        "height": height,
+        "dpi": dpi,
+        "image_tokens": tokens,
+        "baseline_tokens": baseline_tokens,
+        "tokens_saved": baseline_tokens - tokens,
+    }
+
+
+def render_pdf_page(data, page_number=0, provider=TARGET_PROVIDER, fmt=IMAGE_FORMAT,
+                    quality=IMAGE_QUALITY, crop=True, grayscale=GRAYSCALE, timings=None):
+    """Renderiza una página con la geometría más barata para ``provider``.
+
+    Devuelve ``(bytes, mime_type, stats)``; ``stats`` compara los tokens de
+    imagen estimados contra el render anterior (página completa a RENDER_DPI).
+    Si se pasa ``timings`` (un dict), suma ahí los segundos de render y encode.
+    """
+    start = time.perf_counter()
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        page = doc.load_page(page_number)
+        clip = content_rect(page) if crop else page.rect
+        dpi, _ = best_dpi(provider, clip.width, clip.height)
+        pix = page.get_pixmap(dpi=dpi, clip=clip, alpha=False,
+                              colorspace=fitz.csGRAY if grayscale else fitz.csRGB)
+        baseline = image_tokens(provider, page.rect.width * RENDER_DPI / 72, page.rect.height * RENDER_DPI / 72)
+        rendered = time.perf_counter()
+        image_bytes = encode_pixmap(pix, fmt, quality)
+        _add_timings(timings, render=rendered - start, encode=time.perf_counter() - rendered)
+        return image_bytes, MIME_TYPES[fmt], _stats(provider, pix.width, pix.height, dpi, baseline)
+
+
+def is_passthrough(data, ext):
+    if ext not in PASSTHROUGH_EXTENSIONS or len(data) > MAX_PASSTHROUGH_BYTES:
+        return False
+    # Image.open solo lee el encabezado; no decodifica los píxeles
+    with PIL.Image.open(BytesIO(data)) as img:
+        return (max(img.size) <= MAX_PASSTHROUGH_SIDE
+                and img.mode in ("RGB", "L")
+                and MIME_TYPES.get(img.format.lower()) == PASSTHROUGH_EXTENSIONS[ext])
+
+
+def trim_whitespace(img, margin_px):
+    gray = img.convert("L")
+    diff = PIL.ImageChops.difference(gray, PIL.Image.new("L", gray.size, 255))
+    bbox = diff.point(lambda p: 255 if p > BLANK_THRESHOLD else 0).getbbox()
+    if bbox is None:
+        return img
+    left, top, right, bottom = bbox
+    return img.crop((max(0, left - margin_px), max(0, top - margin_px),
+                     min(img.width, right + margin_px), min(img.height, bottom + margin_px)))
+
+
+def load_image_file(data, ext, provider=TARGET_PROVIDER, fmt=IMAGE_FORMAT, quality=IMAGE_QUALITY,
+                    crop=True, grayscale=GRAYSCALE, timings=None):
+    start = time.perf_counter()
+    with PIL.Image.open(BytesIO(data)) as source:
+        source.load()
+    px_per_pt = source.width / A4_WIDTH_PT
+    source_dpi = 72 * px_per_pt
+    baseline = image_tokens(provider, source.width, source.height)
+
+    img = trim_whitespace(source, int(CROP_MARGIN * px_per_pt)) if crop else source
+    dpi, _ = best_dpi(provider, img.width / px_per_pt, img.height / px_per_pt, max_dpi=source_dpi)
+    scale = min(1.0, dpi / source_dpi)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+
+    # Los PNG/JPEG que ya cumplen y no ganan nada con recorte o escala se envían tal cual
+    if size == source.size and not grayscale and is_passthrough(data, ext):
+        _add_timings(timings, render=time.perf_counter() - start)
+        return data, PASSTHROUGH_EXTENSIONS[ext], _stats(provider, source.width, source.height, dpi, baseline)
+
+    img = img.convert("L" if grayscale else "RGB")
+    if size != img.size:
+        img = img.resize(size, PIL.Image.LANCZOS)
+    img.thumbnail((MAX_PASSTHROUGH_SIDE, MAX_PASSTHROUGH_SIDE))
+    rendered = time.perf_counter()
+    buffer = BytesIO()
+    img.save(buffer, format=fmt.upper(), quality=quality)
+    _add_timings(timings, render=rendered - start, encode=time.perf_counter() - rendered)
+    return buffer.getvalue(), MIME_TYPES[fmt], _stats(provider, img.width, img.height, dpi, baseline)
+
+
+def to_inline_data(image_bytes, mime_type):
+    return {"mime_type": mime_type, "data": base64.b64encode(image_bytes).decode("ascii")}
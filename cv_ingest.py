@@ -0,0 +1,244 @@
+import hashlib
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+import fitz
+
+from cv_images import TARGET_PROVIDER, best_dpi, content_rect, load_image_file, render_pdf_page, to_inline_data
+from cv_dedup import image_dhash, minhash_signature, pdf_dhash
+from cv_routing import route_for, text_layer_quality
+from metrics import registry as metrics
+from token_budget import CHARS_PER_TOKEN
+
+PDF_EXTENSIONS = (".pdf",)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+CV_EXTENSIONS = PDF_EXTENSIONS + IMAGE_EXTENSIONS
+
+# Documentos en vuelo por proceso antes de frenar la lectura (backpressure)
+PREFETCH_PER_WORKER = 4
+# Un núcleo queda para el proceso principal: el event loop que atiende la red no compite
+# con el render y el encode, que corren en el pool
+INGEST_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+# Y si compiten igual (otro proceso en la máquina), el scheduler prefiere al de la red
+WORKER_NICENESS = 5
+# Caídas del pool (worker muerto) en las que puede estar un archivo antes de probarlo solo
+MAX_WORKER_CRASHES = 2
+
+
+def extract_text_from_pdf(file_path=None, data=None):
+    # Acepta una ruta o los bytes ya leídos, para no abrir el archivo dos veces
+    if data is not None:
+        pdf = fitz.open(stream=data, filetype="pdf")
+    else:
+        pdf = fitz.open(file_path)
+    with pdf:
+        return "".join(page.get_text() for page in pdf)
+
+
+def list_cv_files(cv_dir, extensions=CV_EXTENSIONS):
+    return sorted(iter_cv_files(cv_dir, extensions))
+
+
+def iter_cv_files(cv_dir, extensions=CV_EXTENSIONS):
+    # Escaneo perezoso, en el orden del directorio: con 100k CVs no se arma ni se ordena la lista
+    with os.scandir(cv_dir) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(extensions) and entry.is_file():
+                yield entry.path
+
+
+def _read_document(path):
+    # Cada loader deja en doc["timings"] los segundos por etapa; el proceso principal los registra
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        data = f.read()
+    return {
+        "path": path,
+        "filename": os.path.basename(path),
+        "ext": os.path.splitext(path)[1].lower(),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "timings": {"read": time.perf_counter() - start},
+    }, data
+
+
+def _since(start):
+    return time.perf_counter() - start
+
+
+def load_cv_text(path):
+    doc, data = _read_document(path)
+    start = time.perf_counter()
+    doc["text"] = extract_text_from_pdf(data=data) if doc["ext"] in PDF_EXTENSIONS else None
+    doc["timings"]["parse"] = _since(start)
+    return doc
+
+
+def load_cv_routed(path, provider=TARGET_PROVIDER):
+    # Texto si la capa de texto del PDF sirve y no es más cara que la página como imagen;
+    # imagen para escaneos, imágenes sueltas y PDFs de una página donde la imagen sale más barata.
+    # Las firmas para detectar duplicados (MinHash del texto, dHash de la página) salen del mismo worker.
+    doc, data = _read_document(path)
+    timings = doc["timings"]
+    if doc["ext"] in PDF_EXTENSIONS:
+        with fitz.open(stream=data, filetype="pdf") as pdf:
+            start = time.perf_counter()
+            text = "".join(page.get_text() for page in pdf)
+            doc["text_quality"] = text_layer_quality(text)
+            # Lo que costaría la primera página como imagen, sin renderizarla. La ruta de imagen
+            # manda solo esa página, así que compite con el texto únicamente en PDFs de una página
+            clip = content_rect(pdf.load_page(0))
+            _, image_tokens = best_dpi(provider, clip.width, clip.height)
+            text_tokens = int(len(text) / CHARS_PER_TOKEN.get(provider, 4.0)) + 1
+            route, reason = route_for(doc["text_quality"], text_tokens,
+                                      image_tokens if pdf.page_count == 1 else None)
+            timings["parse"] = _since(start)
+            start = time.perf_counter()
+            if route == "text":
+                doc["minhash"] = minhash_signature(text)
+            # Renderizar la miniatura cuesta casi lo mismo que la página: solo cuando el texto
+            # no alcanza para comparar (ruta de imagen o texto demasiado corto para el MinHash)
+            if doc.get("minhash") is None:
+                doc["dhash"] = pdf_dhash(pdf.load_page(0))
+            timings["signatures"] = _since(start)
+            if route == "text":
+                doc["image_tokens_estimate"] = image_tokens
+                doc["route"] = "text"
+                doc["text"] = text
+                return doc
+    else:
+        reason = "archivo de imagen"
+        start = time.perf_counter()
+        doc["dhash"] = image_dhash(data)
+        timings["signatures"] = _since(start)
+
+    image_bytes, mime_type, stats = (
+        render_pdf_page(data, provider=provider, timings=timings) if doc["ext"] in PDF_EXTENSIONS
+        else load_image_file(data, doc["ext"], provider=provider, timings=timings)
+    )
+    start = time.perf_counter()
+    doc["route"] = "image"
+    doc["route_reason"] = reason
+    doc["inline_data"] = to_inline_data(image_bytes, mime_type)
+    timings["encode"] = timings.get("encode", 0.0) + _since(start)
+    doc["image_stats"] = stats
+    return doc
+
+
+def _init_worker(niceness):
+    if niceness and hasattr(os, "nice"):
+        try:
+            os.nice(niceness)
+        except OSError:
+            pass
+
+
+def _safe_load(loader, path):
+    try:
+        return loader(path)
+    except Exception as e:
+        return {
+            "path": path,
+            "filename": os.path.basename(path),
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+
+def _record(doc):
+    for stage, seconds in doc.pop("timings", {}).items():
+        metrics.observe("cv_stage_seconds", seconds, stage=stage)
+    metrics.inc("cv_documents_total", route="error" if "error" in doc else doc.get("route", "text"))
+    return doc
+
+
+def _ingest_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(WORKER_NICENESS,))
+
+
+def _load_isolated(loader, path):
+    # Un archivo que estaba en vuelo en varias caídas del pool se carga solo en un pool
+    # propio: si lo vuelve a tumbar es el culpable y se entrega como error
+    with _ingest_pool(1) as pool:
+        try:
+            return pool.submit(_safe_load, loader, path).result()
+        except BrokenProcessPool as e:
+            return {
+                "path": path,
+                "filename": os.path.basename(path),
+                "error": f"{type(e).__name__}: el worker de ingesta murió procesando el archivo",
+            }
+
+
+def iter_cv_documents(paths, loader=load_cv_text, workers=None, prefetch=None):
+    """Carga cada CV una sola vez en un pool de procesos y los entrega en
+    orden de finalización, sin esperar a que termine todo el corpus.
+
+    ``prefetch`` es cuántos documentos se procesan por delante de quien
+    consume el stream (por defecto ``PREFETCH_PER_WORKER`` por proceso): entre
+    los que están en el pool y los ya listos que esperan al consumidor nunca
+    son más que eso. Los documentos que fallan se entregan con una clave
+    ``error`` en lugar de cortar el stream.
+
+    Si un worker muere (un segfault de MuPDF, el OOM killer) el pool queda
+    roto: se recrea y se reenvía lo que estaba en vuelo. Un archivo presente
+    en ``MAX_WORKER_CRASHES`` caídas se prueba solo y, si vuelve a tumbar al
+    worker, se entrega como error.
+    """
+    workers = workers or INGEST_WORKERS
+    paths = iter(paths)
+    window = prefetch or workers * PREFETCH_PER_WORKER
+    pending = {}
+    crashes = {}
+    pool = _ingest_pool(workers)
+
+    def submit(path):
+        pending[pool.submit(_safe_load, loader, path)] = path
+
+    try:
+        for p in islice(paths, window):
+            submit(p)
+        while pending:
+            metrics.set_gauge("cv_ingest_ahead", len(pending))
+            # Tiempo bloqueado esperando a la ingesta: alto si el cuello de botella es nuestra CPU
+            with metrics.timer("cv_stage_seconds", stage="ingest_wait"):
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = []
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    doc = future.result()
+                except BrokenProcessPool:
+                    broken.append(path)
+                    continue
+                yield _record(doc)
+                # Se repone después de entregar: así en vuelo + listos nunca pasan de la ventana
+                for p in islice(paths, 1):
+                    submit(p)
+
+            if broken:
+                broken += pending.values()
+                pending.clear()
+                print(f"⚠️ Un worker de ingesta murió; se recrea el pool y se reenvían {len(broken)} CVs")
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = _ingest_pool(workers)
+                for path in broken:
+                    crashes[path] = crashes.get(path, 0) + 1
+                    if crashes[path] < MAX_WORKER_CRASHES:
+                        submit(path)
+                        continue
+                    yield _record(_load_isolated(loader, path))
+                    for p in islice(paths, 1):
+                        submit(p)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def batched(iterable, n):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, n))
+        if not batch:
+            return
+        yield batch
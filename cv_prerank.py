@@ -0,0 +1,256 @@
+import argparse
+import json
+import math
+import re
+import unicodedata
+
+import numpy as np
+import scipy.sparse
+
+from cv_ingest import extract_text_from_pdf, iter_cv_documents, list_cv_files, load_cv_text
+from cv_routing import route_for, text_layer_quality
+from result_sink import DetailLog
+
+# Parámetros clásicos de BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+MIN_TOKEN_CHARS = 3
+# Recall objetivo para sugerir un corte a partir de las etiquetas
+TARGET_RECALLS = (0.9, 0.95, 1.0)
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+_STOPWORDS = set("""
+a al algo ante como con contra cual cuando de del desde donde durante el ella ellos en entre era es esa ese
+esta este esto estos fue ha hasta hay la las le les lo los mas me mi muy no nos o otra otro para pero por
+que se sera si sin sobre son su sus tambien te tiene todo tu un una uno unos y ya
+an and are as at be by for from has have in is it its of on or that the this to was were will with you your
+""".split())
+
+
+def tokenize(text):
+    # Minúsculas y sin tildes: "Gestión" y "gestion" son el mismo término
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [w for w in _WORD_RE.findall(text) if len(w) >= MIN_TOKEN_CHARS and w not in _STOPWORDS]
+
+
+class BM25Index:
+    """Matriz dispersa documento x término con pesos BM25, armada de una vez
+    para todos los textos. ``scores(query)`` es un producto matriz-vector."""
+
+    def __init__(self, texts, k1=BM25_K1, b=BM25_B):
+        self.vocabulary = {}
+        indptr = [0]
+        indices = []
+        counts = []
+        for text in texts:
+            terms, term_counts = np.unique(
+                [self.vocabulary.setdefault(t, len(self.vocabulary)) for t in tokenize(text)],
+                return_counts=True,
+            )
+            indices.extend(terms.tolist())
+            counts.extend(term_counts.tolist())
+            indptr.append(len(indices))
+
+        tf = scipy.sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), np.asarray(indices, dtype=np.int64), np.asarray(indptr)),
+            shape=(len(indptr) - 1, max(len(self.vocabulary), 1)),
+        )
+        n_docs = tf.shape[0]
+        df = np.bincount(tf.indices, minlength=tf.shape[1])
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+        lengths = np.asarray(tf.sum(axis=1)).ravel()
+        avg_length = lengths.mean() if n_docs else 0.0
+        norm = k1 * (1 - b + b * lengths / (avg_length or 1.0))
+        # Saturación de la frecuencia fila por fila sobre los valores no nulos
+        row_norm = np.repeat(norm, np.diff(tf.indptr)).astype(np.float32)
+        weights = tf.data * (k1 + 1) / (tf.data + row_norm) * self.idf[tf.indices]
+        self.matrix = scipy.sparse.csr_matrix((weights, tf.indices, tf.indptr), shape=tf.shape)
+
+    def scores(self, query):
+        terms = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+        vector = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        vector[list(terms)] = 1.0
+        return self.matrix @ vector
+
+
+def load_labels(path):
+    # {"archivo.pdf": true, ...}; cualquier valor verdadero cuenta como candidato relevante
+    with open(path, "r", encoding="utf-8") as f:
+        return {filename: bool(relevant) for filename, relevant in json.load(f).items()}
+
+
+def recall_report(ranking, labels):
+    """Recall del corte sobre las etiquetas y el K / puntaje mínimo más chico que
+    alcanza cada recall de ``TARGET_RECALLS``. Los CVs sin texto no se rankean:
+    siempre pasan y cuentan como recuperados."""
+    relevant = [r for r in ranking if labels.get(r["filename"])]
+    if not relevant:
+        return {"labelled": len(labels), "relevant": 0}
+
+    kept = sum(1 for r in relevant if r["kept"])
+    ranked = sorted((r for r in relevant if r["rank"] is not None), key=lambda r: r["rank"])
+    always = len(relevant) - len(ranked)
+    suggestions = []
+    for target in TARGET_RECALLS:
+        needed = max(0, math.ceil(target * len(relevant)) - always)
+        cut = ranked[needed - 1] if needed else None
+        suggestions.append({
+            "recall": target,
+            "top_k": cut["rank"] if cut else 0,
+            "min_score": cut["score"] if cut else None,
+        })
+    return {
+        "labelled": len(labels),
+        "relevant": len(relevant),
+        "recall": round(kept / len(relevant), 4),
+        "suggested_cutoffs": suggestions,
+    }
+
+
+class Shortlist:
+    """Primera etapa opcional: rankea los CVs contra la descripción del puesto
+    con BM25 y deja pasar al LLM solo los ``top_k`` mejores y/o los que superan
+    ``min_score``. Los CVs sin capa de texto usable no se pueden rankear y pasan
+    siempre.
+
+    Entre pasadas quedan en memoria solo los totales y las entradas etiquetadas
+    como relevantes (para el recall); el ranking de cada pasada se escribe en
+    ``ranking_file`` (JSONL), si se indica."""
+
+    def __init__(self, job_description, top_k=None, min_score=None, labels=None, ranking_file=None):
+        self.job_description = job_description
+        self.top_k = top_k
+        self.min_score = min_score
+        self.labels = labels
+        self.ranking_file = ranking_file
+        self.documents = 0
+        self.ranked = 0
+        self.kept = 0
+        self._relevant = []
+        self._log = DetailLog(ranking_file)
+
+    @property
+    def enabled(self):
+        return self.top_k is not None or self.min_score is not None
+
+    @property
+    def context(self):
+        # Cambiar el corte cambia qué CVs se evalúan
+        return f"top_k={self.top_k}|min_score={self.min_score}" if self.enabled else ""
+
+    def rank(self, documents):
+        rankable = []
+        ranking = []
+
+        def texts():
+            # El índice consume cada texto apenas se lee: en memoria queda la matriz dispersa, no los textos
+            for doc in documents:
+                if "error" in doc:
+                    continue
+                entry = {"filename": doc["filename"], "path": doc["path"], "sha256": doc["sha256"],
+                         "score": None, "rank": None, "kept": True}
+                ranking.append(entry)
+                if doc.get("text") and route_for(text_layer_quality(doc["text"]))[0] == "text":
+                    rankable.append(entry)
+                    yield doc["text"]
+
+        index = BM25Index(texts())
+        if rankable:
+            scores = index.scores(self.job_description)
+            order = np.argsort(-scores, kind="stable")
+            for rank, i in enumerate(order, start=1):
+                entry = rankable[i]
+                entry["score"] = round(float(scores[i]), 4)
+                entry["rank"] = rank
+                entry["kept"] = ((self.top_k is None or rank <= self.top_k)
+                                 and (self.min_score is None or entry["score"] >= self.min_score))
+        return ranking
+
+    def add(self, ranking):
+        # Suma el ranking de una pasada a los totales y lo escribe, ordenado, en el detalle
+        for entry in sorted(ranking, key=lambda r: (r["rank"] is None, r["rank"] or 0)):
+            self.documents += 1
+            self.ranked += entry["rank"] is not None
+            self.kept += entry["kept"]
+            if self.labels and self.labels.get(entry["filename"]):
+                self._relevant.append(entry)
+            self._log.write(entry)
+
+    def select(self, paths, workers=None):
+        """Devuelve ``(rutas que siguen al LLM, entradas descartadas)``."""
+        if not self.enabled:
+            return paths, []
+        # El corte es global (top-k de toda la pasada): acá sí hace falta la lista de rutas
+        paths = list(paths)
+        if not paths:
+            return paths, []
+        # Solo texto: sin render ni base64 para los que se van a descartar
+        ranking = self.rank(iter_cv_documents(paths, loader=load_cv_text, workers=workers))
+        self.add(ranking)
+        dropped = [r for r in ranking if not r["kept"]]
+        dropped_paths = {r["path"] for r in dropped}
+        print(f"🔎 Preselección BM25: {len(ranking) - len(dropped)} de {len(ranking)} CVs pasan al LLM "
+              f"(top_k={self.top_k}, min_score={self.min_score})")
+        # Los que no se pudieron leer siguen de largo: el scorer reporta el error
+        return [p for p in paths if p not in dropped_paths], dropped
+
+    def summary(self):
+        summary = {
+            "documents": self.documents,
+            "ranked": self.ranked,
+            "unranked": self.documents - self.ranked,
+            "kept": self.kept,
+            "top_k": self.top_k,
+            "min_score": self.min_score,
+        }
+        if self.labels is not None:
+            summary["labels"] = recall_report(self._relevant, self.labels)
+        return summary
+
+    def print_summary(self):
+        if not self.documents:
+            return
+        s = self.summary()
+        print(f"🔎 Preselección: {s['kept']}/{s['documents']} CVs al LLM, "
+              f"{s['documents'] - s['kept']} descartados sin llamar a la API")
+        labels = s.get("labels")
+        if labels and labels.get("relevant"):
+            print(f"🎯 Recall sobre {labels['relevant']} CVs relevantes etiquetados: {labels['recall']:.0%}")
+            for cut in labels["suggested_cutoffs"]:
+                print(f"   recall {cut['recall']:.0%}: top_k={cut['top_k']} o min_score={cut['min_score']}")
+
+    def save(self, path):
+        if not self.documents:
+            return
+        self._log.flush()
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "ranking_file": self.ranking_file}, f, indent=2, ensure_ascii=False)
+
+    def close(self):
+        self._log.close()
+
+
+if __name__ == "__main__":
+    # Rankea la carpeta sin llamar a ninguna API, para ajustar el corte con un set etiquetado
+    parser = argparse.ArgumentParser(description="Preselección BM25 de CVs contra la descripción del puesto")
+    parser.add_argument("--cv-dir", default="cvs")
+    parser.add_argument("--job-description", default="job_description.pdf")
+    parser.add_argument("--top-k", type=int)
+    parser.add_argument("--min-score", type=float)
+    parser.add_argument("--labels", help="JSON {archivo: true/false} con los CVs relevantes")
+    parser.add_argument("--report", default="prerank-report.json")
+    parser.add_argument("--ranking", default="prerank-ranking.jsonl", help="ranking completo, una línea por CV")
+    args = parser.parse_args()
+
+    shortlist = Shortlist(extract_text_from_pdf(args.job_description), args.top_k, args.min_score,
+                          load_labels(args.labels) if args.labels else None, args.ranking)
+    ranking = shortlist.rank(iter_cv_documents(list_cv_files(args.cv_dir), loader=load_cv_text))
+    shortlist.add(ranking)
+    for entry in sorted(ranking, key=lambda r: (r["rank"] is None, r["rank"] or 0)):
+        print(f"{entry['rank'] or '-':>4}  {entry['score'] if entry['score'] is not None else 'sin texto':>9}  "
+              f"{'✔' if entry['kept'] else '✘'}  {entry['filename']}")
+    shortlist.print_summary()
+    shortlist.save(args.report)
+    shortlist.close()
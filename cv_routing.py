@@ -0,0 +1,141 @@
+import json
+import threading
+import unicodedata
+
+from result_sink import DetailLog
+
+# Umbrales de la capa de texto. Un PDF nacido digital trae miles de caracteres limpios;
+# un escaneo no trae nada o trae basura del OCR / fuentes sin mapa Unicode.
+MIN_TEXT_CHARS = 300
+MIN_GLYPH_COVERAGE = 0.9
+MAX_GARBAGE_RATIO = 0.1
+
+# Caracteres que aparecen cuando una fuente no tiene mapa Unicode (PyMuPDF usa U+FFFD)
+_UNMAPPED_CATEGORIES = {"Co", "Cn", "Cs", "Cc"}
+_GLYPH_CATEGORIES = ("L", "N", "P", "Zs", "Sc", "Sm", "So")
+
+
+def text_layer_quality(text):
+    chars = [c for c in text if not c.isspace()]
+    if not chars:
+        return {"chars": 0, "glyph_coverage": 0.0, "garbage_ratio": 1.0}
+
+    mapped = sum(
+        1 for c in chars
+        if c != "\ufffd"
+        and unicodedata.category(c) not in _UNMAPPED_CATEGORIES
+        and unicodedata.category(c).startswith(_GLYPH_CATEGORIES)
+    )
+
+    # Una "palabra" sin letras ni dígitos, o con más símbolos que letras, es ruido
+    words = text.split()
+    garbage = 0
+    for word in words:
+        alnum = sum(1 for c in word if c.isalnum())
+        if alnum == 0 or alnum < len(word) / 2:
+            garbage += 1
+
+    return {
+        "chars": len(chars),
+        "glyph_coverage": round(mapped / len(chars), 4),
+        "garbage_ratio": round(garbage / len(words), 4),
+    }
+
+
+def route_for(quality, text_tokens=None, image_tokens=None):
+    """Devuelve ``("text", None)`` si conviene mandar la capa de texto o ``("image", motivo)``.
+
+    Sin capa de texto utilizable va la imagen. Si la capa sirve y se conocen los
+    tokens de ambas rutas (``image_tokens`` solo cuando la imagen cubre todo el
+    CV, p. ej. un PDF de una página), va la más barata: en Gemini una página
+    cuesta 258 tokens fijos, menos que el texto de casi cualquier CV.
+    """
+    if quality["chars"] < MIN_TEXT_CHARS:
+        return "image", "sin capa de texto"
+    if quality["glyph_coverage"] < MIN_GLYPH_COVERAGE:
+        return "image", "glifos sin mapa Unicode"
+    if quality["garbage_ratio"] > MAX_GARBAGE_RATIO:
+        return "image", "texto ilegible"
+    if text_tokens is not None and image_tokens is not None and image_tokens < text_tokens:
+        return "image", "imagen más barata que el texto"
+    return "text", None
+
+
+class RoutingReport:
+    """Resume por corrida cuántos CVs fueron como texto o imagen y los tokens que
+    implicó cada decisión frente a mandar siempre la imagen.
+
+    En memoria quedan solo los totales; cada decisión se escribe en
+    ``decisions_file`` (JSONL) apenas se toma, si se indica.
+    """
+
+    def __init__(self, counter, decisions_file=None):
+        self.counter = counter
+        self.decisions_file = decisions_file
+        self.documents = 0
+        self.text = 0
+        self.text_tokens = 0
+        self.image_tokens_avoided = 0
+        self.tokens_delta = 0
+        self.image_reasons = {}
+        self._lock = threading.Lock()
+        self._log = DetailLog(decisions_file)
+
+    def record(self, doc):
+        route = doc["route"]
+        if route == "text":
+            text_tokens = self.counter.count(doc["text"])
+            image_tokens = doc["image_tokens_estimate"]
+        else:
+            text_tokens = 0
+            image_tokens = doc["image_stats"]["image_tokens"]
+        # Positivo: tokens que se ahorran frente a mandar la imagen
+        tokens_delta = image_tokens - text_tokens if route == "text" else 0
+
+        # Los CVs se registran desde el thread de ingesta y el resumen se lee desde el event loop
+        with self._lock:
+            self.documents += 1
+            if route == "text":
+                self.text += 1
+                self.text_tokens += text_tokens
+                self.image_tokens_avoided += image_tokens
+                self.tokens_delta += tokens_delta
+            else:
+                reason = doc.get("route_reason")
+                self.image_reasons[reason] = self.image_reasons.get(reason, 0) + 1
+        self._log.write({
+            "filename": doc["filename"],
+            "route": route,
+            "reason": doc.get("route_reason"),
+            "quality": doc.get("text_quality"),
+            "text_tokens": text_tokens,
+            "image_tokens": image_tokens,
+            "tokens_delta": tokens_delta,
+        })
+        return text_tokens if route == "text" else image_tokens
+
+    def summary(self):
+        with self._lock:
+            return {
+                "documents": self.documents,
+                "text": self.text,
+                "image": self.documents - self.text,
+                "image_reasons": dict(self.image_reasons),
+                "text_tokens": self.text_tokens,
+                "image_tokens_avoided": self.image_tokens_avoided,
+                "tokens_delta": self.tokens_delta,
+            }
+
+    def print_summary(self):
+        s = self.summary()
+        print(f"🧭 Ruteo: {s['text']} CVs como texto, {s['image']} como imagen "
+              f"(delta de tokens vs. imagen: {s['tokens_delta']:+d})")
+
+    def save(self, path):
+        self._log.flush()
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "decisions_file": self.decisions_file}, f,
+                      indent=2, ensure_ascii=False)
+
+    def close(self):
+        self._log.close()
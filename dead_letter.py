@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from metrics import registry as metrics
+from result_sink import JsonlSink
+from scheduler import is_document_error
+
+
+class DeadLetter:
+    """CVs que fallaron solos, después de los reintentos del motor y de dividir
+    su batch: una línea JSON por CV con el error, para revisarlos a mano o
+    reprocesarlos sin correr todo de nuevo. Es append-only entre corridas; la
+    próxima corrida los vuelve a intentar mientras el manifest lo permita."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._sink = JsonlSink(path, stage="dead_letter")
+
+    def add(self, doc, error, batch_size=None):
+        self.count += 1
+        metrics.inc("cv_dead_letters_total")
+        self._sink.write({
+            "filename": doc["filename"],
+            "path": doc.get("path"),
+            "sha256": doc["sha256"],
+            "participant_id": doc.get("id"),
+            "error_type": type(error).__name__ if isinstance(error, BaseException) else None,
+            "error": str(error),
+            # Tamaño del batch en el que falló por última vez (1 si se llegó a aislar)
+            "batch_size": batch_size,
+            "ts": time.time(),
+        })
+
+    def print_summary(self):
+        if self.count:
+            print(f"☠️ {self.count} CVs quedaron sin resultado; detalle (error y tamaño del batch) en {self.path}")
+
+    def close(self):
+        self._sink.close()
+
+
+async def bisect_batch(docs, attempt, on_dead):
+    """Ejecuta ``await attempt(docs)``. Si falla (el motor ya reintentó los
+    errores transitorios), divide el batch en dos mitades y reintenta cada una
+    por separado, hasta aislar los CVs que fallan solos: esos se pasan a
+    ``on_dead(doc, error, batch_size)``.
+
+    Solo se divide ante errores que pueden deberse a un CV puntual (400/413/422
+    del proveedor, respuestas que no se pudieron parsear o validar). Cualquier
+    otro error (transitorios que agotaron los reintentos, autenticación, un bug
+    como un TypeError) fallaría igual en cada mitad: todos los CVs del batch van
+    a ``on_dead`` sin dividir. Solo la cancelación se propaga."""
+    try:
+        await attempt(docs)
+        return
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        if len(docs) == 1 or not is_document_error(e):
+            for doc in docs:
+                on_dead(doc, e, len(docs))
+            return
+        half = len(docs) // 2
+        print(f"✂️ Batch de {len(docs)} CVs falló ({e}); se divide en {half} + {len(docs) - half}")
+        metrics.inc("cv_batch_bisections_total")
+    await asyncio.gather(bisect_batch(docs[:half], attempt, on_dead),
+                         bisect_batch(docs[half:], attempt, on_dead))
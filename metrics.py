@@ -0,0 +1,250 @@
+import bisect
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Buckets en segundos: desde extraer el texto de un PDF (ms) hasta una llamada con imágenes (minutos)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+QUANTILES = (0.5, 0.95, 0.99)
+# Muestras guardadas por serie para los percentiles; por encima se muestrea (reservoir)
+MAX_SAMPLES = 10_000
+
+METRICS_FILE = "metrics.prom"
+METRICS_SUMMARY_FILE = "metrics-summary.json"
+# Con METRICS_PORT definido, las métricas también se sirven en http://<METRICS_HOST>:<puerto>/metrics.
+# Por defecto solo en loopback: exponerlas en la red (p. ej. METRICS_HOST=0.0.0.0) es explícito
+METRICS_PORT_ENV = "METRICS_PORT"
+METRICS_HOST_ENV = "METRICS_HOST"
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+HELP = {
+    "cv_stage_seconds": "Duración de cada etapa local por documento o batch (read, parse, render, encode, "
+                        "signatures, ingest_wait, backpressure, queue, throttle, write, store, report, manifest, "
+                        "dead_letter, batch_jobs)",
+    "cv_api_request_seconds": "Latencia de cada llamada a la API del proveedor",
+    "cv_api_requests_total": "Llamadas a la API por resultado (ok, error, rate_limited)",
+    "cv_api_retries_total": "Reintentos de llamadas a la API",
+    "cv_api_in_flight": "Llamadas a la API en vuelo",
+    "cv_ingest_ahead": "Documentos en proceso en el pool de ingesta, por delante de las llamadas",
+    "cv_api_concurrency": "Límite de concurrencia adaptativo (AIMD)",
+    "cv_tokens_total": "Tokens informados por el proveedor (prompt, cached, response)",
+    "cv_documents_total": "Documentos cargados por ruta (text, image) o con error",
+    "cv_batch_bisections_total": "Batches que fallaron y se dividieron en dos",
+    "cv_dead_letters_total": "CVs que fallaron solos y fueron al archivo de dead letters",
+    "cv_batch_jobs_total": "Jobs de la API de batch enviados (submitted) y recogidos (collected)",
+}
+
+
+def _key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # Interpolación lineal entre las dos muestras vecinas
+    position = q * (len(sorted_values) - 1)
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = []
+        self._rng = random.Random(0)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+        else:
+            slot = self._rng.randrange(self.count)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = value
+
+    def summary(self):
+        values = sorted(self.samples)
+        summary = {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else None,
+            "max": round(values[-1], 4) if values else None,
+        }
+        for q in QUANTILES:
+            value = _quantile(values, q)
+            summary[f"p{int(q * 100)}"] = round(value, 4) if value is not None else None
+        return summary
+
+
+class MetricsRegistry:
+    """Contadores, gauges e histogramas en memoria, con labels.
+
+    Es thread-safe (la ingesta y el sink escriben desde otros threads) y se
+    exporta en formato de texto de Prometheus o como un resumen JSON con
+    p50/p95/p99 por serie. Los workers de ingesta no escriben acá: cada
+    documento trae sus tiempos y el proceso principal los registra.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._files = None
+        self._server = None
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _key(labels)
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter_total(self, name, **match):
+        # Suma de las series cuyo label coincide con ``match``
+        wanted = set(_key(match))
+        with self._lock:
+            return sum(v for key, v in self._counters.get(name, {}).items() if wanted <= set(key))
+
+    def prometheus(self):
+        lines = []
+        with self._lock:
+            for kind, family in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted(family):
+                    lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in sorted(family[name].items()):
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+            for name in sorted(self._histograms):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        elapsed = time.time() - self.started
+        with self._lock:
+            histograms = {
+                name: [dict(labels=dict(key), **h.summary()) for key, h in sorted(series.items())]
+                for name, series in self._histograms.items()
+            }
+            counters = {name: [dict(labels=dict(key), value=v) for key, v in sorted(series.items())]
+                        for name, series in self._counters.items()}
+            gauges = {name: [dict(labels=dict(key), value=v) for key, v in sorted(series.items())]
+                      for name, series in self._gauges.items()}
+        tokens = self.counter_total("cv_tokens_total", kind="prompt") + self.counter_total(
+            "cv_tokens_total", kind="response")
+        documents = self.counter_total("cv_documents_total")
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput": {
+                "documents_per_second": round(documents / elapsed, 3) if elapsed else None,
+                "tokens_per_second": round(tokens / elapsed, 1) if elapsed else None,
+            },
+            "histograms": histograms,
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+    def export_to(self, metrics_file=METRICS_FILE, summary_file=METRICS_SUMMARY_FILE):
+        """Define dónde se escriben las métricas (``flush``) y, si está
+        ``METRICS_PORT``, las sirve por HTTP (en ``METRICS_HOST``) mientras dure la corrida."""
+        self._files = (metrics_file, summary_file)
+        port = os.getenv(METRICS_PORT_ENV)
+        if port and self._server is None:
+            host = os.getenv(METRICS_HOST_ENV) or DEFAULT_METRICS_HOST
+            self._server = serve(self, int(port), host)
+            print(f"📊 Métricas en http://{host}:{port}/metrics")
+
+    def flush(self):
+        if self._files is None:
+            return
+        metrics_file, summary_file = self._files
+        tmp_path = metrics_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus())
+        # Un scraper que lee el archivo (node_exporter textfile) nunca ve uno a medias
+        os.replace(tmp_path, metrics_file)
+        with open(summary_file, "w") as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+
+    def print_summary(self):
+        s = self.summary()
+        print(f"📊 Métricas ({s['elapsed_seconds']:.0f}s): {s['throughput']['documents_per_second']} CVs/s, "
+              f"{s['throughput']['tokens_per_second']} tokens/s")
+        for name in ("cv_stage_seconds", "cv_api_request_seconds"):
+            for series in s["histograms"].get(name, []):
+                labels = series["labels"].get("stage") or f"api {series['labels'].get('provider')}"
+                print(f"   {labels:<14} n={series['count']:<5} p50={series['p50']}s "
+                      f"p95={series['p95']}s p99={series['p99']}s")
+
+
+def serve(registry, port, host=DEFAULT_METRICS_HOST):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Registro único por proceso: todos los módulos instrumentados escriben acá
+registry = MetricsRegistry()
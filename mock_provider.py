@@ -0,0 +1,591 @@
+import argparse
+import asyncio
+import collections
+import json
+import math
+import random
+import re
+import time
+
+from result_sink import read_jsonl
+
+# Servidor HTTP local que imita las APIs de OpenAI, Anthropic y Gemini para probar el
+# motor async sin gastar cuota. Apuntar los scorers con:
+#   OPENAI_BASE_URL=http://127.0.0.1:8080/v1
+#   ANTHROPIC_BASE_URL=http://127.0.0.1:8080
+#   GEMINI_BASE_URL=http://127.0.0.1:8080
+# Con --replay responde con evaluaciones y tokens grabados de una corrida real (ver Replay).
+
+UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+GEMINI_PATH_RE = re.compile(r"^/v1beta/models/(?P<model>[^:]+):(?P<method>generateContent|streamGenerateContent)")
+GEMINI_CACHE_PATH = "/v1beta/cachedContents"
+STATS_PATH = "/mock/stats"
+
+IMAGE_TOKENS = 258
+# En streaming, parte de la latencia es espera hasta el primer token y el resto se reparte
+# entre los fragmentos
+STREAM_TTFT_FRACTION = 0.2
+STREAM_CHUNK_CHARS = 40
+LATENCY_DISTRIBUTIONS = ("gauss", "lognormal", "exponential", "uniform", "fixed")
+# Ventana de los límites por minuto, como la de los proveedores
+RATE_WINDOW = 60.0
+
+DEFAULT_BEHAVIOUR = {
+    "latency": 1.0,
+    "jitter": 0.3,
+    # gauss: media y desvío; lognormal: mediana y desvío del logaritmo (cola larga);
+    # exponential: media; uniform: media ± jitter; fixed: siempre la media
+    "latency_dist": "gauss",
+    # Segundos extra por token de respuesta: un batch más grande tarda más en generarse
+    "latency_per_token": 0.0,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "retry_after": 1,
+    # Límites por minuto del proveedor: pasado el límite, 429 con el Retry-After hasta que la ventana libera
+    "rpm": None,
+    "tpm": None,
+    # Probabilidad de omitir la evaluación de un candidato (prueba la reconciliación por ID)
+    "drop_rate": 0.0,
+    # Tokens mínimos para cachear un prefijo (OpenAI y Gemini piden ~1024 en producción)
+    "cache_min_tokens": 0,
+    # Un request cuyo prompt contiene este texto falla siempre con 400 (prueba la división de batches)
+    "poison": None,
+    # Probabilidad de cortar la conexión a mitad de un stream, con parte del texto ya enviado
+    "stream_cut_rate": 0.0,
+}
+
+
+def sample_latency(rng, behaviour):
+    mean, spread = behaviour["latency"], behaviour["jitter"]
+    distribution = behaviour["latency_dist"]
+    if distribution == "lognormal":
+        value = mean * math.exp(rng.gauss(0, spread))
+    elif distribution == "exponential":
+        value = rng.expovariate(1 / mean) if mean > 0 else 0.0
+    elif distribution == "uniform":
+        value = rng.uniform(mean - spread, mean + spread)
+    elif distribution == "fixed":
+        value = mean
+    else:
+        value = rng.gauss(mean, spread)
+    return max(0.0, value)
+
+
+class _RateWindow:
+    # Requests y tokens del último minuto de un proveedor
+    def __init__(self, rpm, tpm):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = collections.deque()
+        self.tokens = collections.deque()
+        self.token_total = 0
+
+    def _expire(self, now):
+        while self.requests and now - self.requests[0] >= RATE_WINDOW:
+            self.requests.popleft()
+        while self.tokens and now - self.tokens[0][0] >= RATE_WINDOW:
+            self.token_total -= self.tokens.popleft()[1]
+
+    def admit(self, tokens):
+        """Registra el request y devuelve None, o los segundos hasta que entraría."""
+        now = time.monotonic()
+        self._expire(now)
+        if self.rpm and len(self.requests) >= self.rpm:
+            return RATE_WINDOW - (now - self.requests[0])
+        if self.tpm and self.tokens and self.token_total + tokens > self.tpm:
+            # Espera hasta que salga de la ventana lo suficiente para que quepa este request
+            excess = self.token_total + tokens - self.tpm
+            for ts, count in self.tokens:
+                excess -= count
+                if excess <= 0:
+                    return RATE_WINDOW - (now - ts)
+        self.requests.append(now)
+        self.add(tokens)
+        return None
+
+    def add(self, tokens):
+        if tokens:
+            self.tokens.append((time.monotonic(), tokens))
+            self.token_total += tokens
+
+
+def _read_records(path):
+    if path.endswith(".jsonl"):
+        return list(read_jsonl(path))
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class Replay:
+    """Respuestas grabadas: evaluaciones de un output (``output-gemini-images.json``,
+    ``output-classify-score.json``, ``classified_files.json`` o su JSONL) y
+    tokens de ``token-usage.json``. Como el participant_id sale del contenido
+    del CV, correr contra el mismo corpus devuelve los mismos puntajes y el
+    mismo uso de tokens; lo que no está grabado se inventa como siempre."""
+
+    def __init__(self, result_files=(), usage_files=()):
+        self.evaluations = {}
+        self.classifications = {}
+        self.usage = {}
+        for path in result_files:
+            for record in _read_records(path):
+                if record.get("participant_id"):
+                    self.evaluations[record["participant_id"]] = record
+                elif record.get("filename"):
+                    self.classifications[record["filename"]] = record
+        for path in usage_files:
+            for row in _read_records(path):
+                # Un CV reintentado aparece varias veces: vale el último intento
+                if row.get("participant_id"):
+                    self.usage[row["participant_id"]] = row
+
+    def evaluation(self, participant_id, joint):
+        record = self.evaluations.get(participant_id)
+        # Solo si la forma grabada es la que espera el request (con o sin puntajes por puesto)
+        if record is None or ("scores" in record) != joint or (not joint and "score" not in record):
+            return None
+        return record
+
+    def classification(self, filename):
+        return self.classifications.get(filename)
+
+    def tokens(self, participant_ids):
+        # (prompt, respuesta) del batch, solo si están grabados todos sus CVs
+        rows = [self.usage.get(participant_id) for participant_id in participant_ids]
+        if not rows or None in rows:
+            return None
+        return (sum(row.get("prompt_tokens", 0) for row in rows),
+                sum(row.get("response_tokens", 0) for row in rows))
+
+
+class _Stream:
+    # Respuesta server-sent events: se escribe evento por evento, separados por ``interval``.
+    # Con ``cut_after`` la conexión se cierra después de ese número de eventos
+    def __init__(self, events, interval, cut_after=None):
+        self.events = events
+        self.interval = interval
+        self.cut_after = cut_after
+
+
+class MockProviderServer:
+    def __init__(self, host="127.0.0.1", port=0, behaviour=None, seed=None, replay=None):
+        self.host = host
+        self.port = port
+        self.behaviour = {provider: dict(DEFAULT_BEHAVIOUR) for provider in ("openai", "anthropic", "gemini")}
+        for provider, overrides in (behaviour or {}).items():
+            self.behaviour[provider].update(overrides)
+        self.random = random.Random(seed)
+        self.replay = replay
+        self.rate_windows = {provider: _RateWindow(b["rpm"], b["tpm"]) for provider, b in self.behaviour.items()}
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "in_flight": 0, "max_in_flight": 0,
+                      "cache_hits": 0, "cache_writes": 0, "streams_cut": 0}
+        # Prefijos ya vistos (OpenAI / Anthropic) y cachedContents creados (Gemini)
+        self.prefix_cache = set()
+        self.cached_contents = {}
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, value = line.decode("latin-1").split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload, extra_headers = await self._dispatch(method, path, body)
+
+                if isinstance(payload, _Stream):
+                    events = [event.encode("utf-8") for event in payload.events]
+                    content_type, data = "text/event-stream", b"".join(events)
+                else:
+                    content_type, data = "application/json", json.dumps(payload).encode("utf-8")
+                head = [f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}",
+                        f"Content-Type: {content_type}",
+                        f"Content-Length: {len(data)}"]
+                head += [f"{k}: {v}" for k, v in extra_headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+                if isinstance(payload, _Stream):
+                    for event in events[:payload.cut_after]:
+                        writer.write(event)
+                        await writer.drain()
+                        await asyncio.sleep(payload.interval)
+                    if payload.cut_after is not None:
+                        # El body queda más corto que su Content-Length, como cuando se cae la conexión
+                        break
+                else:
+                    writer.write(data)
+                await writer.drain()
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, body):
+        path = path.split("?", 1)[0]
+        if path == STATS_PATH:
+            return 200, self.stats, {}
+        if path.startswith(GEMINI_CACHE_PATH):
+            return self._gemini_cached_content(method, path, json.loads(body or b"{}"))
+        if method != "POST":
+            return 404, {"error": {"message": "not found"}}, {}
+
+        request = json.loads(body or b"{}")
+        if path.endswith("/chat/completions"):
+            provider = "openai"
+        elif path.endswith("/messages"):
+            provider = "anthropic"
+        elif GEMINI_PATH_RE.match(path):
+            provider = "gemini"
+            if GEMINI_PATH_RE.match(path).group("method") == "streamGenerateContent":
+                request["stream"] = True
+        else:
+            return 404, {"error": {"message": f"unknown path {path}"}}, {}
+
+        behaviour = self.behaviour[provider]
+        self.stats["requests"] += 1
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        try:
+            text, images = _extract_prompt(provider, request)
+            # Los límites por minuto se aplican al llegar, como en la API real: el 429 no espera la latencia
+            wait = self.rate_windows[provider].admit(len(text) // 4 + images * IMAGE_TOKENS)
+            if wait is not None:
+                self.stats["rate_limited"] += 1
+                return 429, {"error": {"message": "rate limit exceeded (mock rpm/tpm)", "code": 429}}, {
+                    "retry-after": str(max(1, math.ceil(wait)))}
+
+            latency = sample_latency(self.random, behaviour)
+            streaming = bool(request.get("stream"))
+            await asyncio.sleep(latency * STREAM_TTFT_FRACTION if streaming else latency)
+
+            roll = self.random.random()
+            if roll < behaviour["rate_limit_rate"]:
+                self.stats["rate_limited"] += 1
+                return 429, {"error": {"message": "rate limit exceeded", "code": 429}}, {
+                    "retry-after": str(behaviour["retry_after"])}
+            if roll < behaviour["rate_limit_rate"] + behaviour["error_rate"]:
+                self.stats["errors"] += 1
+                return 500, {"error": {"message": "internal error", "code": 500}}, {}
+
+            if behaviour["poison"] and behaviour["poison"] in text:
+                self.stats["errors"] += 1
+                return 400, {"error": {"message": "invalid document in request", "code": 400}}, {}
+            # El prefijo de un cachedContent de Gemini no viaja en el request, pero la respuesta depende de él
+            prefix = self.cached_contents.get(request.get("cachedContent") or "", {}).get("text", "")
+            evaluations = [e for e in _fake_evaluations(prefix + text, self.random, self.replay)
+                           if self.random.random() >= behaviour["drop_rate"]]
+            output = json.dumps(evaluations, ensure_ascii=False)
+            prompt_tokens = len(text) // 4 + images * IMAGE_TOKENS
+            response_tokens = len(output) // 4
+            recorded = self.replay.tokens(list(dict.fromkeys(UUID_RE.findall(text)))) if self.replay else None
+            if recorded:
+                prompt_tokens, response_tokens = recorded
+            self.rate_windows[provider].add(response_tokens)
+            generation = response_tokens * behaviour["latency_per_token"]
+
+            cache = self._prompt_cache(provider, request, behaviour)
+            if cache is None:
+                return 404, {"error": {"message": "cachedContent not found", "code": 404}}, {}
+            prompt_tokens += cache.get("stored", 0)
+            if streaming:
+                events = _render_stream(provider, request, output, prompt_tokens, response_tokens, cache)
+                cut_after = None
+                if behaviour["stream_cut_rate"] and self.random.random() < behaviour["stream_cut_rate"]:
+                    # Se corta a la mitad: el cliente ya recibió parte del texto
+                    self.stats["streams_cut"] += 1
+                    cut_after = max(1, len(events) // 2)
+                interval = (latency * (1 - STREAM_TTFT_FRACTION) + generation) / len(events)
+                return 200, _Stream(events, interval, cut_after), {}
+            await asyncio.sleep(generation)
+            return 200, _render_response(provider, request, output, prompt_tokens, response_tokens, cache), {}
+        finally:
+            self.stats["in_flight"] -= 1
+
+    def _prompt_cache(self, provider, request, behaviour):
+        # Devuelve {"read": n, "write": n, "stored": n}; "stored" son tokens que vienen del
+        # cachedContent de Gemini y no del cuerpo del request. None si el cachedContent no existe.
+        if provider == "gemini":
+            name = request.get("cachedContent")
+            if not name:
+                return {}
+            entry = self.cached_contents.get(name)
+            if entry is None:
+                return None
+            self.stats["cache_hits"] += 1
+            return {"read": entry["tokens"], "stored": entry["tokens"]}
+
+        prefix = _cache_prefix(provider, request)
+        if prefix is None or len(prefix) // 4 < max(1, behaviour["cache_min_tokens"]):
+            return {}
+        tokens = len(prefix) // 4
+        key = (provider, request.get("model"), prefix)
+        if key in self.prefix_cache:
+            self.stats["cache_hits"] += 1
+            return {"read": tokens}
+        self.prefix_cache.add(key)
+        self.stats["cache_writes"] += 1
+        return {"write": tokens}
+
+    def _gemini_cached_content(self, method, path, request):
+        if method == "DELETE":
+            self.cached_contents.pop(path[len("/v1beta/"):], None)
+            return 200, {}, {}
+        if method != "POST":
+            return 404, {"error": {"message": "not found"}}, {}
+
+        text = "".join(part.get("text", "") for content in request.get("contents", [])
+                       for part in content.get("parts", []))
+        tokens = len(text) // 4
+        if tokens < self.behaviour["gemini"]["cache_min_tokens"]:
+            return 400, {"error": {"message": "Cached content is too small", "code": 400}}, {}
+        name = f"cachedContents/mock-{len(self.cached_contents) + 1}-{time.time_ns()}"
+        self.cached_contents[name] = {"tokens": tokens, "model": request.get("model"), "text": text}
+        self.stats["cache_writes"] += 1
+        return 200, {"name": name, "model": request.get("model"), "usageMetadata": {"totalTokenCount": tokens}}, {}
+
+
+def _extract_prompt(provider, request):
+    texts = []
+    images = 0
+    if provider == "gemini":
+        for content in request.get("contents", []):
+            for part in content.get("parts", []):
+                if "text" in part:
+                    texts.append(part["text"])
+                else:
+                    images += 1
+        return "".join(texts), images
+
+    for message in request.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            texts.append(content)
+            continue
+        for block in content or []:
+            if block.get("type") == "text":
+                texts.append(block["text"])
+            else:
+                images += 1
+    return "".join(texts), images
+
+
+def _cache_prefix(provider, request):
+    # OpenAI cachea el primer bloque de texto; Anthropic, todo hasta el último cache_control
+    messages = request.get("messages", [])
+    content = messages[0].get("content") if messages else None
+    if not isinstance(content, list):
+        return None
+    if provider == "openai":
+        return next((block["text"] for block in content if block.get("type") == "text"), None)
+
+    prefix = None
+    texts = []
+    for block in content:
+        texts.append(block.get("text", "") if block.get("type") == "text" else json.dumps(block.get("source")))
+        if block.get("cache_control"):
+            prefix = "".join(texts)
+    return prefix
+
+
+# Modo conjunto (clasificar y evaluar): cada descripción se presenta como "[job_id] (tipo de puesto: X)"
+JOINT_JOB_RE = re.compile(r"^\[([^\]\n]+)\] \(tipo de puesto: ([^)\n]+)\)$", re.MULTILINE)
+CLASSIFIER_CV_RE = re.compile(r"CV ([^\s:]+\.\w+):")
+MOCK_OTHER_JOB_TYPE = "Psicología"
+
+
+def _fake_evaluations(text, rng, replay=None):
+    jobs = JOINT_JOB_RE.findall(text)
+    filenames = list(dict.fromkeys(CLASSIFIER_CV_RE.findall(text)))
+    if filenames and not UUID_RE.search(text):
+        # cv_classifier: un objeto por archivo
+        return [(replay and replay.classification(filename)) or {
+            "filename": filename,
+            "participant_name": f"Candidato {i}",
+            "job_type": rng.choice([MOCK_OTHER_JOB_TYPE] + [job_type for _, job_type in jobs]),
+        } for i, filename in enumerate(filenames)]
+
+    ids = list(dict.fromkeys(UUID_RE.findall(text))) or ["unknown"]
+    if replay:
+        recorded = {participant_id: replay.evaluation(participant_id, bool(jobs)) for participant_id in ids}
+        if all(recorded.values()):
+            return [recorded[participant_id] for participant_id in ids]
+    if jobs:
+        evaluations = []
+        for i, participant_id in enumerate(ids):
+            job_type = rng.choice([MOCK_OTHER_JOB_TYPE] + [job_type for _, job_type in jobs])
+            evaluations.append({
+                "participant_id": participant_id,
+                "participant_name": f"Candidato {i}",
+                "job_type": job_type,
+                "scores": [{
+                    "job_id": job_id,
+                    "score": rng.randint(0, 100),
+                    "reasons": ["Evaluación simulada por el servidor mock."],
+                } for job_id, family in jobs if family == job_type],
+            })
+        return evaluations
+    return [{
+        "participant_id": participant_id,
+        "score": rng.randint(0, 100),
+        "reasons": ["Evaluación simulada por el servidor mock."],
+    } for participant_id in ids]
+
+
+def _render_response(provider, request, output, prompt_tokens, response_tokens, cache):
+    if provider == "openai":
+        return {
+            "id": f"chatcmpl-mock-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": output}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": response_tokens,
+                      "total_tokens": prompt_tokens + response_tokens,
+                      "prompt_tokens_details": {"cached_tokens": cache.get("read", 0)}},
+        }
+    if provider == "anthropic":
+        return {
+            "id": f"msg_mock_{time.time_ns()}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "mock"),
+            "content": [{"type": "text", "text": output}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": prompt_tokens - cache.get("read", 0) - cache.get("write", 0),
+                      "cache_read_input_tokens": cache.get("read", 0),
+                      "cache_creation_input_tokens": cache.get("write", 0),
+                      "output_tokens": response_tokens},
+        }
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": output}]},
+                        "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": response_tokens,
+                          "cachedContentTokenCount": cache.get("read", 0),
+                          "totalTokenCount": prompt_tokens + response_tokens},
+    }
+
+
+def _render_stream(provider, request, output, prompt_tokens, response_tokens, cache):
+    pieces = [output[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(output), STREAM_CHUNK_CHARS)] or [""]
+    full = _render_response(provider, request, output, prompt_tokens, response_tokens, cache)
+
+    if provider == "openai":
+        base = {"id": full["id"], "object": "chat.completion.chunk", "created": full["created"], "model": full["model"]}
+        chunks = [dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                  for piece in pieces]
+        chunks.append(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        chunks.append(dict(base, choices=[], usage=full["usage"]))
+        return [f"data: {json.dumps(c, ensure_ascii=False)}\n\n" for c in chunks] + ["data: [DONE]\n\n"]
+
+    if provider == "anthropic":
+        message = dict(full, content=[], stop_reason=None, usage=dict(full["usage"], output_tokens=1))
+        events = [("message_start", {"type": "message_start", "message": message}),
+                  ("content_block_start", {"type": "content_block_start", "index": 0,
+                                           "content_block": {"type": "text", "text": ""}})]
+        events += [("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                            "delta": {"type": "text_delta", "text": piece}}) for piece in pieces]
+        events += [("content_block_stop", {"type": "content_block_stop", "index": 0}),
+                   ("message_delta", {"type": "message_delta",
+                                      "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                      "usage": {"output_tokens": response_tokens}}),
+                   ("message_stop", {"type": "message_stop"})]
+        return [f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n" for name, data in events]
+
+    chunks = [{"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}, "index": 0}]}
+              for piece in pieces]
+    chunks[-1]["candidates"][0]["finishReason"] = "STOP"
+    chunks[-1]["usageMetadata"] = full["usageMetadata"]
+    return [f"data: {json.dumps(c, ensure_ascii=False)}\n\n" for c in chunks]
+
+
+async def _serve(args):
+    behaviour = {provider: {
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "latency_dist": args.latency_dist,
+        "latency_per_token": args.latency_per_token,
+        "retry_after": args.retry_after,
+        "rpm": args.rpm,
+        "tpm": args.tpm,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "drop_rate": args.drop_rate,
+        "cache_min_tokens": args.cache_min_tokens,
+        "poison": args.poison,
+        "stream_cut_rate": args.stream_cut_rate,
+    } for provider in ("openai", "anthropic", "gemini")}
+    replay = Replay(args.replay, args.replay_usage) if args.replay or args.replay_usage else None
+    server = MockProviderServer(args.host, args.port, behaviour, seed=args.seed, replay=replay)
+    await server.start()
+    print(f"🧪 Mock provider escuchando en {server.url}")
+    if replay:
+        print(f"📼 Replay: {len(replay.evaluations) + len(replay.classifications)} resultados, "
+              f"{len(replay.usage)} filas de uso")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor mock de OpenAI, Anthropic y Gemini")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=DEFAULT_BEHAVIOUR["latency"])
+    parser.add_argument("--jitter", type=float, default=DEFAULT_BEHAVIOUR["jitter"])
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default=DEFAULT_BEHAVIOUR["latency_dist"])
+    parser.add_argument("--latency-per-token", type=float, default=0.0,
+                        help="segundos extra por token de respuesta")
+    parser.add_argument("--rpm", type=int, help="requests por minuto por proveedor antes de devolver 429")
+    parser.add_argument("--tpm", type=int, help="tokens por minuto por proveedor antes de devolver 429")
+    parser.add_argument("--retry-after", type=int, default=DEFAULT_BEHAVIOUR["retry_after"],
+                        help="Retry-After de los 429 aleatorios (--rate-limit-rate)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--cache-min-tokens", type=int, default=0)
+    parser.add_argument("--poison", help="texto que hace fallar con 400 cualquier request que lo contenga")
+    parser.add_argument("--stream-cut-rate", type=float, default=0.0,
+                        help="probabilidad de cortar la conexión a mitad de una respuesta en streaming")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--replay", action="append", default=[], metavar="OUTPUT",
+                        help="responder con las evaluaciones grabadas en este output (JSON o JSONL); repetible")
+    parser.add_argument("--replay-usage", action="append", default=[], metavar="TOKEN_USAGE",
+                        help="informar los tokens grabados en este token-usage (JSON o JSONL); repetible")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,119 @@
+import json
+
+from result_sink import DetailLog
+
+# Puntajes de triage dentro de esta banda (inclusive) se vuelven a evaluar con el modelo fuerte
+UNCERTAINTY_BAND = (35, 70)
+# Fracción de las decisiones "claras" del triage que igual se revisan para medir el acuerdo
+AGREEMENT_SAMPLE_RATE = 0.05
+# Un CV pasa si su puntaje llega a PASS_SCORE; dos puntajes "coinciden" si difieren hasta AGREEMENT_TOLERANCE
+PASS_SCORE = 50
+AGREEMENT_TOLERANCE = 10
+
+
+def parse_band(spec):
+    low, high = (int(value) for value in spec.split(":"))
+    return low, high
+
+
+class Cascade:
+    """Cascada de dos modelos: el de triage evalúa todo y el de revisión solo los
+    puntajes dudosos (dentro de ``band``). Sobre una muestra determinística de
+    las decisiones claras también corre la revisión, solo para medir el acuerdo
+    entre ambos modelos; ahí la decisión del triage se mantiene.
+
+    El acuerdo se acumula en totales; cada par triage/revisión se escribe en
+    ``pairs_file`` (JSONL) apenas llega, si se indica."""
+
+    def __init__(self, provider, model, band=UNCERTAINTY_BAND, sample_rate=AGREEMENT_SAMPLE_RATE, pairs_file=None):
+        self.provider = provider
+        self.model = model
+        self.band = band
+        self.sample_rate = sample_rate
+        self.pairs_file = pairs_file
+        self.triaged = 0
+        self.escalated = 0
+        # Totales por tipo de par: muestra de decisiones claras (False) y escalados (True)
+        self._agreement_totals = {escalated: {"pairs": 0, "same_decision": 0, "within_tolerance": 0, "abs_diff": 0}
+                                  for escalated in (False, True)}
+        self._log = DetailLog(pairs_file)
+
+    @classmethod
+    def from_args(cls, review, band=None, sample_rate=None, pairs_file=None):
+        # review = "proveedor:modelo", p. ej. "openai:o4-mini"
+        provider, model = review.split(":", 1)
+        return cls(provider, model,
+                   parse_band(band) if band else UNCERTAINTY_BAND,
+                   AGREEMENT_SAMPLE_RATE if sample_rate is None else sample_rate,
+                   pairs_file)
+
+    def key(self, triage_model):
+        # La evaluación final depende de ambos modelos y de la banda
+        return f"{triage_model}>{self.provider}:{self.model}@{self.band[0]}-{self.band[1]}"
+
+    def escalate(self, evaluation):
+        self.triaged += 1
+        uncertain = self.band[0] <= evaluation["score"] <= self.band[1]
+        self.escalated += uncertain
+        return uncertain
+
+    def sampled(self, cv):
+        # Por hash de contenido: el mismo CV cae siempre del mismo lado de la muestra
+        return int(cv["sha256"][:8], 16) / 0xFFFFFFFF < self.sample_rate
+
+    def record(self, cv, triage, review, escalated):
+        diff = abs(triage["score"] - review["score"])
+        totals = self._agreement_totals[bool(escalated)]
+        totals["pairs"] += 1
+        totals["same_decision"] += (triage["score"] >= PASS_SCORE) == (review["score"] >= PASS_SCORE)
+        totals["within_tolerance"] += diff <= AGREEMENT_TOLERANCE
+        totals["abs_diff"] += diff
+        self._log.write({
+            "participant_id": cv["id"],
+            "filename": cv["filename"],
+            "escalated": escalated,
+            "triage_score": triage["score"],
+            "review_score": review["score"],
+        })
+
+    def _agreement(self, escalated):
+        totals = self._agreement_totals[escalated]
+        pairs = totals["pairs"]
+        if not pairs:
+            return {"pairs": 0}
+        return {
+            "pairs": pairs,
+            "decision_agreement": round(totals["same_decision"] / pairs, 4),
+            "within_tolerance": round(totals["within_tolerance"] / pairs, 4),
+            "mean_abs_diff": round(totals["abs_diff"] / pairs, 2),
+        }
+
+    def summary(self):
+        return {
+            "review_model": f"{self.provider}:{self.model}",
+            "band": list(self.band),
+            "triaged": self.triaged,
+            "escalated": self.escalated,
+            "escalation_rate": round(self.escalated / self.triaged, 4) if self.triaged else 0.0,
+            # Muestra de decisiones claras: mide si el triage se equivoca fuera de la banda
+            "agreement_sample": self._agreement(False),
+            # Dentro de la banda: cuánto cambia el modelo fuerte lo que dijo el triage
+            "agreement_escalated": self._agreement(True),
+        }
+
+    def print_summary(self):
+        s = self.summary()
+        print(f"🪜 Cascada: {s['escalated']}/{s['triaged']} CVs escalados a {self.model} "
+              f"(banda {self.band[0]}-{self.band[1]})")
+        sample = s["agreement_sample"]
+        if sample["pairs"]:
+            print(f"🤝 Acuerdo en la muestra ({sample['pairs']} CVs): {sample['decision_agreement']:.0%} misma decisión, "
+                  f"diferencia media {sample['mean_abs_diff']} puntos")
+
+    def save(self, path):
+        self._log.flush()
+        with open(path, "w") as f:
+            json.dump({"summary": self.summary(), "pairs_file": self.pairs_file}, f, indent=2, ensure_ascii=False)
+
+    def close(self):
+        self._log.close()
@@ -0,0 +1,547 @@
+import asyncio
+import itertools
+import os
+import time
+
+from async_engine import AsyncEngine
+from batch_jobs import BatchJobs, batch_service, request_line
+from cv_dedup import DuplicateIndex
+from cv_ingest import batched, iter_cv_documents, iter_cv_files
+from cv_prerank import Shortlist, load_labels
+from cv_routing import RoutingReport
+from dead_letter import DeadLetter, bisect_batch
+from metrics import METRICS_FILE, METRICS_SUMMARY_FILE, registry as metrics
+from model_cascade import Cascade
+from response_cache import ResponseCache, hash_text, participant_id_for
+from result_sink import JsonlSink, TeeSink, export_json_array, import_json_array, rotate_outputs
+from results_store import ResultsStore
+from scoring_prompt import EvaluationStreamParser, validate
+from token_budget import BatchPacker, TokenCounter
+from work_manifest import WATCH_INTERVAL, PathStream, WorkManifest, run_passes, settled_paths
+
+# Corrida común a todos los scorers: cada script solo aporta el prompt, el loader de
+# documentos y el parser de la respuesta (ver text_scorer.py, poc_gemini_images.py,
+# poc_classify_and_score.py y cv_classifier.py)
+
+MAX_IN_FLIGHT = 4
+# Rondas extra para los CVs cuya evaluación no volvió (o volvió inválida o repetida)
+MAX_REQUEUE_ROUNDS = 2
+# Con revisión, la banda dudosa (texto o imágenes) espera en memoria a la revisión: la
+# pasada se corta en tramos de esta cantidad de CVs para que esa cola no crezca con el corpus
+REVIEW_CHUNK_CVS = 2000
+# Cada script antepone su prefijo (p. ej. "classifier-") a los reportes y las métricas
+ROUTING_REPORT_FILE = "routing-report.json"
+DUPLICATES_REPORT_FILE = "duplicates-report.json"
+PRERANK_REPORT_FILE = "prerank-report.json"
+CASCADE_REPORT_FILE = "cascade-report.json"
+# Detalle de cada reporte (una línea por CV), escrito a medida que avanza la corrida
+ROUTING_DECISIONS_FILE = "routing-decisions.jsonl"
+DUPLICATES_MEMBERS_FILE = "duplicates-members.jsonl"
+PRERANK_RANKING_FILE = "prerank-ranking.jsonl"
+CASCADE_PAIRS_FILE = "cascade-pairs.jsonl"
+
+
+def pending_cvs(documents, cache, cache_key, routing, manifest, duplicates, store, from_cache, copy_done):
+    # Solo se vuelven a enviar los CVs cuyo modelo, prompt, puesto o contenido cambió
+    # Corre en el thread de ingesta mientras el event loop escribe en los mismos objetos
+    # (finish, fail, copy_row): cada uno protege su estado con su propio lock
+    for doc in documents:
+        if "error" in doc:
+            print(f"❌ Error leyendo {doc['filename']}: {doc['error']}")
+            continue
+        key = cache_key(doc["sha256"])
+        doc["cache_key"] = key
+        if not manifest.should_process(doc["sha256"]):
+            # El mismo contenido ya terminó con otro nombre de archivo (en esta corrida o en una
+            # anterior): el archivo nuevo recibe una copia de esa fila en lugar de desaparecer
+            if manifest.is_done(doc["sha256"]) and not manifest.is_known(doc["path"]):
+                store.add_documents([doc])
+                copy_done(doc)
+            continue
+        store.add_documents([doc])
+
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"♻️ Desde caché: {doc['filename']}")
+            from_cache(doc, cached)
+            continue
+
+        # De cada grupo de duplicados se evalúa un solo CV; el resto recibe una copia de su resultado
+        # Primero pending: si el representante ya tiene resultado, la copia lo marca done en el acto
+        manifest.mark_pending(doc)
+        if duplicates.assign(doc):
+            continue
+
+        # Los PDFs escaneados y las imágenes van en el mismo batch, como imágenes inline
+        tokens = routing.record(doc)
+        yield {
+            "id": participant_id_for(doc["sha256"]),
+            "path": doc["path"],
+            "filename": doc["filename"],
+            "sha256": doc["sha256"],
+            "text": doc.get("text"),
+            "inline_data": doc.get("inline_data"),
+            "route": doc["route"],
+            "image_stats": doc.get("image_stats"),
+            "tokens": tokens,
+            "cache_key": key,
+        }
+
+
+def usage_row(batch_id, batch, usage):
+    # Sin archivo de uso de tokens: una fila por request va al store de resultados
+    return {
+        "batch_id": batch_id,
+        "batch_size": len(batch),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "prompt_tokens_cached": usage.get("cached_tokens"),
+        "response_tokens": usage.get("response_tokens"),
+        "total_tokens": usage.get("total_tokens"),
+    }
+
+
+def split_usage(batch_id, cvs, usage, base_tokens):
+    # Una fila por CV enviado: el prompt base se reparte en partes iguales y el resto del
+    # prompt en proporción a los tokens estimados de cada CV. Un CV reencolado aparece una
+    # vez por intento, porque cada intento se factura.
+    cv_prompt_tokens = (usage.get("prompt_tokens") or 0) - base_tokens
+    estimated = sum(cv["tokens"] for cv in cvs) or 1
+    local = round(base_tokens / len(cvs))
+    response = round((usage.get("response_tokens") or 0) / len(cvs))
+    cached = round((usage.get("cached_tokens") or 0) / len(cvs))
+    rows = []
+    for cv in cvs:
+        cv_tokens = round(cv_prompt_tokens * cv["tokens"] / estimated)
+        rows.append({
+            "participant_id": cv["id"],
+            "batch_id": batch_id,
+            "batch_size": len(cvs),
+            "prompt_tokens": local + cv_tokens,
+            "prompt_tokens_local": local,
+            "prompt_tokens_cached": cached,
+            "prompt_tokens_image": cv_tokens if cv["route"] == "image" else 0,
+            "prompt_tokens_text": cv_tokens if cv["route"] == "text" else 0,
+            "image_tokens_saved": cv["image_stats"]["tokens_saved"] if cv["route"] == "image" else 0,
+            "route": cv["route"],
+            "response_tokens": response,
+            "total_tokens": local + cv_tokens + response,
+        })
+    return rows
+
+
+class BatchResponse:
+    """Lleva los objetos de una respuesta a los CVs de su batch. Cada objeto se
+    valida contra el esquema del prompt y se entrega apenas llega; los IDs
+    desconocidos o repetidos se descartan, y los de ``ignored`` se saltean."""
+
+    def __init__(self, source, batch, parser, schema, deliver, ignored=()):
+        self.source = source
+        self.parser = parser
+        self.schema = schema
+        self.deliver = deliver
+        self.ignored = set(ignored)
+        self.by_label = {parser.label(cv): cv for cv in batch}
+        self.saved = set()
+
+    def accept(self, record):
+        errors = validate(record, self.schema)
+        if errors:
+            print(f"⚠️ Evaluación inválida descartada ({self.source}): {'; '.join(errors)}")
+            return False
+        label = record[self.parser.key].strip()
+        if label in self.ignored:
+            return False
+        if label not in self.by_label or label in self.saved:
+            print(f"⚠️ ID desconocido o repetido descartado ({self.source}): {label!r}")
+            return False
+        self.saved.add(label)
+        record[self.parser.key] = label
+        cv = self.by_label[label]
+        self.deliver(cv, self.parser.row(record, cv))
+        return True
+
+    def missing(self):
+        return [cv for label, cv in self.by_label.items() if label not in self.saved]
+
+
+async def run_pipeline(prompt, loader, parser, provider, model, cv_dir, output_json_file, token_usage_file=None,
+                       report_prefix="", max_in_flight=MAX_IN_FLIGHT, max_cvs=None, max_tokens=None,
+                       temperature=None, watch=False, interval=WATCH_INTERVAL, top_k=None, min_score=None,
+                       labels_file=None, review=None, band=None, agreement_sample=None, cv_paths=None,
+                       workers=None, prefetch=None, batch=None):
+    """Evalúa los CVs de ``cv_dir`` (o solo ``cv_paths``) con ``prompt`` y
+    deja una fila por CV en ``output_json_file``.
+
+    ``loader`` lee cada archivo en el pool de ingesta (ver ``iter_cv_documents``)
+    y ``parser`` convierte cada objeto de la respuesta en la fila de su CV (ver
+    ``EvaluationParser``). Con ``token_usage_file`` el uso de tokens se reparte
+    por CV en ese JSON; si no, va una fila por request al store."""
+    # Latencia por etapa, throughput y 429s; se actualizan tras cada pasada (y se sirven si hay METRICS_PORT)
+    metrics.export_to(report_prefix + METRICS_FILE, report_prefix + METRICS_SUMMARY_FILE)
+    cache = ResponseCache()
+    schema = prompt.schema["items"]
+
+    # Los batches se arman por presupuesto de tokens, con max_cvs como tope opcional
+    counter = TokenCounter(provider, model)
+    base_tokens = counter.count(prompt.base)
+    packer = BatchPacker(model, base_tokens, response_tokens_per_cv=prompt.response_tokens_per_cv, max_cvs=max_cvs)
+    routing = RoutingReport(counter, report_prefix + ROUTING_DECISIONS_FILE)
+    # Preselección BM25 opcional: los CVs claramente ajenos al puesto no llegan al LLM
+    shortlist = Shortlist(prompt.job_description, top_k, min_score,
+                          load_labels(labels_file) if labels_file else None, report_prefix + PRERANK_RANKING_FILE)
+
+    # Segundo nivel opcional: review="proveedor:modelo" reevalúa la banda dudosa con un modelo más fuerte
+    cascade = (Cascade.from_args(review, band, agreement_sample, report_prefix + CASCADE_PAIRS_FILE)
+               if review else None)
+    if batch and cascade:
+        raise ValueError("--batch no se combina con --review: la revisión depende del resultado del triage")
+    result_model = cascade.key(model) if cascade else model
+    if cascade:
+        review_counter = TokenCounter(cascade.provider, cascade.model)
+        review_packer = BatchPacker(cascade.model, review_counter.count(prompt.base),
+                                    response_tokens_per_cv=prompt.response_tokens_per_cv, max_cvs=max_cvs)
+
+    # Estado por CV: si la corrida se corta, la siguiente retoma solo lo que falta
+    output_base = os.path.splitext(output_json_file)[0]
+    manifest = WorkManifest(output_base + ".manifest.jsonl", context=hash_text(
+        f"{result_model}|{prompt.template_hash}|{prompt.input_hash}{shortlist.context}"))
+
+    # Cada resultado se agrega como una línea a medida que llega; el JSON de siempre se exporta tras cada pasada
+    output_jsonl_file = output_base + ".jsonl"
+    outputs = [(output_json_file, output_jsonl_file)]
+    if token_usage_file:
+        token_usage_jsonl_file = os.path.splitext(token_usage_file)[0] + ".jsonl"
+        outputs.append((token_usage_file, token_usage_jsonl_file))
+    for json_file, jsonl_file in outputs:
+        if manifest.fresh:
+            # Contexto nuevo (modelo, prompt o puesto) o primera corrida: las evaluaciones y el uso
+            # anteriores se guardan aparte con fecha, en lugar de pisarlos o mezclarlos con los nuevos
+            rotate_outputs(json_file, jsonl_file)
+        else:
+            import_json_array(json_file, jsonl_file)
+    # Las mismas filas van al store SQLite, indexado por puesto y puntaje para las consultas de shortlist
+    output_name = os.path.basename(output_json_file)
+    store = ResultsStore()
+    if manifest.fresh:
+        store.clear(output_name)
+    run_id = store.start_run(output_name, provider, result_model, manifest.context)
+    sink = TeeSink(JsonlSink(output_jsonl_file, truncate=manifest.fresh), store.sink(run_id, output_name, prompt.job_id))
+    usage_sink = None
+    if token_usage_file:
+        usage_sink = TeeSink(JsonlSink(token_usage_jsonl_file), store.sink(run_id, token_usage_file, usage=True))
+    # Lo que falla aun solo (tras reintentos y división del batch) queda registrado aparte
+    dead_letter = DeadLetter(output_base + ".dead-letter.jsonl")
+    batch_numbers = itertools.count(1)
+
+    def cache_key(sha256):
+        return cache.key(result_model, prompt.template_hash, prompt.input_hash, sha256)
+
+    def copy_row(member, row):
+        row = parser.copy(row, member)
+        if row is not None:
+            sink.write(row)
+            # Un duplicado exacto comparte la clave de caché con su representante: no la pisa
+            if member["match"] != "exact":
+                cache.put(member["cache_key"], row)
+        manifest.mark_done(member)
+
+    duplicates = DuplicateIndex(copy_row, manifest.mark_failed,
+                                members_file=report_prefix + DUPLICATES_MEMBERS_FILE)
+
+    def from_cache(doc, row):
+        # La fila cacheada puede ser de otro archivo con el mismo contenido: lleva el nombre de este
+        sink.write(parser.copy(row, doc))
+        manifest.mark_done(doc)
+        # Queda como representante resuelto: sus duplicados de esta corrida reciben una copia
+        duplicates.seed(doc, row)
+
+    def copy_done(doc):
+        if not duplicates.has_result(doc["sha256"]):
+            # Terminado en una corrida anterior: la fila del representante sale de la caché
+            row = cache.get(doc["cache_key"])
+            if row is None:
+                return
+            duplicates.seed(doc, row, row.get("filename"))
+        duplicates.assign(doc)
+
+    def finish(cv, row):
+        sink.write(row)
+        cache.put(cv["cache_key"], row)
+        manifest.mark_done(cv)
+        duplicates.resolve(cv["sha256"], row)
+
+    def fail(cv, error, batch_size=None):
+        print(f"❌ Error procesando {cv['filename']}: {error}")
+        manifest.mark_failed(cv, error)
+        duplicates.fail(cv["sha256"], error)
+        dead_letter.add(cv, error, batch_size)
+
+    def add_usage(batch_id, batch, usage):
+        if usage_sink is not None:
+            usage_sink.write_many(split_usage(batch_id, batch, usage, base_tokens))
+        else:
+            store.add_usage(run_id, [usage_row(batch_id, batch, usage)])
+
+    # Cascada: el modelo de triage evalúa todo y el de revisión solo la banda dudosa
+    review_queue = []
+
+    def decide(cv, evaluation):
+        if cascade is None:
+            finish(cv, evaluation)
+            return
+        if cascade.escalate(evaluation):
+            cv["triage"] = evaluation
+            review_queue.append(cv)
+            return
+        finish(cv, dict(evaluation, decided_by="triage", model=model))
+        if cascade.sampled(cv):
+            # Las decisiones claras de la muestra se reevalúan solo para medir el acuerdo
+            review_queue.append(dict(cv, triage=evaluation, sample=True))
+
+    def settle_review(cv, evaluation):
+        cascade.record(cv, cv["triage"], evaluation, escalated=not cv.get("sample"))
+        if not cv.get("sample"):
+            finish(cv, dict(evaluation, decided_by="review", model=cascade.model,
+                            triage_score=cv["triage"]["score"]))
+
+    def fail_review(cv, error, batch_size=None):
+        # Sin revisión queda la decisión del triage, marcada para poder volver a correrla
+        if not cv.get("sample"):
+            finish(cv, dict(cv["triage"], decided_by="triage", model=model, review_error=str(error)))
+
+    async with AsyncEngine(provider, model, max_in_flight=max_in_flight) as engine:
+
+        async def score_batch(batch, engine, counter, packer, deliver, on_missing, temperature=None):
+            # Lanza si la llamada falla; lo que llegó por streaming antes del error ya está entregado
+            i = next(batch_numbers)
+            parts = prompt.parts(batch)
+            text = "".join(part for part in parts if isinstance(part, str))
+            image_tokens = sum(cv["tokens"] for cv in batch if cv["inline_data"])
+
+            print(f"\n▶️ Procesando batch {i} con {len(batch)} CVs ({engine.model})...")
+
+            cv_token_counts = [cv["tokens"] for cv in batch]
+            average_tokens = sum(cv_token_counts) / len(cv_token_counts)
+
+            print("📄 Tokens per CV:", cv_token_counts)
+            print(f"📊 Average tokens per CV: {average_tokens:.2f}")
+
+            total_input_tokens = counter.count(text) + image_tokens
+            print(f"🔢 Tokens in input prompt: {total_input_tokens}")
+
+            response = BatchResponse(f"batch {i}", batch, parser, schema, deliver)
+            stream = EvaluationStreamParser()
+            start = time.monotonic()
+
+            def on_text(delta):
+                # Cada objeto se valida y se guarda apenas se cierra su llave
+                for record in stream.feed(delta):
+                    if response.accept(record) and len(response.saved) == 1:
+                        print(f"⏱️ Primera evaluación del batch {i} a los {time.monotonic() - start:.1f}s")
+
+            try:
+                completion = await engine.generate(
+                    parts,
+                    max_tokens=max_tokens or packer.max_tokens,
+                    temperature=temperature,
+                    response_schema=prompt.schema,
+                    estimated_tokens=total_input_tokens + packer.response_tokens_per_cv * len(batch),
+                    # El prefijo con las instrucciones y el puesto es el mismo en todos los batches de la corrida
+                    cache_prefix=True,
+                    on_text=on_text,
+                )
+            except Exception:
+                print(f"❌ Batch {i} cortado: {len(response.saved)} evaluaciones guardadas, "
+                      f"{len(batch) - len(response.saved)} sin evaluar")
+                raise
+
+            print(f"✅ Respuesta recibida (batch {i}): {len(response.saved)}/{len(batch)} evaluaciones")
+            print(f"📊 Token usage: {completion.usage}")
+            add_usage(i, batch, completion.usage)
+            if completion.usage.get("prompt_tokens"):
+                # Solo la parte de texto del prompt calibra la estimación de caracteres por token
+                counter.observe(len(text), completion.usage["prompt_tokens"] - image_tokens)
+            missing = response.missing()
+            if missing:
+                print(f"⚠️ Batch {i}: {len(missing)} CVs sin evaluación")
+                for cv in missing:
+                    on_missing(cv)
+
+        async def run_batch(batch, engine, counter, packer, deliver, on_missing, on_failed, temperature=None):
+            for cv in batch:
+                # Las muestras de acuerdo ya están terminadas; revisarlas no las reabre
+                if not cv.get("sample"):
+                    manifest.mark_in_flight(cv)
+            delivered = set()
+
+            def keep(cv, evaluation):
+                delivered.add(cv["id"])
+                deliver(cv, evaluation)
+
+            async def attempt(part):
+                # Una mitad solo reenvía los CVs que no llegaron por streaming antes del error
+                part = [cv for cv in part if cv["id"] not in delivered]
+                if part:
+                    await score_batch(part, engine, counter, packer, keep, on_missing, temperature)
+
+            def dead(cv, error, batch_size):
+                # Un error que no divide el batch alcanza también a los que ya llegaron por streaming
+                if cv["id"] not in delivered:
+                    on_failed(cv, error, batch_size)
+
+            # Un batch que falla se divide a la mitad hasta aislar el CV que lo rompe
+            await bisect_batch(batch, attempt, dead)
+
+        async def score_all(batches, engine, counter, packer, deliver, on_failed, temperature=None):
+            # Cada batch en vuelo es una corrutina; el motor regula concurrencia y cuota
+            for round_number in range(MAX_REQUEUE_ROUNDS + 1):
+                requeue = []
+                await engine.run(
+                    lambda batch: run_batch(batch, engine, counter, packer, deliver, requeue.append, on_failed,
+                                            temperature),
+                    batches,
+                )
+                if not requeue or round_number == MAX_REQUEUE_ROUNDS:
+                    break
+                print(f"🔁 Reencolando {len(requeue)} CVs (ronda {round_number + 1})")
+                batches = packer.pack(requeue)
+
+            if requeue:
+                print(f"❌ Sin evaluación tras {MAX_REQUEUE_ROUNDS} reintentos: {[cv['filename'] for cv in requeue]}")
+                for cv in requeue:
+                    on_failed(cv, "sin evaluación tras los reintentos")
+
+        async def review_band(queue):
+            print(f"\n🪜 Revisando {len(queue)} CVs con {cascade.model}")
+            async with AsyncEngine(cascade.provider, cascade.model, max_in_flight=max_in_flight) as review_engine:
+                await score_all(review_packer.pack(queue), review_engine, review_counter, review_packer,
+                                settle_review, fail_review)
+
+        def scan():
+            # Los CVs terminados cuyo archivo no cambió se saltean sin leerlos
+            # cv_paths limita la corrida a una lista dada, p. ej. la preselección del índice de embeddings
+            # La carpeta se recorre de a poco: las rutas se consumen a medida que avanza la ingesta
+            paths = manifest.filter_paths(iter_cv_files(cv_dir) if cv_paths is None else cv_paths)
+            if watch:
+                paths = settled_paths(paths)
+            paths, dropped = shortlist.select(paths, workers=workers)
+            for entry in dropped:
+                manifest.mark_skipped(entry, f"BM25 {entry['score']} (puesto {entry['rank']})")
+            return PathStream(paths), dropped
+
+        def flush():
+            sink.flush()
+            export_json_array(output_jsonl_file, output_json_file)
+            if usage_sink is not None:
+                usage_sink.flush()
+                export_json_array(token_usage_jsonl_file, token_usage_file)
+
+        async def run_pass():
+            paths, dropped = scan()
+            if not paths:
+                return len(dropped)
+
+            try:
+                for chunk in (batched(paths, REVIEW_CHUNK_CVS) if cascade else [paths]):
+                    # Cada CV se extrae una sola vez, en paralelo, y los batches salen a medida que se llenan
+                    documents = iter_cv_documents(chunk, loader=loader, workers=workers, prefetch=prefetch)
+                    cvs = pending_cvs(documents, cache, cache_key, routing, manifest, duplicates, store, from_cache,
+                                      copy_done)
+                    await score_all(packer.iter_batches(cvs, max_in_flight), engine, counter, packer, decide, fail,
+                                    temperature)
+                    if review_queue:
+                        queue = list(review_queue)
+                        review_queue.clear()
+                        await review_band(queue)
+            finally:
+                flush()
+            manifest.print_summary()
+            return paths.count + len(dropped)
+
+        def settle_job_request(batch, completion, error):
+            # Un request de un job de batch: la misma validación que una respuesta por streaming, de una vez
+            # Si la corrida se cortó después de que los resultados llegaron al sink, pero antes de anotar el
+            # job como recogido, al retomar llegan de nuevo: se saltean los CVs que el manifest ya tiene como done
+            done = {parser.label(cv) for cv in batch if manifest.is_done(cv["sha256"])}
+            if len(done) == len(batch):
+                return
+            batch = [cv for cv in batch if parser.label(cv) not in done]
+            if error is not None:
+                # Sin dividir (cada mitad sería otro job): la próxima corrida reintenta estos CVs
+                print(f"❌ Request de batch sin resultado ({len(batch)} CVs): {error}")
+                for cv in batch:
+                    fail(cv, error, len(batch))
+                return
+            for kind in ("prompt", "cached", "response"):
+                if completion.usage.get(f"{kind}_tokens"):
+                    metrics.inc("cv_tokens_total", completion.usage[f"{kind}_tokens"], provider=provider, kind=kind)
+            store.add_usage(run_id, [usage_row(None, batch, completion.usage)])
+            response = BatchResponse("job", batch, parser, schema, finish, ignored=done)
+            for record in EvaluationStreamParser().feed(completion.text):
+                response.accept(record)
+            for cv in response.missing():
+                fail(cv, "sin evaluación en la respuesta", len(batch))
+
+        async def run_batch_pass():
+            # Modo batch: los batches empaquetados van como requests de un job de batch del proveedor
+            paths, dropped = scan()
+            if not paths and not jobs.jobs:
+                return len(dropped)
+
+            # Los CVs de un job enviado antes de un reinicio no se reenvían; ese job solo se recoge
+            outstanding = jobs.outstanding_sha256()
+            documents = iter_cv_documents(paths, loader=loader, workers=workers, prefetch=prefetch)
+            cvs = (cv for cv in pending_cvs(documents, cache, cache_key, routing, manifest, duplicates, store, from_cache,
+                                      copy_done)
+                   if cv["sha256"] not in outstanding)
+            job_ids = await jobs.submit(packer.iter_batches(cvs, max_in_flight), lambda custom_id, batch: request_line(
+                provider, model, custom_id, prompt.parts(batch), max_tokens=max_tokens or packer.max_tokens,
+                temperature=temperature, response_schema=prompt.schema, cache_prefix=True))
+            for job_id in job_ids:
+                for cv in jobs.members(job_id):
+                    if not manifest.is_done(cv["sha256"]):
+                        manifest.mark_in_flight(cv)
+            # La espera puede durar horas: nada de lo escrito hasta acá queda en un buffer
+            manifest.flush()
+            try:
+                await asyncio.gather(*(jobs.collect(job_id, settle_job_request) for job_id in list(jobs.jobs)))
+            finally:
+                flush()
+            manifest.print_summary()
+            return paths.count + len(dropped)
+
+        if batch:
+            # Los jobs enviados se anotan junto al manifest, así un reinicio los retoma por ID
+            service = batch_service(provider, model, batch)
+            jobs = BatchJobs(service, output_base + ".batch-jobs.jsonl", fresh=manifest.fresh)
+        try:
+            await run_passes(run_batch_pass if batch else run_pass, watch, interval)
+        finally:
+            sink.close()
+            if usage_sink is not None:
+                usage_sink.close()
+            manifest.close()
+            dead_letter.close()
+            store.finish_run(run_id)
+            store.close()
+            if batch:
+                jobs.close()
+                await service.close()
+
+    print(f"♻️ Caché: {cache.hits} hits, {cache.misses} misses")
+    routing.print_summary()
+    routing.save(report_prefix + ROUTING_REPORT_FILE)
+    duplicates.print_summary()
+    duplicates.save(report_prefix + DUPLICATES_REPORT_FILE)
+    dead_letter.print_summary()
+    shortlist.print_summary()
+    shortlist.save(report_prefix + PRERANK_REPORT_FILE)
+    if cascade:
+        cascade.print_summary()
+        cascade.save(report_prefix + CASCADE_REPORT_FILE)
+    for report in (routing, duplicates, shortlist, cascade):
+        if report is not None:
+            report.close()
+    metrics.print_summary()
+    metrics.flush()
+    print("🏁 Procesamiento completo.")
@@ -0,0 +1,79 @@
+import asyncio
+from dotenv import load_dotenv
+from functools import partial
+
+from cv_ingest import extract_text_from_pdf, load_cv_routed
+from pipeline import run_pipeline
+from response_cache import hash_text
+from scoring_prompt import (JOB_TYPES, JOINT_RESPONSE_SCHEMA, JOINT_TEMPLATE_HASH, EvaluationParser, Prompt,
+                            build_joint_prompt_base)
+from token_budget import RESPONSE_TOKENS_PER_CV
+from work_manifest import run_args
+
+load_dotenv()
+model_name = "gemini-2.5-flash-preview-04-17"
+
+cv_dir = "cvs"
+# Cada descripción de puesto declara su tipo: un CV solo se evalúa contra las de su tipo
+job_descriptions_config = [
+    {"job_id": "job_description", "file": "job_description.pdf", "job_type": "Marketing Digital / Performance"},
+]
+output_json_file = "output-classify-score.json"
+token_usage_file = "token-usage-classify-score.json"
+# Reportes y métricas con su propio prefijo, para no pisar los del scorer de imágenes
+report_prefix = "classify-score-"
+
+MAX_IN_FLIGHT = 10
+CV_BATCH_SIZE = 10
+# Nombre + tipo de puesto por encima de lo que ya devuelve una evaluación
+CLASSIFY_TOKENS_PER_CV = 40
+SKIPPED_REASON = "tipo de puesto distinto al de las descripciones"
+
+
+job_descriptions = [
+    {"job_id": jd["job_id"], "job_type": jd["job_type"], "text": extract_text_from_pdf(jd["file"])}
+    for jd in job_descriptions_config
+]
+job_types_by_id = {jd["job_id"]: jd["job_type"] for jd in job_descriptions}
+
+prompt_base = build_joint_prompt_base(job_descriptions)
+# La respuesta trae una evaluación por descripción de puesto, más la clasificación
+prompt = Prompt(prompt_base, JOINT_TEMPLATE_HASH, hash_text(prompt_base), JOINT_RESPONSE_SCHEMA,
+                response_tokens_per_cv=RESPONSE_TOKENS_PER_CV * len(job_descriptions) + CLASSIFY_TOKENS_PER_CV)
+
+
+def normalize(record, filename):
+    """Deja una fila por CV: un tipo de puesto fuera de la lista cuenta como
+    null y solo quedan los puntajes de las descripciones de ese tipo."""
+    job_type = record.get("job_type")
+    if job_type not in JOB_TYPES:
+        job_type = None
+    scores = [s for s in record.get("scores", []) if job_types_by_id.get(s.get("job_id")) == job_type]
+    row = {
+        "participant_id": record["participant_id"],
+        "filename": filename,
+        "participant_name": record.get("participant_name"),
+        "job_type": job_type,
+        "scores": scores,
+    }
+    if not scores:
+        # Ninguna descripción es de su tipo: clasificado, pero sin puntaje
+        row["scoring_skipped"] = SKIPPED_REASON
+    return row
+
+
+class JointParser(EvaluationParser):
+    def row(self, record, cv):
+        return normalize(record, cv["filename"])
+
+
+async def main(**options):
+    # El CV se renderiza y se sube una sola vez para clasificarlo y evaluarlo
+    await run_pipeline(prompt, partial(load_cv_routed, provider="gemini"), JointParser(),
+                       "gemini", model_name, cv_dir, output_json_file, token_usage_file=token_usage_file,
+                       report_prefix=report_prefix, max_in_flight=MAX_IN_FLIGHT, max_cvs=CV_BATCH_SIZE, **options)
+
+
+if __name__ == "__main__":
+    args = run_args("Clasifica y evalúa los CVs en una sola llamada por batch")
+    asyncio.run(main(**vars(args)))
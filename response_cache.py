@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+
+CACHE_DIR = ".cv_cache"
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+# Al desalojar se baja hasta este porcentaje del máximo para no desalojar en cada put
+EVICT_TARGET_RATIO = 0.9
+
+
+def hash_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def participant_id_for(content_hash):
+    # ID estable derivado del contenido: el mismo CV recibe siempre el mismo participant_id
+    return str(uuid.UUID(hex=content_hash[:32]))
+
+
+class ResponseCache:
+    """Caché en disco de respuestas del modelo, direccionada por contenido.
+
+    La clave combina modelo, hash del template del prompt, hash de la
+    descripción del puesto y hash del documento, así que cualquier cambio
+    en alguno de ellos invalida solo las entradas afectadas. El tamaño total
+    se limita desalojando las entradas usadas hace más tiempo (LRU por mtime).
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(os.path.getsize(p) for p in self._entries())
+
+    @staticmethod
+    def key(model, template_hash, job_description_hash, content_hash):
+        raw = "\0".join([model, template_hash, job_description_hash, content_hash])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def _entries(self):
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".json"):
+                        yield entry.path
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                value = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        # Tocar el archivo lo marca como usado recientemente para el LRU
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+        # Escritura atómica: un crash a mitad de camino nunca deja una entrada corrupta
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+        # Leer el tamaño anterior y reemplazar bajo el lock: dos puts de la misma clave no lo cuentan dos veces
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._size += len(data) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
@@ -0,0 +1,203 @@
+import json
+import os
+import sys
+import threading
+import time
+
+from metrics import registry as metrics
+
+FSYNC_EVERY = 100
+FSYNC_INTERVAL = 1.0
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class JsonlSink:
+    """Sink append-only: una línea JSON por resultado.
+
+    Cada escritura es un append bajo un lock corto, en lugar de releer y
+    reescribir el archivo completo. El fsync se agrupa cada ``fsync_every``
+    registros o ``fsync_interval`` segundos, lo que ocurra primero.
+    """
+
+    def __init__(self, path, fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL, truncate=False,
+                 stage="write"):
+        self.path = path
+        # Etapa con la que se registra el tiempo de escritura en cv_stage_seconds
+        self.stage = stage
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = open(path, "w" if truncate else "a", encoding="utf-8")
+        if not truncate and self._file.tell() > 0 and not _ends_with_newline(path):
+            # Un crash anterior dejó una línea a medias; no pegarle el próximo registro
+            self._file.write("\n")
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def write(self, record):
+        self.write_many([record])
+
+    def write_many(self, records):
+        start = time.perf_counter()
+        lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        if not lines:
+            return
+        with self._lock:
+            self._file.write(lines)
+            self._pending += len(records)
+            if (self._pending >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+        metrics.observe("cv_stage_seconds", time.perf_counter() - start, stage=self.stage)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TeeSink:
+    """Reparte cada escritura entre varios sinks con el mismo contrato
+    (``write_many``, ``flush``, ``close``), p. ej. el JSONL y el store SQLite."""
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def write(self, record):
+        self.write_many([record])
+
+    def write_many(self, records):
+        records = list(records)
+        for sink in self.sinks:
+            sink.write_many(records)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DetailLog:
+    """Detalle de un reporte de la corrida (una línea por decisión, par o
+    duplicado), escrito a medida que ocurre en lugar de acumularse en memoria.
+    El archivo se abre (y se trunca) recién con el primer registro; sin
+    ``path`` los registros se descartan y el reporte queda solo con sus totales."""
+
+    def __init__(self, path):
+        self.path = path
+        self._sink = None
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        if self.path is None:
+            return
+        # Se escribe desde el thread de ingesta y desde el event loop: el archivo se abre una sola vez
+        with self._lock:
+            if self._sink is None:
+                self._sink = JsonlSink(self.path, truncate=True, stage="report")
+        self._sink.write(record)
+
+    def flush(self):
+        if self._sink is not None:
+            self._sink.flush()
+
+    def close(self):
+        if self._sink is not None:
+            self._sink.close()
+
+
+def read_jsonl(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Última línea truncada por un crash: se descarta
+                continue
+
+
+def export_json_array(jsonl_path, json_path, indent=2):
+    # Compacta el JSONL al formato de array de siempre, sin cargarlo entero en memoria
+    write_json_array(read_jsonl(jsonl_path), json_path, indent)
+
+
+def write_json_array(records, json_path, indent=2):
+    # Escribe los registros a medida que llegan y reemplaza el archivo al final, nunca a medias
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, record in enumerate(records):
+            f.write(",\n" if i else "\n")
+            body = json.dumps(record, indent=indent, ensure_ascii=False)
+            f.write("\n".join(" " * indent + line for line in body.splitlines()))
+        f.write("\n]\n")
+    os.replace(tmp_path, json_path)
+
+
+def rotate_outputs(*paths):
+    """Renombra los archivos que existan con la fecha y hora de la corrida
+    (``output.json`` -> ``output.20261018-153000.json``), para que una corrida
+    con otro contexto no los pise ni mezcle sus filas con las anteriores."""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    for path in paths:
+        if os.path.exists(path):
+            base, ext = os.path.splitext(path)
+            rotated = f"{base}.{stamp}{ext}"
+            os.replace(path, rotated)
+            print(f"🗄️ {path} de la corrida anterior guardado como {rotated}")
+
+
+def import_json_array(json_path, jsonl_path):
+    # Siembra el JSONL con los resultados de corridas anteriores al formato append-only
+    if os.path.exists(jsonl_path) or not os.path.exists(json_path):
+        return
+    with open(json_path, "r", encoding="utf-8") as f:
+        try:
+            records = json.load(f)
+        except json.JSONDecodeError:
+            records = []
+    with JsonlSink(jsonl_path) as sink:
+        sink.write_many(records)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Uso: python result_sink.py <entrada.jsonl> <salida.json>")
+        sys.exit(1)
+    export_json_array(sys.argv[1], sys.argv[2])
@@ -0,0 +1,410 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from metrics import registry as metrics
+from response_cache import participant_id_for
+from result_sink import write_json_array
+
+RESULTS_DB_FILE = "results.db"
+# Espera máxima por el lock de escritura mientras otro proceso escribe en la misma base
+BUSY_TIMEOUT = 30.0
+TOP_K = 20
+# Filas leídas por consulta al exportar: el JSON se arma sin cargar toda la tabla
+EXPORT_PAGE_ROWS = 1000
+# job_id de la fila que solo clasifica el CV (nombre y tipo de puesto), sin puntaje
+CLASSIFICATION_JOB = ""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    script TEXT,
+    output TEXT,
+    provider TEXT,
+    model TEXT,
+    context TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    participant_id TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    filename TEXT,
+    path TEXT,
+    participant_name TEXT,
+    job_type TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_filename ON documents (filename);
+CREATE TABLE IF NOT EXISTS evaluations (
+    evaluation_id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    output TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    record_key TEXT NOT NULL,
+    participant_id TEXT,
+    score REAL,
+    model TEXT,
+    decided_by TEXT,
+    record TEXT,
+    created_at REAL NOT NULL,
+    UNIQUE (output, job_id, record_key)
+);
+CREATE INDEX IF NOT EXISTS evaluations_job_score ON evaluations (job_id, score DESC);
+CREATE INDEX IF NOT EXISTS evaluations_run ON evaluations (run_id);
+CREATE TABLE IF NOT EXISTS reasons (
+    evaluation_id INTEGER NOT NULL REFERENCES evaluations (evaluation_id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    PRIMARY KEY (evaluation_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS usage (
+    usage_id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    output TEXT,
+    participant_id TEXT,
+    batch_id INTEGER,
+    batch_size INTEGER,
+    route TEXT,
+    prompt_tokens INTEGER,
+    cached_tokens INTEGER,
+    response_tokens INTEGER,
+    total_tokens INTEGER,
+    record TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS usage_run ON usage (run_id);
+CREATE INDEX IF NOT EXISTS usage_output ON usage (output);
+"""
+
+UPSERT_EVALUATION = """
+INSERT INTO evaluations (run_id, output, job_id, record_key, participant_id, score, model, decided_by, record,
+                         created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (output, job_id, record_key) DO UPDATE SET
+    run_id = excluded.run_id, participant_id = excluded.participant_id, score = excluded.score,
+    model = excluded.model, decided_by = excluded.decided_by, record = excluded.record,
+    created_at = excluded.created_at
+"""
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _evaluation_rows(record, job_id):
+    # (job_id, score, reasons, fila a exportar) por cada puntaje que trae el registro.
+    # Una fila del modo conjunto se guarda entera en su clasificación y un puntaje por descripción.
+    if isinstance(record.get("scores"), list):
+        yield CLASSIFICATION_JOB, None, (), record
+        for entry in record["scores"]:
+            if isinstance(entry, dict) and entry.get("job_id"):
+                yield entry["job_id"], _number(entry.get("score")), entry.get("reasons") or (), None
+    elif "score" in record:
+        yield job_id or CLASSIFICATION_JOB, _number(record["score"]), record.get("reasons") or (), record
+    else:
+        yield CLASSIFICATION_JOB, None, (), record
+
+
+def _record_key(record):
+    # Dos archivos con el mismo contenido comparten participant_id; el nombre de archivo los separa
+    return "|".join(str(record[k]) for k in ("participant_id", "filename") if record.get(k))
+
+
+class ResultsStore:
+    """Resultados en SQLite (modo WAL): corridas, documentos, evaluaciones,
+    razones y uso de tokens, indexados por puesto, puntaje y corrida.
+
+    Los scripts siguen escribiendo su JSONL; este store recibe las mismas
+    filas para responder "top 20 de este puesto" o "tokens de esta corrida"
+    con una búsqueda en el índice. Dentro del proceso las escrituras comparten
+    una conexión bajo un lock; entre procesos, WAL deja leer mientras uno
+    escribe y ``BUSY_TIMEOUT`` ordena a los escritores.
+    """
+
+    def __init__(self, path=RESULTS_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        # En WAL, NORMAL no hace fsync en cada commit: un corte de luz pierde lo último, nunca corrompe
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        with self._transaction() as conn:
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+
+    def _transaction(self):
+        return _Transaction(self)
+
+    def start_run(self, output, provider=None, model=None, context=None, script=None):
+        with self._transaction() as conn:
+            return conn.execute(
+                "INSERT INTO runs (script, output, provider, model, context, started_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (script or os.path.basename(sys.argv[0]), output, provider, model, context, time.time()),
+            ).lastrowid
+
+    def finish_run(self, run_id):
+        with self._transaction() as conn:
+            conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def add_documents(self, docs):
+        now = time.time()
+        rows = [(participant_id_for(doc["sha256"]), doc["sha256"], doc["filename"], doc.get("path"), now)
+                for doc in docs]
+        if not rows:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO documents (participant_id, sha256, filename, path, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (participant_id) DO UPDATE SET filename = excluded.filename, path = excluded.path, "
+                "updated_at = excluded.updated_at",
+                rows,
+            )
+
+    def add_results(self, run_id, output, records, job_id=None):
+        # Una transacción por llamada: un batch entero entra con un solo commit
+        records = [r for r in records if isinstance(r, dict)]
+        if not records:
+            return
+        now = time.time()
+        with self._transaction() as conn:
+            for record in records:
+                key = _record_key(record)
+                for row_job_id, score, reasons, exported in _evaluation_rows(record, job_id):
+                    conn.execute(UPSERT_EVALUATION, (
+                        run_id, output, row_job_id, key, record.get("participant_id"), score,
+                        record.get("model"), record.get("decided_by"),
+                        json.dumps(exported, ensure_ascii=False) if exported is not None else None, now,
+                    ))
+                    evaluation_id = conn.execute(
+                        "SELECT evaluation_id FROM evaluations WHERE output = ? AND job_id = ? AND record_key = ?",
+                        (output, row_job_id, key),
+                    ).fetchone()[0]
+                    conn.execute("DELETE FROM reasons WHERE evaluation_id = ?", (evaluation_id,))
+                    conn.executemany(
+                        "INSERT INTO reasons (evaluation_id, position, reason) VALUES (?, ?, ?)",
+                        [(evaluation_id, i, str(reason)) for i, reason in enumerate(reasons)],
+                    )
+                if "participant_name" in record or "job_type" in record:
+                    # La clasificación completa el documento; sin participant_id se ubica por nombre de archivo
+                    by, value = (("participant_id", record["participant_id"]) if record.get("participant_id")
+                                 else ("filename", record.get("filename")))
+                    conn.execute(
+                        f"UPDATE documents SET participant_name = ?, job_type = ?, updated_at = ? WHERE {by} = ?",
+                        (record.get("participant_name"), record.get("job_type"), now, value),
+                    )
+
+    def add_usage(self, run_id, rows, output=None):
+        rows = [r for r in rows if isinstance(r, dict)]
+        if not rows:
+            return
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO usage (run_id, output, participant_id, batch_id, batch_size, route, prompt_tokens, "
+                "cached_tokens, response_tokens, total_tokens, record, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, output, row.get("participant_id"), row.get("batch_id"), row.get("batch_size"),
+                  row.get("route"), row.get("prompt_tokens"), row.get("prompt_tokens_cached", row.get("cached_tokens")),
+                  row.get("response_tokens"), row.get("total_tokens"), json.dumps(row, ensure_ascii=False), now)
+                 for row in rows],
+            )
+
+    def clear(self, output):
+        # Misma semántica que truncar el JSONL cuando cambia el contexto del manifest
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM evaluations WHERE output = ?", (output,))
+
+    def sink(self, run_id, output, job_id=None, usage=False):
+        return ResultsSink(self, run_id, output, job_id, usage)
+
+    def top_k(self, job_id, k=TOP_K, min_score=None, output=None):
+        # Recorre el índice (job_id, score DESC) y se detiene en la fila k
+        query = ("SELECT e.evaluation_id, e.participant_id, d.filename, d.participant_name, e.score, e.output, "
+                 "e.model, e.run_id FROM evaluations AS e "
+                 "LEFT JOIN documents AS d ON d.participant_id = e.participant_id "
+                 "WHERE e.job_id = ? AND e.score >= ?")
+        params = [job_id, min_score if min_score is not None else float("-inf")]
+        if output:
+            query += " AND e.output = ?"
+            params.append(output)
+        query += " ORDER BY e.score DESC LIMIT ?"
+        params.append(k)
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(query, params)]
+            for row in rows:
+                row["reasons"] = [r[0] for r in self._conn.execute(
+                    "SELECT reason FROM reasons WHERE evaluation_id = ? ORDER BY position", (row["evaluation_id"],))]
+        return rows
+
+    def usage_by_run(self, run_id=None):
+        query = ("SELECT r.run_id, r.script, r.output, r.provider, r.model, r.started_at, r.finished_at, "
+                 "COUNT(u.usage_id) AS rows, COALESCE(SUM(u.prompt_tokens), 0) AS prompt_tokens, "
+                 "COALESCE(SUM(u.cached_tokens), 0) AS cached_tokens, "
+                 "COALESCE(SUM(u.response_tokens), 0) AS response_tokens, "
+                 "COALESCE(SUM(u.total_tokens), 0) AS total_tokens "
+                 "FROM runs AS r LEFT JOIN usage AS u ON u.run_id = r.run_id")
+        params = ()
+        if run_id is not None:
+            query += " WHERE r.run_id = ?"
+            params = (run_id,)
+        query += " GROUP BY r.run_id ORDER BY r.run_id"
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(query, params)]
+
+    def _records(self, table, id_column, output):
+        # Páginas por clave primaria: cada página toma el lock un momento y el resto espera poco
+        last = 0
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    f"SELECT {id_column}, record FROM {table} WHERE output = ? AND {id_column} > ? "
+                    f"AND record IS NOT NULL ORDER BY {id_column} LIMIT ?",
+                    (output, last, EXPORT_PAGE_ROWS),
+                ).fetchall()
+            if not page:
+                return
+            for row in page:
+                yield json.loads(row["record"])
+            last = page[-1][0]
+
+    def export(self, output, json_path, usage=False):
+        # Vuelve al array de siempre (output-*.json, classified_files.json, token-usage.json)
+        records = (self._records("usage", "usage_id", output) if usage
+                   else self._records("evaluations", "evaluation_id", output))
+        write_json_array(records, json_path)
+
+    def import_json(self, json_path, job_id=None, usage=False):
+        # Siembra el store con un array ya exportado, como una corrida más
+        with open(json_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        output = os.path.basename(json_path)
+        run_id = self.start_run(output, context=f"import {json_path}", script="import")
+        if usage:
+            self.add_usage(run_id, records, output)
+        else:
+            self.add_results(run_id, output, records, job_id)
+        self.finish_run(run_id)
+        return run_id, len(records)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE toma el lock de escritura al empezar: sin deadlocks entre procesos
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.store._lock.acquire()
+        try:
+            self.store._conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.store._lock.release()
+            raise
+        return self.store._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.store._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.store._lock.release()
+            metrics.observe("cv_stage_seconds", time.perf_counter() - self.start, stage="store")
+
+
+class ResultsSink:
+    """Mismo contrato que JsonlSink sobre el store: cada ``write_many`` es una
+    transacción confirmada, así que ``flush`` y ``close`` no tienen nada que hacer."""
+
+    def __init__(self, store, run_id, output, job_id=None, usage=False):
+        self.store = store
+        self.run_id = run_id
+        self.output = output
+        self.job_id = job_id
+        self.usage = usage
+
+    def write(self, record):
+        self.write_many([record])
+
+    def write_many(self, records):
+        if self.usage:
+            self.store.add_usage(self.run_id, records, self.output)
+        else:
+            self.store.add_results(self.run_id, self.output, records, self.job_id)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _print_top(rows):
+    for i, row in enumerate(rows, 1):
+        who = row["participant_name"] or row["filename"] or row["participant_id"]
+        print(f"{i:>3}. {row['score']:>5g}  {who}  ({row['output']})")
+        for reason in row["reasons"]:
+            print(f"       - {reason}")
+
+
+def _print_usage(rows):
+    for row in rows:
+        started = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["started_at"]))
+        print(f"#{row['run_id']} {started} {row['script']} → {row['output']} ({row['model'] or '-'}): "
+              f"{row['total_tokens']} tokens (prompt {row['prompt_tokens']}, caché {row['cached_tokens']}, "
+              f"respuesta {row['response_tokens']}) en {row['rows']} filas")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consultas sobre el store SQLite de resultados")
+    parser.add_argument("--db", default=RESULTS_DB_FILE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    top_parser = commands.add_parser("top", help="mejores puntajes de un puesto")
+    top_parser.add_argument("job_id", help="p. ej. job_description (el nombre del PDF sin extensión)")
+    top_parser.add_argument("-k", "--top-k", type=int, default=TOP_K)
+    top_parser.add_argument("--min-score", type=float)
+    top_parser.add_argument("--output", help="solo los resultados de este archivo, p. ej. output-openai.json")
+
+    usage_parser = commands.add_parser("usage", help="tokens por corrida")
+    usage_parser.add_argument("--run", type=int)
+
+    export_parser = commands.add_parser("export", help="exporta un output al formato JSON de siempre")
+    export_parser.add_argument("output", help="p. ej. output-gemini-images.json o token-usage.json")
+    export_parser.add_argument("json_file", help="dónde escribir el array")
+    export_parser.add_argument("--usage", action="store_true", help="el output es de uso de tokens")
+
+    import_parser = commands.add_parser("import", help="carga un JSON exportado antes del store")
+    import_parser.add_argument("json_file")
+    import_parser.add_argument("--job", help="job_id de las evaluaciones (por defecto, job_description)",
+                               default="job_description")
+    import_parser.add_argument("--usage", action="store_true", help="el archivo es de uso de tokens")
+
+    args = parser.parse_args()
+    with ResultsStore(args.db) as store:
+        if args.command == "top":
+            _print_top(store.top_k(args.job_id, args.top_k, args.min_score, args.output))
+        elif args.command == "usage":
+            _print_usage(store.usage_by_run(args.run))
+        elif args.command == "export":
+            store.export(args.output, args.json_file, usage=args.usage)
+            print(f"💾 {args.json_file}")
+        else:
+            run_id, count = store.import_json(args.json_file, args.job, usage=args.usage)
+            print(f"📥 {count} filas de {args.json_file} (corrida #{run_id})")
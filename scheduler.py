@@ -0,0 +1,202 @@
+import os
+import random
+import threading
+import time
+
+# Cuotas por defecto por proveedor (requests y tokens por minuto). Gemini refleja el
+# free tier con el que se calibraron los batches de 10 CVs + 60s de espera; se pueden
+# sobreescribir con GEMINI_RPM / GEMINI_TPM, OPENAI_RPM, ANTHROPIC_TPM, etc.
+PROVIDER_LIMITS = {
+    "gemini": {"rpm": 10, "tpm": 250_000},
+    "openai": {"rpm": 500, "tpm": 200_000},
+    "anthropic": {"rpm": 50, "tpm": 50_000},
+}
+
+DEFAULT_RATE_LIMIT_PAUSE = 10
+MAX_RATE_LIMIT_RETRIES = 5
+# Errores transitorios (5xx, timeouts, conexiones cortadas): backoff exponencial con jitter
+TRANSIENT_RETRY_DELAY = 1
+MAX_RETRY_DELAY = 60
+MAX_TRANSIENT_RETRIES = 4
+# Retry-After se respeta tal cual, más un poco de jitter para no volver todos a la vez
+RETRY_AFTER_JITTER = 1.0
+
+TRANSIENT_STATUS_CODES = {408, 425, 500, 502, 503, 504, 529}
+# Errores del cliente (httpx, SDKs) que no traen status: timeouts y conexiones caídas
+_TRANSIENT_ERROR_NAMES = ("Timeout", "Connect", "ReadError", "WriteError", "RemoteProtocolError",
+                          "InternalServerError", "ServiceUnavailable", "Overloaded")
+# Solo una conexión que no llegó a abrirse garantiza que el request no llegó al proveedor
+_UNSENT_ERROR_NAMES = ("ConnectError", "ConnectTimeout")
+# Con estos status el problema puede estar en un CV puntual (un PDF que el proveedor rechaza,
+# un request demasiado grande): dividir el batch aísla al culpable
+DOCUMENT_STATUS_CODES = {400, 413, 422}
+# Tipo/código de error de rate limit en el cuerpo de la respuesta (Anthropic, OpenAI)
+RATE_LIMIT_ERROR_TYPES = {"rate_limit_error", "rate_limit_exceeded"}
+
+
+def provider_limits(provider):
+    limits = dict(PROVIDER_LIMITS[provider])
+    for name in ("rpm", "tpm"):
+        override = os.getenv(f"{provider.upper()}_{name.upper()}")
+        if override:
+            limits[name] = int(override)
+    return limits
+
+
+def is_rate_limit_error(error):
+    # Solo el status 429 o el tipo de error del proveedor: un "429" en el texto del mensaje
+    # (un ID, un conteo de tokens) no alcanza para pausar todo el pipeline
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status == 429:
+        return True
+    # google-genai expone el status gRPC en ``status``; Anthropic/OpenAI el tipo en ``body``
+    if getattr(error, "status", None) == "RESOURCE_EXHAUSTED":
+        return True
+    body = getattr(error, "body", None)
+    if isinstance(body, dict):
+        detail = body.get("error", body)
+        if isinstance(detail, dict) and RATE_LIMIT_ERROR_TYPES & {detail.get("type"), detail.get("code")}:
+            return True
+    name = type(error).__name__
+    return "RateLimit" in name or "ResourceExhausted" in name
+
+
+def is_transient_error(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in TRANSIENT_STATUS_CODES
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(name in type(error).__name__ for name in _TRANSIENT_ERROR_NAMES)
+
+
+def is_unsent_error(error):
+    # Un timeout de lectura o una conexión cortada a mitad de la respuesta pueden haber consumido
+    # cuota del proveedor. Los SDKs envuelven el error de httpx: se mira también su causa
+    while error is not None:
+        if isinstance(error, ConnectionRefusedError) or type(error).__name__ in _UNSENT_ERROR_NAMES:
+            return True
+        error = error.__cause__
+    return False
+
+
+def is_document_error(error):
+    # Errores que pueden depender de un CV del batch: rechazo del proveedor o una respuesta que
+    # no se pudo parsear/validar (json.JSONDecodeError es un ValueError). Un TypeError o un
+    # AttributeError es un bug del código y falla igual para cualquier batch
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in DOCUMENT_STATUS_CODES
+    return isinstance(error, ValueError)
+
+
+def backoff_seconds(attempt, retry_after=None, base=TRANSIENT_RETRY_DELAY, maximum=MAX_RETRY_DELAY):
+    """Espera antes del reintento ``attempt`` (1, 2, ...): Retry-After si el
+    proveedor lo mandó o, si no, backoff exponencial con "equal jitter"
+    (entre la mitad y el total de ``base * 2**(attempt - 1)``)."""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, RETRY_AFTER_JITTER)
+    delay = min(maximum, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateBudget:
+    """Dos token buckets (requests y tokens por minuto) que se recargan de forma continua.
+
+    ``reserve`` no bloquea: consume el presupuesto y devuelve 0, o devuelve los
+    segundos a esperar antes de reintentar. Así se puede usar tanto desde
+    threads como desde asyncio.
+    """
+
+    def __init__(self, rpm, tpm, clock=time.monotonic):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._clock = clock
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def reserve(self, tokens):
+        tokens = min(tokens, self.tpm)
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            wait = max(
+                (1 - self._requests) * 60 / self.rpm,
+                (tokens - self._tokens) * 60 / self.tpm,
+                0,
+            )
+            if wait > 0:
+                return wait
+            self._requests -= 1
+            self._tokens -= tokens
+            return 0.0
+
+    def settle(self, reserved, actual):
+        # Corrige la estimación con el uso real que informó el proveedor
+        # (o la devuelve con ``actual=0`` si el request no llegó al proveedor)
+        if actual is None:
+            return
+        with self._lock:
+            self._tokens = min(self.tpm, self._tokens - (actual - min(reserved, self.tpm)))
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+
+class AimdLimit:
+    """Límite de concurrencia adaptativo (AIMD).
+
+    Sube de a un slot por ventana mientras las respuestas llegan bien, baja
+    multiplicativamente ante un 429 y, más suavemente, cuando la latencia se
+    aleja del mínimo observado.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=64, overload_factor=0.5,
+                 latency_factor=0.9, latency_tolerance=2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.overload_factor = overload_factor
+        self.latency_factor = latency_factor
+        self.latency_tolerance = latency_tolerance
+        self._baseline = None
+
+    def on_success(self, latency):
+        if self._baseline is None:
+            self._baseline = latency
+        else:
+            self._baseline = min(latency, 0.95 * self._baseline + 0.05 * latency)
+
+        if latency > self._baseline * self.latency_tolerance:
+            self.limit = max(self.minimum, self.limit * self.latency_factor)
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_overload(self):
+        self.limit = max(self.minimum, self.limit * self.overload_factor)
+
+    @property
+    def slots(self):
+        return int(self.limit)
@@ -0,0 +1,312 @@
+import hashlib
+import json
+
+from response_cache import hash_text
+from token_budget import RESPONSE_TOKENS_PER_CV
+
+# Encabezado común a todos los scorers; el JSON de ejemplo lleva llaves dobles por .format()
+PROMPT_TEMPLATE = """
+Actúa como un experto en recursos humanos especializado en evaluación de candidatos según su currículum.
+
+A continuación se presentarán varios currículums, cada uno en el siguiente formato:
+
+[participant_id] - [Texto del currículum]
+
+Tu tarea es evaluar cada uno de ellos según su adecuación a la descripción del puesto, considerando los siguientes criterios:
+
+- Nivel de seniority requerido
+- Experiencia en la industria relevante
+- Manejo básico de inglés
+
+Por cada currículum, devuelve una evaluación en formato JSON con esta estructura:
+
+{{
+  "participant_id": "...",
+  "score": [puntaje de 0 a 100],
+  "reasons": [
+    "razón 1",
+    "razón 2",
+    ...
+  ]
+}}
+
+Importante: devuelve un objeto JSON por cada currículum, sin texto adicional.
+
+Descripción del puesto:
+{job_description}
+"""
+
+CVS_TEMPLATE = """
+Currículums:
+{cvs_text}
+"""
+
+# Marcador en la lista de currículums para los CVs que se adjuntan como imagen
+IMAGE_CV_PLACEHOLDER = "[currículum adjunto como imagen más abajo]"
+
+# Texto e imágenes comparten el mismo prompt, así que comparten la caché
+TEMPLATE_HASH = hashlib.sha256((PROMPT_TEMPLATE + CVS_TEMPLATE + IMAGE_CV_PLACEHOLDER).encode("utf-8")).hexdigest()
+
+# Tipos de puesto para clasificar CVs (cv_classifier y el modo conjunto)
+JOB_TYPES = [
+    "Ejecutivo de Influencers / Social Media Talent Manager",
+    "Ejecutivo de Cuentas Digitales",
+    "Diseño Gráfico",
+    "Ingeniería Informática / Software",
+    "Marketing Digital / Performance",
+    "Recursos Humanos",
+    "Administración y Finanzas",
+    "Atención al Cliente",
+    "Producción Audiovisual / Multimedia",
+    "Psicología"
+]
+
+# Clasificación y evaluación en una sola llamada: cada CV se manda (y se renderiza) una vez
+JOINT_PROMPT_TEMPLATE = """
+Actúa como un experto en recursos humanos especializado en clasificación y evaluación de candidatos según su currículum.
+
+A continuación se presentarán varios currículums, cada uno en el siguiente formato:
+
+[participant_id] - [Texto del currículum]
+
+Para cada currículum:
+
+1. Clasifícalo en **uno solo** de los siguientes tipos de puesto. Si no corresponde claramente a ninguno, usa null como `job_type`.
+
+{job_types}
+
+2. Extrae el nombre del participante.
+
+3. Evalúalo solo contra las descripciones de puesto de abajo cuyo tipo de puesto coincida con el que elegiste, considerando:
+
+- Nivel de seniority requerido
+- Experiencia en la industria relevante
+- Manejo básico de inglés
+
+Las descripciones de otro tipo de puesto no se evalúan: no las incluyas en "scores".
+
+Devuelve un array JSON con un objeto por currículum, sin texto adicional:
+
+[
+  {{
+    "participant_id": "...",
+    "participant_name": "...",
+    "job_type": "[tipo de puesto elegido o null]",
+    "scores": [
+      {{
+        "job_id": "...",
+        "score": [puntaje de 0 a 100],
+        "reasons": ["razón 1", "razón 2", ...]
+      }}
+    ]
+  }}
+]
+
+Descripciones de puesto:
+{job_descriptions}
+"""
+
+JOINT_TEMPLATE_HASH = hashlib.sha256(
+    (JOINT_PROMPT_TEMPLATE + CVS_TEMPLATE + IMAGE_CV_PLACEHOLDER + "|".join(JOB_TYPES)).encode("utf-8")
+).hexdigest()
+
+RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "participant_id": {"type": "string"},
+            "score": {"type": "integer"},
+            "reasons": {
+                "type": "array",
+                "items": {"type": "string"}
+            }
+        },
+        "required": ["participant_id", "score", "reasons"]
+    }
+}
+
+
+def build_prompt_base(job_description):
+    return PROMPT_TEMPLATE.format(job_description=job_description)
+
+
+def build_joint_prompt_base(job_descriptions):
+    # job_descriptions: [{"job_id", "job_type", "text"}]
+    return JOINT_PROMPT_TEMPLATE.format(
+        job_types="\n".join(f"- {job_type}" for job_type in JOB_TYPES),
+        job_descriptions="\n".join(
+            f"[{jd['job_id']}] (tipo de puesto: {jd['job_type']})\n{jd['text']}\n" for jd in job_descriptions
+        ),
+    )
+
+
+def build_cvs_text(batch):
+    cvs_text = "\n".join([f"{cv['id']} - {cv.get('text') or IMAGE_CV_PLACEHOLDER}" for cv in batch])
+    return CVS_TEMPLATE.format(cvs_text=cvs_text)
+
+
+def build_parts(job_description, batch, prompt_base=None):
+    # Primero el prefijo constante (instrucciones + puesto), que el proveedor puede cachear;
+    # después la lista de CVs y las imágenes, cada una precedida por su ID
+    parts = [prompt_base or build_prompt_base(job_description), build_cvs_text(batch)]
+    for cv in batch:
+        if cv.get("inline_data"):
+            parts.append(f"{cv['id']}:")
+            parts.append({"inline_data": cv["inline_data"]})
+    return parts
+
+
+class Prompt:
+    """Lo que un scorer le pide al modelo: ``base`` es el prefijo constante
+    (instrucciones y puesto) que el proveedor puede cachear, y ``parts`` le
+    agrega cada batch de CVs. ``template_hash`` e ``input_hash`` identifican el
+    prompt en la caché de respuestas y en el manifest; ``schema`` es el array
+    que se espera de vuelta."""
+
+    def __init__(self, base, template_hash, input_hash, schema, response_tokens_per_cv=RESPONSE_TOKENS_PER_CV,
+                 job_description=None, job_id=None):
+        self.base = base
+        self.template_hash = template_hash
+        self.input_hash = input_hash
+        self.schema = schema
+        self.response_tokens_per_cv = response_tokens_per_cv
+        # Con descripción de puesto se puede preseleccionar con BM25 y guardar el puntaje por job_id
+        self.job_description = job_description
+        self.job_id = job_id
+
+    def parts(self, batch):
+        return build_parts(None, batch, prompt_base=self.base)
+
+
+def scoring_prompt(job_description, job_id=None):
+    return Prompt(build_prompt_base(job_description), TEMPLATE_HASH, hash_text(job_description), RESPONSE_SCHEMA,
+                  job_description=job_description, job_id=job_id)
+
+
+class EvaluationParser:
+    """Lleva cada objeto de la respuesta a su CV y lo convierte en la fila que
+    se guarda. El modelo identifica cada CV por el campo ``key``, con el valor
+    que le mostró el prompt (``label``)."""
+
+    key = "participant_id"
+
+    def label(self, cv):
+        return cv["id"]
+
+    def row(self, record, cv):
+        return record
+
+    def copy(self, row, member):
+        # La copia de un duplicado lleva el nombre de su propio archivo, si la fila lo trae. Sin
+        # nombre de archivo la fila se identifica solo por participant_id: la de un duplicado
+        # exacto (mismo contenido, mismo ID) repetiría la del representante y no se escribe
+        if "filename" in row:
+            return dict(row, filename=member["filename"])
+        return None if row.get("duplicate_match") == "exact" else row
+
+
+JOINT_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "participant_id": {"type": "string"},
+            "participant_name": {"type": "string"},
+            "job_type": {"type": "string", "nullable": True},
+            "scores": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "job_id": {"type": "string"},
+                        "score": {"type": "integer"},
+                        "reasons": {"type": "array", "items": {"type": "string"}}
+                    },
+                    "required": ["job_id", "score", "reasons"]
+                }
+            }
+        },
+        "required": ["participant_id", "participant_name", "job_type", "scores"]
+    }
+}
+
+
+class EvaluationStreamParser:
+    """Parser incremental: recibe el texto a medida que llega y devuelve cada
+    objeto JSON de primer nivel apenas se cierra su llave.
+
+    Sirve para arrays, objetos sueltos u objetos seguidos; lo que está fuera de
+    un objeto (corchetes, comas, fences de markdown) se ignora.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk):
+        completed = []
+        for char in chunk:
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._buffer = [char]
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        value = json.loads("".join(self._buffer))
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(value, dict):
+                        completed.append(value)
+        return completed
+
+
+_JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+
+def validate(value, schema=RESPONSE_SCHEMA["items"], path="$"):
+    """Valida ``value`` contra el subconjunto de JSON Schema que usan los
+    scorers (type, nullable, properties, required, items). Devuelve la lista de errores."""
+    if value is None and schema.get("nullable"):
+        return []
+    expected = _JSON_TYPES[schema["type"]]
+    if not isinstance(value, expected) or (schema["type"] in ("integer", "number") and isinstance(value, bool)):
+        return [f"{path}: se esperaba {schema['type']}"]
+
+    errors = []
+    if schema["type"] == "object":
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{path}.{name}: falta")
+        for name, subschema in schema.get("properties", {}).items():
+            if name in value:
+                errors.extend(validate(value[name], subschema, f"{path}.{name}"))
+    elif schema["type"] == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(validate(item, schema["items"], f"{path}[{i}]"))
+    return errors
@@ -0,0 +1,180 @@
+import argparse
+import os
+import random
+import shutil
+import textwrap
+
+import fitz
+
+from scoring_prompt import JOB_TYPES
+
+# Corpus sintético para benchmarks: CVs inventados con la mezcla de formatos y largos
+# de un corpus real, sin datos personales. Misma semilla, mismos archivos (y mismos
+# participant_id, así que sirve para replay).
+
+DEFAULT_COUNT = 200
+# Fracción de PDFs sin capa de texto (página escaneada) y de imágenes sueltas (PNG/JPG)
+SCANNED_FRACTION = 0.2
+IMAGE_FRACTION = 0.1
+# Fracción de archivos que son copia exacta de otro, con otro nombre
+DUPLICATE_FRACTION = 0.05
+MIN_PAGES = 1
+MAX_PAGES = 4
+# Resolución del "escáner": la de una fotocopia, no la del render para el LLM
+SCAN_DPI = 100
+JPEG_QUALITY = 80
+
+FONT_SIZE = 10
+LINE_HEIGHT = 13
+LINE_CHARS = 90
+LINES_PER_PAGE = 55
+MARGIN = 50
+TARGET_JOB_TYPE = "Marketing Digital / Performance"
+
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elena", "Facundo", "Gabriela", "Hernán", "Inés", "Joaquín",
+               "Lucía", "Martín", "Natalia", "Óscar", "Paula", "Ramiro", "Sofía", "Tomás", "Valentina", "Zoe"]
+LAST_NAMES = ["Acosta", "Benítez", "Castro", "Domínguez", "Fernández", "García", "Herrera", "Ibarra", "Juárez",
+              "López", "Martínez", "Núñez", "Ortiz", "Pereyra", "Quiroga", "Romero", "Suárez", "Torres", "Vega"]
+COMPANIES = ["Andes Digital", "Grupo Pampa", "Lumen Media", "Nexo Retail", "Orbita Labs", "Río Finanzas",
+             "Sur Logística", "Tango Studio", "Vértice Salud", "Zonda Software"]
+UNIVERSITIES = ["Universidad de Buenos Aires", "Universidad de Chile", "UNAM", "Universidad de los Andes",
+                "Universidad Católica", "Universidad de la República"]
+LANGUAGES = ["Inglés avanzado", "Inglés intermedio", "Inglés básico", "Portugués intermedio", "Francés básico"]
+
+SKILLS = {
+    "Marketing Digital / Performance": ["Google Ads", "Meta Ads", "SEM", "SEO", "Google Analytics 4",
+                                        "Google Tag Manager", "Looker Studio", "A/B testing", "CPA", "ROAS"],
+    "Ingeniería Informática / Software": ["Python", "Java", "SQL", "Docker", "Kubernetes", "AWS", "React",
+                                          "microservicios", "CI/CD", "testing automatizado"],
+    "Diseño Gráfico": ["Illustrator", "Photoshop", "Figma", "branding", "tipografía", "InDesign",
+                       "motion graphics", "identidad visual"],
+    "Recursos Humanos": ["reclutamiento", "onboarding", "clima laboral", "liquidación de sueldos",
+                         "evaluaciones de desempeño", "capacitación"],
+    "Administración y Finanzas": ["Excel avanzado", "SAP", "conciliaciones", "presupuestos", "cash flow",
+                                  "impuestos", "reporting financiero"],
+}
+GENERIC_SKILLS = ["trabajo en equipo", "comunicación", "organización", "Office", "atención al detalle",
+                  "resolución de problemas", "gestión del tiempo"]
+TASKS = ["Lideré {skill} para clientes de {industry}, con mejoras medibles en {metric}.",
+         "Responsable de {skill} y de coordinar con equipos de {industry}.",
+         "Implementé procesos de {skill} que redujeron costos operativos un {pct}%.",
+         "Reporté resultados semanales de {skill} a la gerencia con foco en {metric}.",
+         "Acompañé la migración de {skill} y capacité a {n} personas del área."]
+INDUSTRIES = ["retail", "salud", "educación", "fintech", "consumo masivo", "turismo", "logística"]
+METRICS = ["conversiones", "costo por adquisición", "retención", "tiempos de entrega", "satisfacción del cliente"]
+
+
+def _cv_lines(rng, pages):
+    # Un CV de ``pages`` páginas aproximadas: el largo sale de la cantidad de experiencias
+    job_type = rng.choice(JOB_TYPES)
+    skills = SKILLS.get(job_type, GENERIC_SKILLS)
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+    lines = [name.upper(), job_type, f"{name.split()[0].lower()}.{rng.randint(10, 99)}@example.com", "",
+             "PERFIL"]
+    lines += textwrap.wrap(
+        f"Profesional con {rng.randint(1, 15)} años de experiencia en {job_type.lower()}, orientado a "
+        f"resultados y con manejo de {', '.join(rng.sample(skills, min(3, len(skills))))}.", LINE_CHARS)
+    lines += ["", "EXPERIENCIA"]
+    year = 2025
+    while len(lines) < pages * LINES_PER_PAGE - 12:
+        start = year - rng.randint(1, 4)
+        lines += ["", f"{rng.choice(COMPANIES)} — {job_type} ({start}-{year})"]
+        for _ in range(rng.randint(2, 5)):
+            task = rng.choice(TASKS).format(skill=rng.choice(skills), industry=rng.choice(INDUSTRIES),
+                                            metric=rng.choice(METRICS), pct=rng.randint(5, 40), n=rng.randint(3, 30))
+            lines += textwrap.wrap(f"• {task}", LINE_CHARS)
+        year = start
+    lines += ["", "EDUCACIÓN", f"{rng.choice(UNIVERSITIES)} ({year - 5}-{year - 1})", "",
+              "HABILIDADES", ", ".join(rng.sample(skills, min(6, len(skills)))), "",
+              "IDIOMAS", rng.choice(LANGUAGES)]
+    return lines
+
+
+def _text_pdf(lines):
+    pdf = fitz.open()
+    for start in range(0, len(lines), LINES_PER_PAGE):
+        page = pdf.new_page()
+        # Línea por línea: insert_textbox descarta todo el bloque si no entra en el rectángulo
+        for i, line in enumerate(lines[start:start + LINES_PER_PAGE]):
+            page.insert_text((MARGIN, MARGIN + (i + 1) * LINE_HEIGHT), line, fontsize=FONT_SIZE)
+    return pdf
+
+
+def _scanned_pdf(pdf):
+    # Cada página pasa a ser solo una imagen en gris: el PDF queda sin capa de texto
+    scanned = fitz.open()
+    for page in pdf:
+        pixmap = page.get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY)
+        scanned.new_page(width=page.rect.width, height=page.rect.height).insert_image(page.rect, pixmap=pixmap)
+    return scanned
+
+
+def write_job_description(path, job_type=TARGET_JOB_TYPE):
+    skills = SKILLS.get(job_type, GENERIC_SKILLS)
+    lines = [f"Puesto: {job_type} senior", "",
+             *textwrap.wrap(f"Buscamos una persona con experiencia en {', '.join(skills[:5])} para gestionar "
+                            f"y optimizar campañas de clientes de {', '.join(INDUSTRIES[:3])}.", LINE_CHARS),
+             "", "Requisitos:", *(f"• {skill}" for skill in skills), "• Inglés intermedio o superior"]
+    with _text_pdf(lines) as pdf:
+        pdf.save(path, no_new_id=True)
+
+
+def generate_corpus(out_dir, count=DEFAULT_COUNT, seed=0, scanned=SCANNED_FRACTION, images=IMAGE_FRACTION,
+                    duplicates=DUPLICATE_FRACTION, min_pages=MIN_PAGES, max_pages=MAX_PAGES):
+    """Escribe ``count`` CVs en ``out_dir`` y devuelve cuántos hay de cada tipo."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    kinds = {"text": 0, "scanned": 0, "png": 0, "jpg": 0, "duplicate": 0}
+    written = []
+    for i in range(count):
+        if written and rng.random() < duplicates:
+            source = rng.choice(written)
+            path = os.path.join(out_dir, f"cv_{i:05d}_copia{os.path.splitext(source)[1]}")
+            shutil.copyfile(source, path)
+            kinds["duplicate"] += 1
+            continue
+
+        with _text_pdf(_cv_lines(rng, rng.randint(min_pages, max_pages))) as pdf:
+            roll = rng.random()
+            if roll < images:
+                kind = rng.choice(["png", "jpg"])
+                pixmap = pdf[0].get_pixmap(dpi=SCAN_DPI)
+                path = os.path.join(out_dir, f"cv_{i:05d}.{kind}")
+                with open(path, "wb") as f:
+                    f.write(pixmap.tobytes("png") if kind == "png" else pixmap.tobytes("jpg", jpg_quality=JPEG_QUALITY))
+            elif roll < images + scanned:
+                kind = "scanned"
+                path = os.path.join(out_dir, f"cv_{i:05d}.pdf")
+                with _scanned_pdf(pdf) as copy:
+                    copy.save(path, deflate=True, no_new_id=True)
+            else:
+                kind = "text"
+                path = os.path.join(out_dir, f"cv_{i:05d}.pdf")
+                # Sin el /ID aleatorio de cada guardado: la misma semilla da los mismos bytes, y con
+                # ellos los mismos participant_id que espera --replay
+                pdf.save(path, deflate=True, no_new_id=True)
+        kinds[kind] += 1
+        written.append(path)
+    return kinds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un corpus sintético de CVs para benchmarks")
+    parser.add_argument("out_dir", help="carpeta de los CVs, p. ej. bench/cvs")
+    parser.add_argument("-n", "--count", type=int, default=DEFAULT_COUNT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scanned", type=float, default=SCANNED_FRACTION, help="fracción de PDFs escaneados")
+    parser.add_argument("--images", type=float, default=IMAGE_FRACTION, help="fracción de PNG/JPG")
+    parser.add_argument("--duplicates", type=float, default=DUPLICATE_FRACTION, help="fracción de copias exactas")
+    parser.add_argument("--min-pages", type=int, default=MIN_PAGES)
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    parser.add_argument("--job-description", help="escribir también una descripción de puesto en este PDF")
+    args = parser.parse_args()
+
+    kinds = generate_corpus(args.out_dir, args.count, args.seed, args.scanned, args.images, args.duplicates,
+                            args.min_pages, args.max_pages)
+    print(f"📄 {args.count} CVs en {args.out_dir}: {kinds['text']} PDF con texto, {kinds['scanned']} escaneados, "
+          f"{kinds['png'] + kinds['jpg']} imágenes, {kinds['duplicate']} copias")
+    if args.job_description:
+        write_job_description(args.job_description)
+        print(f"📄 Descripción del puesto en {args.job_description}")
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import shutil
+import sys
+
+import pytest
+
+# Los módulos del repo están en la raíz, sin paquete
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_engine  # noqa: E402
+import batch_jobs  # noqa: E402
+from mock_provider import MockProviderServer  # noqa: E402
+from synthetic_corpus import generate_corpus, write_job_description  # noqa: E402
+
+# Mock rápido y determinista: sin jitter ni errores salvo los que pide cada test
+FAST_BEHAVIOUR = {"latency": 0.01, "jitter": 0.0, "latency_dist": "fixed"}
+
+
+@pytest.fixture
+def fast_behaviour():
+    return {provider: dict(FAST_BEHAVIOUR) for provider in ("openai", "anthropic", "gemini")}
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    # Los reintentos se prueban por cantidad, no por cuánto esperan
+    monkeypatch.setattr(async_engine, "backoff_seconds", lambda *args, **kwargs: 0)
+    monkeypatch.setattr(batch_jobs, "backoff_seconds", lambda *args, **kwargs: 0)
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    # Corpus chico y fijo (PDFs con texto, escaneados e imágenes), generado una vez por sesión
+    directory = tmp_path_factory.mktemp("corpus")
+    generate_corpus(str(directory / "cvs"), count=12, seed=7, duplicates=0.0, max_pages=2)
+    write_job_description(str(directory / "job_description.pdf"))
+    return directory
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch, corpus):
+    # Los scripts escriben outputs, reportes, caché y results.db en el directorio actual
+    shutil.copytree(corpus / "cvs", tmp_path / "cvs")
+    shutil.copy(corpus / "job_description.pdf", tmp_path / "job_description.pdf")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def with_mock(monkeypatch, fast_behaviour):
+    """Corre ``run()`` (una corrutina) con los tres proveedores apuntando a un mock
+    en proceso y devuelve las estadísticas del mock."""
+
+    def run(run, behaviour=None, server_class=MockProviderServer, **server_kwargs):
+        async def main():
+            async with server_class(behaviour=behaviour or fast_behaviour, seed=1, **server_kwargs) as server:
+                for provider in ("openai", "anthropic", "gemini"):
+                    url = server.url + "/v1" if provider == "openai" else server.url
+                    monkeypatch.setenv(f"{provider.upper()}_BASE_URL", url)
+                    monkeypatch.setenv(f"{provider.upper()}_API_KEY", "x")
+                    monkeypatch.setenv(f"{provider.upper()}_RPM", "10000")
+                await run()
+                return server.stats
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,203 @@
+import asyncio
+
+import pytest
+
+from async_engine import AsyncEngine, ProviderError
+from mock_provider import GEMINI_CACHE_PATH, MockProviderServer
+from response_cache import participant_id_for
+from scheduler import MAX_TRANSIENT_RETRIES
+from scoring_prompt import EvaluationStreamParser
+
+MODELS = {
+    "openai": "o4-mini-2025-04-16",
+    "anthropic": "claude-3-5-haiku-20241022",
+    "gemini": "gemini-2.5-flash-preview-04-17",
+}
+PREFIX = "Instrucciones y descripción del puesto, iguales en todos los requests. " * 20
+IDS = [participant_id_for(f"{i:064x}") for i in range(3)]
+
+
+def prompt_parts():
+    return [PREFIX, "\n".join(f"{participant_id} - Currículum de prueba" for participant_id in IDS)]
+
+
+def base_url(provider, server):
+    return server.url + "/v1" if provider == "openai" else server.url
+
+
+class ScriptedServer(MockProviderServer):
+    """Mock que responde con los status de ``failures``, en orden, antes de contestar normalmente."""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = list(failures)
+        self.calls = 0
+
+    async def _dispatch(self, method, path, body):
+        if method == "POST" and not path.startswith(GEMINI_CACHE_PATH):
+            self.calls += 1
+            if self.failures:
+                status = self.failures.pop(0)
+                return status, {"error": {"message": f"falla {status}", "code": status}}, {"retry-after": "0"}
+        return await super()._dispatch(method, path, body)
+
+
+def generate(server, provider="gemini", **kwargs):
+    async def call():
+        async with server:
+            async with AsyncEngine(provider, MODELS[provider], max_in_flight=4, base_url=base_url(provider, server),
+                                   api_key="x") as engine:
+                return engine, await engine.generate(prompt_parts(), **kwargs)
+
+    return asyncio.run(call())
+
+
+@pytest.mark.parametrize("provider", ["gemini", "openai"])
+def test_rate_limits_are_retried(provider, fast_behaviour, no_backoff):
+    server = ScriptedServer([429, 429], behaviour=fast_behaviour, seed=1)
+    engine, completion = generate(server, provider)
+    assert server.calls == 3
+    assert engine.rate_limited == 2
+    assert {e["participant_id"] for e in EvaluationStreamParser().feed(completion.text)} == set(IDS)
+
+
+@pytest.mark.parametrize("on_text", [None, lambda delta: None])
+def test_transient_errors_are_retried(on_text, fast_behaviour, no_backoff):
+    server = ScriptedServer([500, 503, 529], behaviour=fast_behaviour, seed=1)
+    engine, completion = generate(server, on_text=on_text)
+    assert server.calls == 4
+    assert engine.rate_limited == 0
+    assert {e["participant_id"] for e in EvaluationStreamParser().feed(completion.text)} == set(IDS)
+
+
+def test_transient_retries_are_bounded(fast_behaviour, no_backoff):
+    server = ScriptedServer([500] * (MAX_TRANSIENT_RETRIES + 1), behaviour=fast_behaviour, seed=1)
+    with pytest.raises(ProviderError) as error:
+        generate(server)
+    assert error.value.status_code == 500
+    assert server.calls == MAX_TRANSIENT_RETRIES + 1
+
+
+def test_client_errors_are_not_retried(fast_behaviour, no_backoff):
+    server = ScriptedServer([400], behaviour=fast_behaviour, seed=1)
+    with pytest.raises(ProviderError) as error:
+        generate(server)
+    assert error.value.status_code == 400
+    assert server.calls == 1
+
+
+def test_stream_that_already_emitted_text_is_not_retried(fast_behaviour, no_backoff):
+    fast_behaviour["gemini"].update(latency=0.2, stream_cut_rate=1.0)
+    server = MockProviderServer(behaviour=fast_behaviour, seed=1)
+    received = []
+    with pytest.raises(Exception) as error:
+        generate(server, on_text=received.append)
+    # La conexión cortada es un error transitorio, pero el callback ya vio parte del texto
+    assert "RemoteProtocolError" in type(error.value).__name__
+    assert received
+    assert server.stats["streams_cut"] == 1
+    assert server.stats["requests"] == 1
+
+
+def test_cancelled_call_releases_its_slot(fast_behaviour):
+    fast_behaviour["gemini"]["latency"] = 30
+
+    async def scenario():
+        async with MockProviderServer(behaviour=fast_behaviour, seed=1) as server:
+            async with AsyncEngine("gemini", MODELS["gemini"], max_in_flight=2, base_url=server.url,
+                                   api_key="x") as engine:
+                task = asyncio.create_task(engine.generate(prompt_parts()))
+                while server.stats["in_flight"] == 0:
+                    await asyncio.sleep(0.01)
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                return engine
+
+    engine = asyncio.run(scenario())
+    assert engine._in_flight == 0
+    assert engine.completed == 0
+
+
+def test_cancelling_a_run_stops_every_worker(fast_behaviour):
+    fast_behaviour["gemini"]["latency"] = 30
+    started = []
+
+    async def scenario():
+        async with MockProviderServer(behaviour=fast_behaviour, seed=1) as server:
+            async with AsyncEngine("gemini", MODELS["gemini"], max_in_flight=3, base_url=server.url,
+                                   api_key="x") as engine:
+                async def handler(item):
+                    started.append(item)
+                    await engine.generate(prompt_parts())
+
+                run = asyncio.create_task(engine.run(handler, range(10)))
+                while server.stats["in_flight"] == 0:
+                    await asyncio.sleep(0.01)
+                engine.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await run
+                return engine
+
+    engine = asyncio.run(scenario())
+    assert engine._in_flight == 0
+    assert engine._tasks == []
+    assert engine.completed == 0
+    # Cada worker alcanzó a tomar a lo sumo un item antes de la cancelación
+    assert len(started) <= engine.max_in_flight
+
+
+@pytest.mark.parametrize("provider, hits", [
+    # OpenAI y Anthropic escriben el prefijo en el primer request y lo leen en el segundo;
+    # Gemini crea el cachedContent antes del primero, así que los dos leen de caché
+    ("openai", 1),
+    ("anthropic", 1),
+    ("gemini", 2),
+])
+def test_prompt_cache_hits_are_counted_per_provider(provider, hits, fast_behaviour):
+    async def scenario():
+        async with MockProviderServer(behaviour=fast_behaviour, seed=1) as server:
+            async with AsyncEngine(provider, MODELS[provider], max_in_flight=2, base_url=base_url(provider, server),
+                                   api_key="x") as engine:
+                for _ in range(2):
+                    await engine.generate(prompt_parts(), cache_prefix=True)
+                # Sin cache_prefix el request no cuenta para la tasa de aciertos
+                await engine.generate(prompt_parts())
+                return engine
+
+    engine = asyncio.run(scenario())
+    assert engine.cache_requests == 2
+    assert engine.cache_hits == hits
+    assert engine.cached_tokens > 0
+    assert 0 < engine.cache_hit_rate < 1
+
+
+RESERVED_TOKENS = 100_000
+
+
+def budget_after(url, timeout=None):
+    async def scenario():
+        async with AsyncEngine("gemini", MODELS["gemini"], max_in_flight=2, base_url=url, api_key="x",
+                               tpm=1_000_000, **({"timeout": timeout} if timeout else {})) as engine:
+            with pytest.raises(Exception):
+                await engine.generate(prompt_parts(), estimated_tokens=RESERVED_TOKENS)
+            return engine.budget
+
+    budget = asyncio.run(scenario())
+    return budget.tpm - budget._tokens
+
+
+def test_reservation_is_refunded_when_the_request_never_left(no_backoff):
+    # Nadie escucha en el puerto 1: la conexión se rechaza antes de enviar nada
+    assert budget_after("http://127.0.0.1:1") < RESERVED_TOKENS / 2
+
+
+def test_reservation_is_kept_when_the_response_times_out(fast_behaviour, no_backoff):
+    fast_behaviour["gemini"]["latency"] = 5
+
+    async def scenario():
+        async with MockProviderServer(behaviour=fast_behaviour, seed=1) as server:
+            return await asyncio.to_thread(budget_after, server.url, timeout=0.2)
+
+    # Cada intento llegó al proveedor y pudo facturarse: ninguna reserva se devuelve
+    assert asyncio.run(scenario()) > MAX_TRANSIENT_RETRIES * RESERVED_TOKENS
@@ -0,0 +1,62 @@
+import asyncio
+
+from batch_jobs import BatchJobs, LocalBatchService, request_line
+from mock_provider import MockProviderServer
+from response_cache import participant_id_for
+from scoring_prompt import EvaluationStreamParser, build_parts
+
+MODEL = "gemini-2.5-flash-preview-04-17"
+
+
+def make_cvs(count):
+    cvs = []
+    for i in range(count):
+        sha256 = f"{i:064x}"
+        cvs.append({"id": participant_id_for(sha256), "path": f"cvs/cv_{i}.pdf", "filename": f"cv_{i}.pdf",
+                    "sha256": sha256, "cache_key": None, "text": f"Currículum de prueba {i}", "inline_data": None})
+    return cvs
+
+
+def test_local_batch_job_resumes_by_id_after_crash(tmp_path, fast_behaviour, no_backoff):
+    cvs = make_cvs(4)
+    jobs_file = str(tmp_path / "output.batch-jobs.jsonl")
+    directory = str(tmp_path / "batch_jobs")
+
+    def line_for(custom_id, batch):
+        return request_line("gemini", MODEL, custom_id, build_parts("Puesto de prueba", batch))
+
+    async def scenario():
+        async with MockProviderServer(behaviour=fast_behaviour, seed=1) as server:
+            service = LocalBatchService("gemini", MODEL, directory=directory, api_key="x", base_url=server.url)
+            jobs = BatchJobs(service, jobs_file, fresh=True)
+            job_ids = await jobs.submit([cvs[:2], cvs[2:]], line_for)
+            # La corrida se corta entre el envío y la recogida: nada llegó todavía al proveedor
+            jobs.close()
+            await service.close()
+            assert server.stats["requests"] == 0
+
+            service = LocalBatchService("gemini", MODEL, directory=directory, api_key="x", base_url=server.url)
+            jobs = BatchJobs(service, jobs_file)
+            assert list(jobs.jobs) == job_ids
+            # Los CVs del job pendiente no se vuelven a enviar
+            assert jobs.outstanding_sha256() == {cv["sha256"] for cv in cvs}
+            results = []
+            for job_id in job_ids:
+                await jobs.collect(job_id, lambda batch, completion, error: results.append((batch, completion, error)))
+            assert jobs.jobs == {}
+            jobs.close()
+
+            # Ya recogido: una tercera corrida no lo retoma
+            assert BatchJobs(service, jobs_file).jobs == {}
+            await service.close()
+            return job_ids, results, server.stats["requests"]
+
+    job_ids, results, requests = asyncio.run(scenario())
+    assert len(job_ids) == 1
+    assert requests == 2
+    assert [[cv["id"] for cv in batch] for batch, _, _ in results] == [[cv["id"] for cv in cvs[:2]],
+                                                                      [cv["id"] for cv in cvs[2:]]]
+    for batch, completion, error in results:
+        assert error is None
+        evaluations = EvaluationStreamParser().feed(completion.text)
+        assert {e["participant_id"] for e in evaluations} == {cv["id"] for cv in batch}
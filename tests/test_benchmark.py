@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+import benchmark
+from benchmark import _config_from_args, _median, prepare_corpus, print_report, run_suite
+from synthetic_corpus import generate_corpus
+
+
+def digests(directory):
+    return {name: hashlib.sha256((directory / name).read_bytes()).hexdigest() for name in os.listdir(directory)}
+
+
+def test_corpus_is_reproducible_per_seed(tmp_path):
+    kinds = generate_corpus(str(tmp_path / "a"), count=20, seed=4, scanned=0.3, images=0.3, duplicates=0.2,
+                            max_pages=2)
+    assert sum(kinds.values()) == len(os.listdir(tmp_path / "a")) == 20
+    assert all(kinds.values())
+    generate_corpus(str(tmp_path / "b"), count=20, seed=4, scanned=0.3, images=0.3, duplicates=0.2, max_pages=2)
+    assert digests(tmp_path / "a") == digests(tmp_path / "b")
+    # Cada copia es idéntica a un CV del corpus
+    originals = {d for name, d in digests(tmp_path / "a").items() if "_copia" not in name}
+    assert {d for name, d in digests(tmp_path / "a").items() if "_copia" in name} <= originals
+
+
+def test_corpus_is_regenerated_only_when_its_parameters_change(tmp_path):
+    params = {"count": 3, "seed": 1, "max_pages": 1}
+    corpus_dir = prepare_corpus(str(tmp_path), params)
+    assert len(os.listdir(os.path.join(corpus_dir, "cvs"))) == 3
+    assert os.path.exists(os.path.join(corpus_dir, "job_description.pdf"))
+    marker = os.path.join(corpus_dir, "cvs", "marca.txt")
+    open(marker, "w").close()
+    assert prepare_corpus(str(tmp_path), params) == corpus_dir
+    assert os.path.exists(marker)
+    prepare_corpus(str(tmp_path), dict(params, seed=2))
+    assert not os.path.exists(marker)
+
+
+def test_median_of_repeats_keeps_the_worst_exit_code():
+    results = [{"exit_code": 0, "wall_seconds": 3.0, "done": 10},
+               {"exit_code": -9, "wall_seconds": 1.0, "done": 8},
+               {"exit_code": 0, "wall_seconds": 2.0, "done": 9}]
+    assert _median(results) == {"exit_code": 9, "wall_seconds": 2.0, "done": 9}
+
+
+def test_report_marks_changes_against_the_baseline(capsys):
+    result = {"name": "poc_gemini.py", "done": 10, "wall_seconds": 5, "cvs_per_second": 2.0, "exit_code": 0,
+              "api_p95": 1.0, "api_p99": 2.0, "cpu_seconds": 4.0, "max_rss_mb": 100, "mock_requests": 2,
+              "mock_rate_limited": 0, "mock_errors": 0, "mock_max_in_flight": 2}
+    baseline = {"results": [dict(result, cvs_per_second=1.0, api_p95=0.5, cpu_seconds=4.1)]}
+    print_report({"results": [result]}, baseline)
+    out = capsys.readouterr().out
+    assert "cvs_per_second +100.0% ✅" in out
+    assert "api_p95 +100.0% ❌" in out
+    assert "cpu_seconds -2.4%," in out
+
+
+def test_config_from_args_defaults_to_every_entry_point():
+    class Args:
+        config = None
+        script = None
+        count = 5
+        repeat = 2
+
+    config = _config_from_args(Args())
+    assert [run["script"] for run in config["runs"]] == benchmark.ENTRY_POINTS
+    assert (config["corpus"], config["repeat"]) == ({"count": 5}, 2)
+
+
+def test_constants_of_the_script_itself_cannot_be_set(tmp_path):
+    config = {"corpus": {"count": 1, "max_pages": 1},
+              "runs": [{"script": "poc_gemini.py", "set": {"poc_gemini.MAX_IN_FLIGHT": 1}}]}
+    with pytest.raises(ValueError):
+        run_suite(config, str(tmp_path))
+
+
+def test_suite_runs_an_entry_point_against_the_mock(tmp_path):
+    config = {"corpus": {"count": 4, "seed": 5, "duplicates": 0.0, "max_pages": 1},
+              "mock": {"latency": 0.01, "jitter": 0.0, "latency_dist": "fixed"},
+              "runs": [{"script": "poc_gemini.py", "env": {"GEMINI_RPM": 10000},
+                        "set": {"pipeline.MAX_REQUEUE_ROUNDS": 1}}]}
+    report = run_suite(config, str(tmp_path), timeout=300)
+    [result] = report["results"]
+    assert result["exit_code"] == 0, (tmp_path / "runs" / "poc_gemini.py-1" / "output.log").read_text()
+    assert (result["done"], result["failed"]) == (4, 0)
+    assert result["mock_requests"] >= 1 and result["api_calls"] == result["mock_requests"]
+    assert result["cvs_per_second"] > 0 and result["max_rss_mb"] > 0
+    json.dumps(report)
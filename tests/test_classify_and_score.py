@@ -0,0 +1,49 @@
+import importlib
+import json
+
+import pytest
+
+from mock_provider import MOCK_OTHER_JOB_TYPE
+
+TARGET = "Marketing Digital / Performance"
+
+
+@pytest.fixture
+def joint(workdir):
+    # El módulo lee las descripciones de puesto del directorio actual al importarse
+    return importlib.import_module("poc_classify_and_score")
+
+
+def record(job_type, scores):
+    return {"participant_id": "a1", "participant_name": "Ana", "job_type": job_type,
+            "scores": [{"job_id": job_id, "score": score, "reasons": []} for job_id, score in scores]}
+
+
+def test_only_scores_of_descriptions_of_the_cv_job_type_are_kept(joint):
+    row = joint.normalize(record(TARGET, [("job_description", 80), ("otro_puesto", 60)]), "ana.pdf")
+    assert row["filename"] == "ana.pdf" and row["job_type"] == TARGET
+    assert [s["job_id"] for s in row["scores"]] == ["job_description"]
+    assert "scoring_skipped" not in row
+
+
+def test_other_job_types_are_classified_without_a_score(joint):
+    row = joint.normalize(record(MOCK_OTHER_JOB_TYPE, [("job_description", 80)]), "ana.pdf")
+    assert (row["job_type"], row["scores"], row["scoring_skipped"]) == (MOCK_OTHER_JOB_TYPE, [], joint.SKIPPED_REASON)
+    # Un tipo fuera de la lista cuenta como null
+    row = joint.normalize(record("Astronauta", [("job_description", 80)]), "ana.pdf")
+    assert (row["job_type"], row["scores"]) == (None, [])
+
+
+def test_one_call_classifies_and_scores_every_cv(joint, with_mock):
+    stats = with_mock(lambda: joint.main(workers=2))
+    with open(joint.output_json_file, encoding="utf-8") as f:
+        rows = json.load(f)
+    assert len(rows) == len(set(row["filename"] for row in rows)) == 12
+    assert {row["job_type"] for row in rows} <= {TARGET, MOCK_OTHER_JOB_TYPE}
+    for row in rows:
+        assert bool(row["scores"]) == (row["job_type"] == TARGET)
+        assert ("scoring_skipped" in row) == (row["job_type"] != TARGET)
+    # Un solo request por batch: clasificar no agrega llamadas
+    assert stats["requests"] == -(-len(rows) // joint.CV_BATCH_SIZE)
+    with open(joint.token_usage_file, encoding="utf-8") as f:
+        assert {usage["participant_id"] for usage in json.load(f)} == {row["participant_id"] for row in rows}
@@ -0,0 +1,116 @@
+import hashlib
+
+from cv_dedup import DuplicateIndex, minhash_signature
+from response_cache import participant_id_for
+
+TEXT = ("Ana Pérez, analista de marketing digital con cinco años de experiencia en campañas de performance, "
+        "Google Ads, Meta Ads, SEO y analítica web. Lideró la migración a GA4 y redujo el costo por "
+        "adquisición un treinta por ciento. Inglés avanzado, licenciatura en comunicación, Buenos Aires.")
+OTHER = ("Carlos Gómez, desarrollador backend con experiencia en Python, Django, PostgreSQL y Kubernetes. "
+         "Diseñó servicios de pagos de alto volumen y automatizó despliegues con Terraform en AWS. "
+         "Ingeniero en sistemas, inglés intermedio, Córdoba.")
+EVALUATION = {"participant_id": None, "participant_name": "Ana Pérez", "score": 8}
+
+
+def make_doc(name, text, sha256=None):
+    return {"path": f"cvs/{name}", "filename": name, "sha256": sha256 or hashlib.sha256(name.encode()).hexdigest(),
+            "minhash": minhash_signature(text), "dhash": None}
+
+
+class Recorder:
+    def __init__(self):
+        self.copies = []
+        self.failed = []
+
+    def index(self):
+        return DuplicateIndex(lambda member, copy: self.copies.append((member, copy)),
+                              lambda member, error: self.failed.append((member, error)))
+
+
+def evaluation_for(doc):
+    return dict(EVALUATION, participant_id=participant_id_for(doc["sha256"]))
+
+
+def test_exact_duplicate_gets_a_copy_marked_exact():
+    recorder = Recorder()
+    index = recorder.index()
+    original = make_doc("ana.pdf", TEXT)
+    copy = dict(original, path="cvs/otra_carpeta/ana_copia.pdf", filename="ana_copia.pdf")
+    assert index.assign(original) is False
+    assert index.assign(copy) is True
+    index.resolve(original["sha256"], evaluation_for(original))
+    # Mismo contenido, mismo participant_id: el parser decide si su archivo lleva fila propia
+    [(member, row)] = recorder.copies
+    assert member["match"] == "exact"
+    assert member["filename"] == "ana_copia.pdf"
+    assert row["participant_id"] == row["duplicate_of"] == participant_id_for(original["sha256"])
+    assert row["duplicate_match"] == "exact"
+
+
+def test_seeded_representative_delivers_copies_right_away():
+    recorder = Recorder()
+    index = recorder.index()
+    original = make_doc("ana.pdf", TEXT)
+    index.seed(original, evaluation_for(original))
+    assert index.has_result(original["sha256"])
+    edited = make_doc("ana_v2.pdf", TEXT.replace("Buenos Aires.", "Buenos Aires, Argentina."))
+    assert index.assign(edited) is True
+    [(member, row)] = recorder.copies
+    assert member["match"] == "text"
+    assert row["duplicate_of"] == participant_id_for(original["sha256"])
+
+
+def test_near_duplicate_text_gets_a_copy():
+    recorder = Recorder()
+    index = recorder.index()
+    original = make_doc("ana.pdf", TEXT)
+    edited = make_doc("ana_v2.pdf", TEXT.replace("Buenos Aires.", "Buenos Aires, Argentina."))
+    assert index.assign(original) is False
+    assert index.assign(edited) is True
+    assert recorder.copies == []
+    index.resolve(original["sha256"], evaluation_for(original))
+    [(member, row)] = recorder.copies
+    assert member["match"] == "text"
+    assert row["participant_id"] == participant_id_for(edited["sha256"])
+    assert row["duplicate_of"] == participant_id_for(original["sha256"])
+    assert row["duplicate_match"] == "text"
+    assert row["score"] == 8
+    assert index.summary()["duplicates"] == 1
+
+
+def test_late_duplicate_is_copied_immediately():
+    recorder = Recorder()
+    index = recorder.index()
+    original = make_doc("ana.pdf", TEXT)
+    index.assign(original)
+    index.resolve(original["sha256"], evaluation_for(original))
+    late = make_doc("ana_v2.pdf", TEXT + " Disponible de inmediato.")
+    assert index.assign(late) is True
+    [(member, row)] = recorder.copies
+    assert member["sha256"] == late["sha256"]
+    assert row["duplicate_of"] == participant_id_for(original["sha256"])
+
+
+def test_failed_representative_fails_its_near_duplicates_only():
+    recorder = Recorder()
+    index = recorder.index()
+    original = make_doc("ana.pdf", TEXT)
+    exact = dict(original, path="cvs/otra_carpeta/ana.pdf")
+    edited = make_doc("ana_v2.pdf", TEXT + " Disponible de inmediato.")
+    for doc in (original, exact, edited):
+        index.assign(doc)
+    error = ValueError("JSON inválido")
+    index.fail(original["sha256"], error)
+    # El duplicado exacto comparte la entrada del manifest que ya se marcó como fallida
+    assert [(member["sha256"], e) for member, e in recorder.failed] == [(edited["sha256"], error)]
+    assert recorder.copies == []
+    # El grupo se olvida: el próximo duplicado pasa a ser representante
+    assert index.assign(edited) is False
+
+
+def test_distinct_texts_are_not_grouped():
+    recorder = Recorder()
+    index = recorder.index()
+    assert index.assign(make_doc("ana.pdf", TEXT)) is False
+    assert index.assign(make_doc("carlos.pdf", OTHER)) is False
+    assert index.summary()["duplicates"] == 0
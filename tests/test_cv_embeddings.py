@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+
+import cv_embeddings
+from cv_embeddings import EmbeddingIndex, HashingEmbedder, index_documents
+
+JOB = "Analista de marketing digital con campañas de performance, Google Ads y SEO"
+TEXTS = {
+    "marketing.txt": "Especialista en marketing digital: campañas de performance en Google Ads, SEO y Meta Ads.",
+    "datos.txt": "Analista de datos con SQL, Python y tableros de analítica web para campañas.",
+    "backend.txt": "Desarrollador backend en Python, Django, PostgreSQL y Kubernetes sobre AWS.",
+    "contable.txt": "Contadora pública con experiencia en balances, impuestos y auditoría externa.",
+}
+
+
+def write_docs(directory, texts=TEXTS):
+    docs = []
+    for name, text in texts.items():
+        path = directory / name
+        path.write_text(text, encoding="utf-8")
+        docs.append({"path": str(path), "filename": name, "sha256": f"sha-{name}-{len(text)}", "text": text})
+    return docs
+
+
+def test_hashing_embedder_returns_unit_vectors_that_rank_by_overlap():
+    embedder = HashingEmbedder(dim=256)
+    vectors = embedder.embed([JOB] + list(TEXTS.values()) + [""])
+    assert vectors.shape == (6, 256) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors[:-1], axis=1), 1.0)
+    assert not vectors[-1].any()
+    similarities = dict(zip(TEXTS, vectors[1:-1] @ vectors[0]))
+    assert max(similarities, key=similarities.get) == "marketing.txt"
+
+
+def test_index_persists_and_only_appends_new_cvs(tmp_path):
+    docs = write_docs(tmp_path)
+    index = EmbeddingIndex(str(tmp_path / "index"), HashingEmbedder(dim=128))
+    assert index.add(docs[:2]) == 2
+    assert index.add(docs) == 2
+    assert len(index) == 4 and index.contains(docs[0])
+    reopened = EmbeddingIndex(str(tmp_path / "index"), HashingEmbedder(dim=128))
+    assert len(reopened) == 4 and reopened.add(docs) == 0
+    assert reopened.is_indexed(docs[0]["path"])
+    assert np.array_equal(reopened.matrix(), index.matrix())
+    [best] = reopened.search(JOB, k=1)
+    assert best["filename"] == "marketing.txt" and 0 < best["score"] <= 1
+
+
+def test_changed_file_replaces_its_previous_row(tmp_path):
+    docs = write_docs(tmp_path)
+    index = EmbeddingIndex(str(tmp_path / "index"), HashingEmbedder(dim=128))
+    index.add(docs)
+    [edited] = write_docs(tmp_path, {"marketing.txt": "Chef de cocina con experiencia en restaurantes."})
+    assert not index.is_indexed(edited["path"])
+    index.add([edited])
+    assert (index.rows, len(index)) == (5, 4)
+    results = EmbeddingIndex(str(tmp_path / "index"), HashingEmbedder(dim=128)).search(JOB, k=10)
+    assert [r["filename"] for r in results].count("marketing.txt") == 1
+    assert len(results) == 4
+
+
+def test_search_merges_the_top_k_across_chunks(tmp_path, monkeypatch):
+    docs = write_docs(tmp_path)
+    index = EmbeddingIndex(str(tmp_path / "index"), HashingEmbedder(dim=128))
+    index.add(docs)
+    expected = index.search(JOB, k=3)
+    monkeypatch.setattr(cv_embeddings, "SEARCH_CHUNK_ROWS", 1)
+    assert index.search(JOB, k=3) == expected
+    assert [r["score"] for r in expected] == sorted((r["score"] for r in expected), reverse=True)
+
+
+def test_unconfirmed_rows_and_other_backends_are_discarded(tmp_path):
+    docs = write_docs(tmp_path)
+    index = EmbeddingIndex(str(tmp_path / "index"), HashingEmbedder(dim=128))
+    index.add(docs[:2])
+    # Un corte después de escribir la matriz y los IDs pero antes de meta.json
+    meta = json.loads((tmp_path / "index" / "meta.json").read_text())
+    index.add(docs[2:])
+    (tmp_path / "index" / "meta.json").write_text(json.dumps(meta))
+    recovered = EmbeddingIndex(str(tmp_path / "index"), HashingEmbedder(dim=128))
+    assert len(recovered) == 2 and not recovered.contains(docs[3])
+    assert (tmp_path / "index" / "embeddings.f32").stat().st_size == 2 * 128 * 4
+    assert len(EmbeddingIndex(str(tmp_path / "index"), HashingEmbedder(dim=64))) == 0
+
+
+def test_index_documents_skips_cvs_without_a_text_layer(corpus, tmp_path):
+    paths = sorted(str(p) for p in (corpus / "cvs").iterdir())
+    index = EmbeddingIndex(str(tmp_path / "index"), HashingEmbedder(dim=128))
+    added, without_text = index_documents(index, paths, workers=2)
+    assert added == len(index) > 0 and without_text
+    assert added + len(without_text) == len(paths)
+    assert all(index.is_indexed(p) for p in paths if p not in without_text)
@@ -0,0 +1,127 @@
+import base64
+from io import BytesIO
+
+import fitz
+import PIL.Image
+import pytest
+
+from cv_images import (GEMINI_IMAGE_TOKENS, MIN_LEGIBLE_DPI, RENDER_DPI, best_dpi, content_rect, encode_pixmap,
+                       image_tokens, load_image_file, render_pdf_page, to_inline_data, trim_whitespace)
+
+
+def pdf_with_text(text="Ana Pérez - Analista de marketing digital", at=(200, 300)):
+    with fitz.open() as pdf:
+        page = pdf.new_page(width=595, height=842)
+        page.insert_text(at, text, fontsize=11)
+        return pdf.tobytes()
+
+
+def decode(image_bytes):
+    with PIL.Image.open(BytesIO(image_bytes)) as img:
+        img.load()
+        return img
+
+
+@pytest.mark.parametrize("fmt", ["jpeg", "png", "webp"])
+def test_encode_pixmap_matches_the_pixmap(fmt):
+    with fitz.open(stream=pdf_with_text(), filetype="pdf") as pdf:
+        pix = pdf.load_page(0).get_pixmap(dpi=72, alpha=False)
+    img = decode(encode_pixmap(pix, fmt))
+    assert img.format == fmt.upper()
+    assert (img.size, img.mode) == ((pix.width, pix.height), "RGB")
+
+
+def test_encode_pixmap_keeps_grayscale():
+    with fitz.open(stream=pdf_with_text(), filetype="pdf") as pdf:
+        pix = pdf.load_page(0).get_pixmap(dpi=72, colorspace=fitz.csGRAY)
+    assert decode(encode_pixmap(pix)).mode == "L"
+
+
+def test_encode_pixmap_rejects_unknown_formats():
+    with fitz.open(stream=pdf_with_text(), filetype="pdf") as pdf:
+        pix = pdf.load_page(0).get_pixmap(dpi=36)
+    with pytest.raises(ValueError):
+        encode_pixmap(pix, "gif")
+
+
+def test_render_pdf_page_reports_its_stages():
+    timings = {}
+    image_bytes, mime_type, stats = render_pdf_page(pdf_with_text(), timings=timings)
+    assert mime_type == "image/jpeg"
+    assert decode(image_bytes).size == (stats["width"], stats["height"])
+    assert set(timings) == {"render", "encode"}
+    inline = to_inline_data(image_bytes, mime_type)
+    assert inline["mime_type"] == mime_type
+    assert base64.b64decode(inline["data"]) == image_bytes
+
+
+def png(img):
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_image_tokens_follow_each_provider_rule():
+    assert image_tokens("gemini", 1240, 1754) == image_tokens("gemini", 100, 100) == GEMINI_IMAGE_TOKENS
+    # OpenAI: 768 px de lado corto en tiles de 512, más la base
+    assert image_tokens("openai", 512, 512) == 85 + 170
+    assert image_tokens("openai", 1240, 1754) == 85 + 170 * 2 * 3
+    # Anthropic: píxeles / 750 tras encajar en 1568
+    assert image_tokens("anthropic", 750, 100) == 100
+    assert image_tokens("anthropic", 3136, 3136) == image_tokens("anthropic", 1568, 1568)
+
+
+def test_best_dpi_prefers_fewer_tokens_then_more_resolution():
+    # En Gemini todas las resoluciones cuestan lo mismo: gana la más alta
+    assert best_dpi("gemini", 595, 842) == (RENDER_DPI, GEMINI_IMAGE_TOKENS)
+    dpi, tokens = best_dpi("anthropic", 595, 842)
+    assert dpi == MIN_LEGIBLE_DPI
+    assert tokens < image_tokens("anthropic", 595 * RENDER_DPI / 72, 842 * RENDER_DPI / 72)
+
+
+def test_content_rect_crops_the_blank_margins():
+    with fitz.open(stream=pdf_with_text(), filetype="pdf") as pdf:
+        page = pdf.load_page(0)
+        rect = content_rect(page)
+        assert rect.width < page.rect.width / 2 and rect.height < page.rect.height / 10
+        assert rect.contains(fitz.Point(210, 296))
+    with fitz.open() as pdf:
+        blank = pdf.new_page()
+        assert content_rect(blank) == blank.rect
+
+
+def test_cropped_render_costs_fewer_tokens_than_the_full_page():
+    _, _, stats = render_pdf_page(pdf_with_text(), provider="anthropic")
+    assert stats["tokens_saved"] > 0
+    assert stats["image_tokens"] + stats["tokens_saved"] == stats["baseline_tokens"]
+    _, _, full = render_pdf_page(pdf_with_text(), provider="anthropic", crop=False)
+    assert full["width"] > stats["width"]
+
+
+def test_trim_whitespace_keeps_a_margin_around_the_content():
+    img = PIL.Image.new("RGB", (400, 600), "white")
+    img.paste((0, 0, 0), (100, 200, 300, 260))
+    assert trim_whitespace(img, 10).size == (220, 80)
+    assert trim_whitespace(PIL.Image.new("RGB", (50, 50), "white"), 10).size == (50, 50)
+
+
+def test_image_file_that_gains_nothing_is_sent_as_is():
+    img = PIL.Image.new("RGB", (595, 842), "white")
+    img.paste((0, 0, 0), (0, 0, 595, 842))
+    data = png(img)
+    image_bytes, mime_type, stats = load_image_file(data, ".png")
+    assert (image_bytes, mime_type) == (data, "image/png")
+    assert stats["tokens_saved"] == 0
+
+
+def test_image_file_is_cropped_and_reencoded():
+    img = PIL.Image.new("RGB", (1240, 1754), "white")
+    img.paste((0, 0, 0), (300, 300, 900, 500))
+    timings = {}
+    image_bytes, mime_type, stats = load_image_file(png(img), ".png", provider="anthropic", grayscale=True,
+                                                    timings=timings)
+    assert mime_type == "image/jpeg"
+    out = decode(image_bytes)
+    assert out.mode == "L" and out.size == (stats["width"], stats["height"])
+    assert out.width < 700 and stats["tokens_saved"] > 0
+    assert set(timings) == {"render", "encode"}
@@ -0,0 +1,49 @@
+import os
+
+from cv_ingest import batched, iter_cv_documents, load_cv_routed, load_cv_text
+from work_manifest import PathStream
+
+
+def test_page_thumbnail_hash_only_for_cvs_without_a_text_signature(corpus):
+    docs = [load_cv_routed(str(path)) for path in sorted((corpus / "cvs").iterdir())]
+    routes = {doc["route"] for doc in docs}
+    assert routes == {"text", "image"}
+    for doc in docs:
+        if doc["route"] == "text":
+            # Con capa de texto el MinHash alcanza: no se renderiza la miniatura
+            assert doc["minhash"] is not None
+            assert "dhash" not in doc
+        else:
+            assert doc["dhash"] is not None
+            assert os.path.splitext(doc["filename"])[1] in (".pdf", ".png", ".jpg")
+
+
+def test_ingest_stays_within_the_prefetch_window(corpus):
+    paths = sorted(str(path) for path in (corpus / "cvs").iterdir())
+    pulled = []
+
+    def scan():
+        # Como iter_cv_files: las rutas se piden a medida que el pool tiene lugar
+        for path in paths + [str(corpus / "no-existe.pdf")]:
+            pulled.append(path)
+            yield path
+
+    docs = []
+    for doc in iter_cv_documents(scan(), loader=load_cv_text, workers=2, prefetch=3):
+        docs.append(doc)
+        assert len(pulled) - len(docs) <= 3
+    assert sorted(doc["path"] for doc in docs) == sorted(pulled)
+    [missing] = [doc for doc in docs if "error" in doc]
+    assert missing["filename"] == "no-existe.pdf" and "FileNotFoundError" in missing["error"]
+
+
+def test_path_stream_peeks_without_losing_the_first_path():
+    stream = PathStream(iter(["a.pdf", "b.pdf"]))
+    assert stream and stream
+    assert list(stream) == ["a.pdf", "b.pdf"] and stream.count == 2
+    assert not PathStream(iter([]))
+
+
+def test_batched_yields_lists_of_at_most_n():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(batched([], 3)) == []
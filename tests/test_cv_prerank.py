@@ -0,0 +1,72 @@
+from cv_prerank import TARGET_RECALLS, BM25Index, Shortlist, recall_report, tokenize
+from result_sink import read_jsonl
+
+JOB = "Analista de marketing digital: campañas de performance, Google Ads, SEO y analítica web."
+FILLER = " Trabajo en equipo, comunicación y organización con foco en resultados medibles." * 4
+TEXTS = {
+    "marketing.pdf": "Especialista en marketing digital, campañas de performance en Google Ads y SEO." + FILLER,
+    "analitica.pdf": "Analista de datos con experiencia en analítica web y reportes de campañas." + FILLER,
+    "backend.pdf": "Desarrollador backend en Python, Django, PostgreSQL y Kubernetes." + FILLER,
+    "contable.pdf": "Contadora pública con experiencia en balances, impuestos y auditoría." + FILLER,
+}
+
+
+def documents(texts=TEXTS, scanned=()):
+    docs = [{"filename": name, "path": f"cvs/{name}", "sha256": name, "text": text} for name, text in texts.items()]
+    # Un escaneo no trae capa de texto: no se puede rankear
+    docs += [{"filename": name, "path": f"cvs/{name}", "sha256": name, "text": ""} for name in scanned]
+    return docs
+
+
+def test_tokenize_folds_case_and_accents_and_drops_stopwords():
+    assert tokenize("Gestión de la CAMPAÑA en C++ y Node.js") == ["gestion", "campana", "c++", "node.js"]
+
+
+def test_bm25_scores_the_closest_text_first():
+    index = BM25Index(TEXTS.values())
+    scores = dict(zip(TEXTS, index.scores(JOB)))
+    assert max(scores, key=scores.get) == "marketing.pdf"
+    assert scores["contable.pdf"] < scores["analitica.pdf"]
+    assert not BM25Index([]).scores(JOB).size
+
+
+def test_rank_keeps_the_cut_and_lets_unranked_cvs_through():
+    ranking = Shortlist(JOB, top_k=2).rank(documents(scanned=["scan.pdf"]))
+    by_name = {entry["filename"]: entry for entry in ranking}
+    assert [name for name, entry in by_name.items() if entry["rank"] in (1, 2)] == ["marketing.pdf", "analitica.pdf"]
+    assert {name for name, entry in by_name.items() if entry["kept"]} == {"marketing.pdf", "analitica.pdf",
+                                                                           "scan.pdf"}
+    assert by_name["scan.pdf"]["rank"] is None
+
+
+def entry(filename, rank, kept=True, score=None):
+    return {"filename": filename, "rank": rank, "score": score if score is not None else 10.0 - (rank or 0),
+            "kept": kept}
+
+
+def test_recall_report_suggests_the_smallest_cut_for_each_target():
+    ranking = [entry("a", 1), entry("b", 3), entry("c", 8, kept=False), entry("scan", None), entry("otro", 2)]
+    labels = {"a": True, "b": True, "c": True, "scan": True, "otro": False}
+    report = recall_report(ranking, labels)
+    assert (report["labelled"], report["relevant"], report["recall"]) == (5, 4, 0.75)
+    cutoffs = {cut["recall"]: cut for cut in report["suggested_cutoffs"]}
+    assert set(cutoffs) == set(TARGET_RECALLS)
+    # El escaneo pasa siempre: con 4 relevantes, el 90% necesita los tres rankeados
+    assert (cutoffs[0.9]["top_k"], cutoffs[0.9]["min_score"]) == (8, 2.0)
+    assert recall_report(ranking, {"otro": False}) == {"labelled": 1, "relevant": 0}
+
+
+def test_summary_reports_recall_across_passes(tmp_path, capsys):
+    labels = {"marketing.pdf": True, "contable.pdf": True, "backend.pdf": False}
+    ranking_file = str(tmp_path / "ranking.jsonl")
+    shortlist = Shortlist(JOB, top_k=1, labels=labels, ranking_file=ranking_file)
+    for names in (["marketing.pdf", "backend.pdf"], ["contable.pdf", "analitica.pdf"]):
+        shortlist.add(shortlist.rank(documents({name: TEXTS[name] for name in names})))
+    summary = shortlist.summary()
+    assert (summary["documents"], summary["ranked"], summary["kept"]) == (4, 4, 2)
+    # contable.pdf quedó fuera del top 1 de su pasada
+    assert (summary["labels"]["relevant"], summary["labels"]["recall"]) == (2, 0.5)
+    shortlist.print_summary()
+    assert "🎯 Recall sobre 2 CVs relevantes etiquetados" in capsys.readouterr().out
+    shortlist.close()
+    assert [e["rank"] for e in read_jsonl(ranking_file)] == [1, 2, 1, 2]
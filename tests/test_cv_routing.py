@@ -0,0 +1,65 @@
+import threading
+
+from cv_routing import MIN_TEXT_CHARS, RoutingReport, route_for, text_layer_quality
+from result_sink import read_jsonl
+from token_budget import TokenCounter
+
+
+def text_doc(i):
+    return {"filename": f"cv_{i}.pdf", "route": "text", "text": "Analista de marketing " * 20,
+            "image_tokens_estimate": 258, "route_reason": None, "text_quality": None}
+
+
+def image_doc(i):
+    return {"filename": f"scan_{i}.jpg", "route": "image", "route_reason": "sin capa de texto",
+            "image_stats": {"image_tokens": 258, "tokens_saved": 0}}
+
+
+CV_TEXT = ("Ana Pérez. Analista de marketing digital con cinco años de experiencia en campañas de "
+           "performance, Google Ads y analítica web. ") * 5
+
+
+def test_clean_text_layer_goes_as_text():
+    quality = text_layer_quality(CV_TEXT)
+    assert quality["chars"] >= MIN_TEXT_CHARS
+    assert quality["glyph_coverage"] == 1.0 and quality["garbage_ratio"] == 0.0
+    assert route_for(quality) == ("text", None)
+
+
+def test_unusable_text_layers_go_as_images():
+    assert route_for(text_layer_quality("")) == ("image", "sin capa de texto")
+    assert route_for(text_layer_quality("Ana Pérez")) == ("image", "sin capa de texto")
+    assert route_for(text_layer_quality("\ufffd" * MIN_TEXT_CHARS)) == ("image", "glifos sin mapa Unicode")
+    assert route_for(text_layer_quality("Ana ;;; ~~ .. " * 50)) == ("image", "texto ilegible")
+
+
+def test_cheaper_image_wins_only_when_both_costs_are_known():
+    quality = text_layer_quality(CV_TEXT)
+    assert route_for(quality, text_tokens=400, image_tokens=258) == ("image", "imagen más barata que el texto")
+    assert route_for(quality, text_tokens=200, image_tokens=258) == ("text", None)
+    # Un PDF de varias páginas no tiene costo de imagen comparable
+    assert route_for(quality, text_tokens=4000, image_tokens=None) == ("text", None)
+
+
+def test_report_totals_survive_concurrent_records(tmp_path):
+    decisions = str(tmp_path / "routing-decisions.jsonl")
+    report = RoutingReport(TokenCounter("gemini", "gemini-2.5-flash-preview-04-17"), decisions)
+    start = threading.Barrier(8)
+
+    def record(offset):
+        start.wait()
+        for i in range(100):
+            report.record(text_doc(offset + i) if i % 2 else image_doc(offset + i))
+
+    threads = [threading.Thread(target=record, args=(n * 100,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = report.summary()
+    assert summary["documents"] == 800
+    assert summary["text"] == summary["image"] == 400
+    assert summary["image_reasons"] == {"sin capa de texto": 400}
+    report.close()
+    # El detalle se abre una sola vez: no se pierde ninguna decisión
+    assert len(list(read_jsonl(decisions))) == 800
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from async_engine import ProviderError
+from dead_letter import DeadLetter, bisect_batch
+from result_sink import read_jsonl
+
+DOCS = [{"filename": f"cv_{i}.pdf", "path": f"cvs/cv_{i}.pdf", "sha256": f"{i:064x}", "id": f"id{i}"}
+        for i in range(8)]
+BAD = DOCS[5]
+
+
+def bisect(error):
+    calls = []
+    dead = []
+
+    async def attempt(docs):
+        calls.append([doc["id"] for doc in docs])
+        if BAD in docs:
+            raise error
+
+    asyncio.run(bisect_batch(DOCS, attempt, lambda doc, e, batch_size: dead.append((doc, e, batch_size))))
+    return calls, dead
+
+
+@pytest.mark.parametrize("error", [ValueError("JSON inválido"), ProviderError(400, "documento inválido")])
+def test_bisect_isolates_the_bad_document(error):
+    calls, dead = bisect(error)
+    # 8 -> 4 + 4 -> 2 + 2 -> 1 + 1: siete llamadas para aislar un CV entre ocho
+    assert len(calls) == 7
+    assert dead == [(BAD, error, 1)]
+    evaluated = {participant_id for call in calls if BAD["id"] not in call for participant_id in call}
+    assert evaluated == {doc["id"] for doc in DOCS} - {BAD["id"]}
+
+
+@pytest.mark.parametrize("error", [ProviderError(503, "sobrecargado"), ProviderError(401, "sin permiso"),
+                                   TypeError("bug")])
+def test_bisect_fails_the_whole_batch_on_other_errors(error):
+    calls, dead = [], []
+
+    async def attempt(docs):
+        calls.append(docs)
+        raise error
+
+    asyncio.run(bisect_batch(DOCS, attempt, lambda *args: dead.append(args)))
+    # Fallaría igual en cada mitad: no se divide y todos los CVs quedan registrados como fallidos
+    assert len(calls) == 1
+    assert dead == [(doc, error, len(DOCS)) for doc in DOCS]
+
+
+def test_bisect_propagates_cancellation():
+    dead = []
+
+    async def attempt(docs):
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(bisect_batch(DOCS, attempt, lambda *args: dead.append(args)))
+    assert dead == []
+
+
+def test_dead_letter_records_the_error(tmp_path):
+    path = str(tmp_path / "output.dead-letter.jsonl")
+    dead_letter = DeadLetter(path)
+    dead_letter.add(BAD, ProviderError(400, "documento inválido"), batch_size=1)
+    dead_letter.close()
+    [record] = list(read_jsonl(path))
+    assert record["sha256"] == BAD["sha256"]
+    assert record["participant_id"] == BAD["id"]
+    assert record["error_type"] == "ProviderError"
+    assert record["batch_size"] == 1
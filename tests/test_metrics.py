@@ -0,0 +1,106 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import metrics
+from metrics import MAX_SAMPLES, Histogram, MetricsRegistry, serve
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(1, 5, 10))
+    for value in range(1, 101):
+        histogram.observe(value / 10)
+    assert histogram.counts == [10, 40, 50, 0]
+    summary = histogram.summary()
+    assert (summary["count"], summary["sum"], summary["max"]) == (100, 505.0, 10.0)
+    assert (summary["p50"], summary["p95"], summary["p99"]) == (5.05, 9.505, 9.901)
+    assert Histogram().summary()["p50"] is None
+
+
+def test_histogram_keeps_a_bounded_sample():
+    histogram = Histogram()
+    for i in range(MAX_SAMPLES * 2):
+        histogram.observe(i)
+    assert histogram.count == MAX_SAMPLES * 2
+    assert len(histogram.samples) == MAX_SAMPLES
+
+
+def test_prometheus_text_has_every_series():
+    registry = MetricsRegistry()
+    registry.inc("cv_api_requests_total", provider="gemini", outcome="ok")
+    registry.inc("cv_api_requests_total", 2, provider="gemini", outcome="ok")
+    registry.set_gauge("cv_api_in_flight", 3, provider="gemini")
+    registry.observe("cv_stage_seconds", 0.02, stage="read")
+    registry.inc("sin_ayuda", path='C:\\cvs\\"ana".pdf')
+    text = registry.prometheus()
+    assert '# TYPE cv_api_requests_total counter' in text
+    assert 'cv_api_requests_total{outcome="ok",provider="gemini"} 3' in text
+    assert 'cv_api_in_flight{provider="gemini"} 3' in text
+    assert 'cv_stage_seconds_bucket{stage="read",le="0.01"} 0' in text
+    assert 'cv_stage_seconds_bucket{stage="read",le="0.025"} 1' in text
+    assert 'cv_stage_seconds_bucket{stage="read",le="+Inf"} 1' in text
+    assert 'cv_stage_seconds_count{stage="read"} 1' in text
+    assert 'sin_ayuda{path="C:\\\\cvs\\\\\\"ana\\".pdf"} 1' in text
+
+
+def test_counter_total_filters_by_labels():
+    registry = MetricsRegistry()
+    registry.inc("cv_tokens_total", 100, provider="gemini", kind="prompt")
+    registry.inc("cv_tokens_total", 50, provider="openai", kind="prompt")
+    registry.inc("cv_tokens_total", 10, provider="gemini", kind="response")
+    assert registry.counter_total("cv_tokens_total") == 160
+    assert registry.counter_total("cv_tokens_total", kind="prompt") == 150
+    assert registry.counter_total("cv_tokens_total", provider="gemini", kind="response") == 10
+    assert registry.counter_total("no_existe") == 0
+
+
+def test_concurrent_writers_lose_no_counts():
+    registry = MetricsRegistry()
+
+    def work():
+        for _ in range(1000):
+            registry.inc("cv_documents_total", route="text")
+            with registry.timer("cv_stage_seconds", stage="read"):
+                pass
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = registry.summary()
+    assert summary["counters"]["cv_documents_total"] == [{"labels": {"route": "text"}, "value": 8000}]
+    assert summary["histograms"]["cv_stage_seconds"][0]["count"] == 8000
+
+
+def test_flush_writes_both_files(tmp_path, monkeypatch):
+    monkeypatch.delenv(metrics.METRICS_PORT_ENV, raising=False)
+    registry = MetricsRegistry()
+    registry.flush()
+    registry.export_to(str(tmp_path / "metrics.prom"), str(tmp_path / "summary.json"))
+    registry.inc("cv_documents_total", route="image")
+    registry.flush()
+    assert "cv_documents_total{route=\"image\"} 1" in (tmp_path / "metrics.prom").read_text()
+    summary = json.loads((tmp_path / "summary.json").read_text())
+    assert summary["throughput"]["documents_per_second"] > 0
+    assert not (tmp_path / "metrics.prom.tmp").exists()
+
+
+def test_serve_exposes_only_the_metrics_path():
+    registry = MetricsRegistry()
+    registry.inc("cv_api_retries_total", provider="gemini")
+    server = serve(registry, 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert 'cv_api_retries_total{provider="gemini"} 1' in response.read().decode("utf-8")
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url + "/otra")
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
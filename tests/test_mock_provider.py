@@ -0,0 +1,45 @@
+import json
+
+from mock_provider import Replay
+from test_pipeline import corpus_ids, read_output, score
+
+ID = "0f8fad5b-d9cb-469f-a165-70867728950e"
+
+
+def test_replay_only_answers_with_the_recorded_shape(tmp_path):
+    results = tmp_path / "output.json"
+    results.write_text(json.dumps([
+        {"participant_id": ID, "score": 42, "reasons": ["grabado"]},
+        {"participant_id": "joint", "job_type": "Diseño Gráfico", "scores": []},
+        {"filename": "ana.pdf", "job_type": "Psicología"},
+    ]), encoding="utf-8")
+    usage = tmp_path / "token-usage.jsonl"
+    usage.write_text("\n".join(json.dumps(row) for row in [
+        {"participant_id": ID, "prompt_tokens": 1, "response_tokens": 1},
+        {"participant_id": ID, "prompt_tokens": 300, "response_tokens": 40},
+        {"participant_id": "joint", "prompt_tokens": 200, "response_tokens": 60},
+    ]) + "\n", encoding="utf-8")
+    replay = Replay([str(results)], [str(usage)])
+    assert replay.evaluation(ID, joint=False)["score"] == 42
+    assert replay.evaluation(ID, joint=True) is None
+    assert replay.evaluation("joint", joint=True)["job_type"] == "Diseño Gráfico"
+    assert replay.evaluation("joint", joint=False) is None
+    assert replay.classification("ana.pdf")["job_type"] == "Psicología"
+    # Un CV reintentado vale por su último intento; un batch con un CV sin grabar no se reproduce
+    assert replay.tokens([ID, "joint"]) == (500, 100)
+    assert replay.tokens([ID, "otro"]) is None
+
+
+def test_replayed_run_returns_the_recorded_scores(workdir, with_mock):
+    recorded = workdir / "grabado.json"
+    recorded.write_text(json.dumps([{"participant_id": participant_id, "score": 42, "reasons": ["grabado"]}
+                               for participant_id in corpus_ids()]), encoding="utf-8")
+    with_mock(score, replay=Replay([str(recorded)]))
+    rows = read_output()
+    assert sorted(row["participant_id"] for row in rows) == sorted(corpus_ids())
+    assert {(row["score"], tuple(row["reasons"])) for row in rows} == {(42, ("grabado",))}
+
+
+def test_without_replay_scores_are_invented(workdir, with_mock):
+    with_mock(score)
+    assert all(row["reasons"] == ["Evaluación simulada por el servidor mock."] for row in read_output())
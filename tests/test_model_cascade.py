@@ -0,0 +1,54 @@
+import pytest
+
+from model_cascade import UNCERTAINTY_BAND, Cascade, parse_band
+from result_sink import read_jsonl
+
+
+def cv(i, sha256=None):
+    return {"id": f"id{i}", "filename": f"cv_{i}.pdf", "sha256": sha256 or f"{i:08x}" + "0" * 56}
+
+
+def test_from_args_reads_the_review_model_and_band():
+    cascade = Cascade.from_args("openai:o4-mini", "40:60", 0.5)
+    assert (cascade.provider, cascade.model, cascade.band, cascade.sample_rate) == ("openai", "o4-mini", (40, 60),
+                                                                                    0.5)
+    assert Cascade.from_args("anthropic:claude-sonnet-4-0").band == UNCERTAINTY_BAND
+    assert parse_band("0:100") == (0, 100)
+    # La clave de caché cambia con cualquiera de los dos modelos y con la banda
+    assert len({cascade.key("gemini-2.5-flash"), cascade.key("gemini-2.5-pro"),
+                Cascade.from_args("openai:o4-mini", "30:60").key("gemini-2.5-flash")}) == 3
+
+
+@pytest.mark.parametrize("score, escalated", [(34, False), (35, True), (50, True), (70, True), (71, False)])
+def test_only_scores_inside_the_band_escalate(score, escalated):
+    cascade = Cascade("openai", "o4-mini", band=(35, 70))
+    assert cascade.escalate({"score": score}) is escalated
+    assert (cascade.triaged, cascade.escalated) == (1, int(escalated))
+
+
+def test_sample_is_deterministic_per_content():
+    cascade = Cascade("openai", "o4-mini", sample_rate=0.5)
+    assert cascade.sampled(cv(0, "0" * 64)) and not cascade.sampled(cv(0, "f" * 64))
+    sampled = sum(cascade.sampled(cv(i, f"{i * 0x1000000:08x}" + "0" * 56)) for i in range(256))
+    assert sampled == 128
+    assert not Cascade("openai", "o4-mini", sample_rate=0.0).sampled(cv(0, "0" * 64))
+
+
+def test_agreement_is_measured_separately_for_sample_and_escalated_pairs(tmp_path, capsys):
+    pairs_file = str(tmp_path / "pairs.jsonl")
+    cascade = Cascade("openai", "o4-mini", pairs_file=pairs_file)
+    for score in (10, 90, 40, 60):
+        cascade.escalate({"score": score})
+    cascade.record(cv(0), {"score": 10}, {"score": 15}, escalated=False)
+    cascade.record(cv(1), {"score": 90}, {"score": 45}, escalated=False)
+    cascade.record(cv(2), {"score": 40}, {"score": 55}, escalated=True)
+    summary = cascade.summary()
+    assert (summary["triaged"], summary["escalated"], summary["escalation_rate"]) == (4, 2, 0.5)
+    assert summary["agreement_sample"] == {"pairs": 2, "decision_agreement": 0.5, "within_tolerance": 0.5,
+                                           "mean_abs_diff": 25.0}
+    assert summary["agreement_escalated"]["pairs"] == 1
+    assert summary["agreement_escalated"]["decision_agreement"] == 0.0
+    cascade.print_summary()
+    assert "🤝 Acuerdo en la muestra (2 CVs): 50% misma decisión" in capsys.readouterr().out
+    cascade.close()
+    assert [pair["escalated"] for pair in read_jsonl(pairs_file)] == [False, False, True]
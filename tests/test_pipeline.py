@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import shutil
+
+import cv_classifier
+import mock_provider
+from pipeline import MAX_REQUEUE_ROUNDS, BatchResponse
+from response_cache import participant_id_for
+from result_sink import read_jsonl
+from scheduler import MAX_TRANSIENT_RETRIES
+from scoring_prompt import RESPONSE_SCHEMA, EvaluationParser
+from synthetic_corpus import generate_corpus
+from text_scorer import score_text_cvs
+
+MODEL = "gemini-2.5-flash-preview-04-17"
+BATCH = [{"id": f"id{i}", "filename": f"cv_{i}.pdf"} for i in range(3)]
+
+
+def evaluation(participant_id, score=7):
+    return {"participant_id": participant_id, "score": score, "reasons": ["Evaluación de prueba."]}
+
+
+def batch_response(ignored=()):
+    delivered = []
+    response = BatchResponse("batch 1", BATCH, EvaluationParser(), RESPONSE_SCHEMA["items"],
+                             lambda cv, row: delivered.append((cv["id"], row)), ignored=ignored)
+    return response, delivered
+
+
+def test_batch_response_delivers_each_known_id_once(capsys):
+    response, delivered = batch_response()
+    assert response.accept(evaluation(" id0 "))
+    # Un ID repetido conserva la primera evaluación; uno desconocido se descarta
+    assert not response.accept(evaluation("id0", score=1))
+    assert not response.accept(evaluation("otro"))
+    assert response.accept(evaluation("id2"))
+    assert delivered == [("id0", evaluation("id0")), ("id2", evaluation("id2"))]
+    assert response.missing() == [BATCH[1]]
+    out = capsys.readouterr().out
+    assert "'id0'" in out and "'otro'" in out
+
+
+def test_batch_response_drops_invalid_evaluations(capsys):
+    response, delivered = batch_response()
+    assert not response.accept({"participant_id": "id0", "score": "alto", "reasons": []})
+    assert not response.accept({"participant_id": "id1", "reasons": []})
+    assert delivered == []
+    assert response.missing() == BATCH
+    assert "Evaluación inválida" in capsys.readouterr().out
+
+
+def test_batch_response_skips_ignored_ids_silently(capsys):
+    response, delivered = batch_response(ignored=["id1"])
+    assert not response.accept(evaluation("id1"))
+    assert delivered == []
+    assert capsys.readouterr().out == ""
+
+
+def corpus_ids(cv_dir="cvs"):
+    ids = {}
+    for name in sorted(os.listdir(cv_dir)):
+        with open(os.path.join(cv_dir, name), "rb") as f:
+            ids[participant_id_for(hashlib.sha256(f.read()).hexdigest())] = name
+    return ids
+
+
+def drop_evaluations(monkeypatch, should_drop):
+    # Envuelve las respuestas del mock para omitir las evaluaciones que elige cada test
+    fake_evaluations = mock_provider._fake_evaluations
+
+    def dropping(text, rng, replay=None):
+        return [e for e in fake_evaluations(text, rng, replay) if not should_drop(e["participant_id"])]
+
+    monkeypatch.setattr(mock_provider, "_fake_evaluations", dropping)
+
+
+def score(**options):
+    return score_text_cvs("gemini", MODEL, "cvs", "job_description.pdf", "output-gemini.json",
+                          **dict({"max_cvs": 4, "workers": 2}, **options))
+
+
+def read_output():
+    with open("output-gemini.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_missing_evaluations_are_requeued(workdir, with_mock, monkeypatch, capsys):
+    seen = set()
+
+    def first_time(participant_id):
+        # La primera respuesta de cada CV vuelve sin su evaluación: todos pasan a la ronda siguiente
+        first = participant_id not in seen
+        seen.add(participant_id)
+        return first
+
+    drop_evaluations(monkeypatch, first_time)
+    with_mock(score)
+    ids = corpus_ids()
+    assert sorted(row["participant_id"] for row in read_output()) == sorted(ids)
+    out = capsys.readouterr().out
+    assert f"🔁 Reencolando {len(ids)} CVs (ronda 1)" in out
+    assert "Reencolando" not in out.split("(ronda 1)", 1)[1]
+    assert f"🗂️ Manifest: {len(ids)} terminados, 0 fallidos" in out
+
+
+def test_evaluation_that_never_returns_fails_after_the_requeue_rounds(workdir, with_mock, monkeypatch, capsys):
+    ids = corpus_ids()
+    lost = next(iter(ids))
+    drop_evaluations(monkeypatch, lambda participant_id: participant_id == lost)
+    stats = with_mock(score)
+    assert sorted(row["participant_id"] for row in read_output()) == sorted(set(ids) - {lost})
+    [dead] = list(read_jsonl("output-gemini.dead-letter.jsonl"))
+    assert dead["participant_id"] == lost
+    assert dead["error"] == "sin evaluación tras los reintentos"
+    out = capsys.readouterr().out
+    assert f"(ronda {MAX_REQUEUE_ROUNDS})" in out
+    assert f"🗂️ Manifest: {len(ids) - 1} terminados, 1 fallidos" in out
+    # Cada ronda vuelve a mandar solo el CV que falta
+    assert stats["requests"] == len(ids) // 4 + (len(ids) % 4 > 0) + MAX_REQUEUE_ROUNDS
+
+
+def classify():
+    return cv_classifier.main(workers=2)
+
+
+def read_classified():
+    with open(cv_classifier.classified_cvs_file, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_exact_duplicate_gets_its_own_row_where_rows_are_keyed_by_filename(workdir, with_mock, capsys):
+    names = sorted(os.listdir("cvs"))
+    shutil.copy(os.path.join("cvs", names[0]), os.path.join("cvs", "copia_" + names[0]))
+    with_mock(classify)
+    rows = {row["filename"]: row for row in read_classified()}
+    assert sorted(rows) == sorted(names + ["copia_" + names[0]])
+    # La ingesta es concurrente: cualquiera de los dos puede quedar como representante
+    pair = [rows[names[0]], rows["copia_" + names[0]]]
+    assert sorted(row.get("duplicate_match", "") for row in pair) == ["", "exact"]
+    assert pair[0]["job_type"] == pair[1]["job_type"]
+
+    # Una copia que aparece en una corrida posterior también recibe su fila, sin volver a pedirla
+    shutil.copy(os.path.join("cvs", names[1]), os.path.join("cvs", "otra_" + names[1]))
+    stats = with_mock(classify)
+    assert stats["requests"] == 0
+    rows = {row["filename"]: row for row in read_classified()}
+    assert rows["otra_" + names[1]]["job_type"] == rows[names[1]]["job_type"]
+    assert len(rows) == len(names) + 2
+    assert f"🗂️ Manifest: {len(names)} terminados" in capsys.readouterr().out
+
+
+def test_exact_duplicate_adds_no_row_where_rows_are_keyed_by_participant_id(workdir, with_mock):
+    names = sorted(os.listdir("cvs"))
+    shutil.copy(os.path.join("cvs", names[0]), os.path.join("cvs", "copia_" + names[0]))
+    with_mock(score)
+    assert sorted(row["participant_id"] for row in read_output()) == sorted(corpus_ids())
+
+
+def test_cascade_reviews_the_band_with_the_second_model(workdir, with_mock):
+    with_mock(lambda: score(review="openai:gpt-4o-mini", band="0:100"))
+    rows = read_output()
+    assert sorted(row["participant_id"] for row in rows) == sorted(corpus_ids())
+    assert {(row["decided_by"], row["model"]) for row in rows} == {("review", "gpt-4o-mini")}
+    assert all("triage_score" in row for row in rows)
+    with open("cascade-report.json", encoding="utf-8") as f:
+        summary = json.load(f)["summary"]
+    assert summary["escalated"] == summary["triaged"] == len(rows)
+
+
+def test_pass_streams_every_cv_through_a_small_window(workdir, with_mock, capsys):
+    with_mock(lambda: score(prefetch=2, workers=1))
+    ids = corpus_ids()
+    assert sorted(row["participant_id"] for row in read_output()) == sorted(ids)
+    # El JSONL se escribe a medida que llegan las evaluaciones; el array sale de él al final
+    assert list(read_jsonl("output-gemini.jsonl")) == read_output()
+    assert f"🗂️ Manifest: {len(ids)} terminados, 0 fallidos" in capsys.readouterr().out
+
+
+def test_next_run_resumes_and_only_sends_new_cvs(workdir, with_mock, tmp_path, capsys):
+    first = with_mock(score)
+    ids = corpus_ids()
+    assert first["requests"] > 0
+    assert with_mock(score)["requests"] == 0
+    assert f"🗂️ Manifest: {len(ids)} terminados" in capsys.readouterr().out
+
+    generate_corpus(str(tmp_path / "nuevos"), count=1, seed=99, duplicates=0.0, max_pages=1)
+    [new] = os.listdir(tmp_path / "nuevos")
+    shutil.copy(tmp_path / "nuevos" / new, os.path.join("cvs", "nuevo_" + new))
+    assert with_mock(score)["requests"] == 1
+    assert sorted(row["participant_id"] for row in read_output()) == sorted(corpus_ids())
+    assert len(read_output()) == len(ids) + 1
+
+
+def test_a_different_model_starts_fresh_and_keeps_the_previous_output(workdir, with_mock, capsys):
+    with_mock(score)
+    previous = read_output()
+    with_mock(lambda: score_text_cvs("gemini", "gemini-2.5-pro", "cvs", "job_description.pdf", "output-gemini.json",
+                                     max_cvs=4, workers=2))
+    assert sorted(row["participant_id"] for row in read_output()) == sorted(corpus_ids())
+    [rotated] = [name for name in os.listdir() if name.startswith("output-gemini.") and name.endswith(".json")
+                 and name != "output-gemini.json"]
+    with open(rotated, encoding="utf-8") as f:
+        assert json.load(f) == previous
+    assert "guardado como" in capsys.readouterr().out
+
+
+def test_batches_that_keep_failing_are_dead_lettered_without_splitting(workdir, with_mock, fast_behaviour, no_backoff,
+                                                                        capsys):
+    behaviour = {provider: dict(b, error_rate=1.0) for provider, b in fast_behaviour.items()}
+    stats = with_mock(score, behaviour=behaviour)
+    ids = corpus_ids()
+    assert read_output() == []
+    dead = list(read_jsonl("output-gemini.dead-letter.jsonl"))
+    assert sorted(row["participant_id"] for row in dead) == sorted(ids)
+    # Un error transitorio no depende de un CV: el batch falla entero, sin dividirse en mitades
+    assert {row["batch_size"] for row in dead} <= {4}
+    batches = len(ids) // 4 + (len(ids) % 4 > 0)
+    assert stats["requests"] == batches * (MAX_TRANSIENT_RETRIES + 1)
+    assert f"🗂️ Manifest: 0 terminados, {len(ids)} fallidos" in capsys.readouterr().out
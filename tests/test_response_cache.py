@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+
+from response_cache import EVICT_TARGET_RATIO, ResponseCache, hash_text, participant_id_for
+
+EVALUATION = {"participant_id": "a1", "participant_name": "Ana Pérez", "score": 8}
+
+
+def cache_bytes(cache):
+    return sum(os.path.getsize(path) for path in cache._entries())
+
+
+def test_key_changes_with_each_input():
+    key = ResponseCache.key("modelo", "template", "puesto", "cv")
+    assert key == ResponseCache.key("modelo", "template", "puesto", "cv")
+    assert len({key, ResponseCache.key("otro", "template", "puesto", "cv"),
+                ResponseCache.key("modelo", "otro", "puesto", "cv"),
+                ResponseCache.key("modelo", "template", "otro", "cv"),
+                ResponseCache.key("modelo", "template", "puesto", "otro")}) == 5
+
+
+def test_participant_id_is_stable_per_content():
+    assert participant_id_for(hash_text("cv")) == participant_id_for(hash_text("cv"))
+    assert participant_id_for(hash_text("cv")) != participant_id_for(hash_text("otro cv"))
+
+
+def test_get_returns_what_put_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    key = ResponseCache.key("modelo", "template", "puesto", "cv")
+    assert cache.get(key) is None
+    cache.put(key, EVALUATION)
+    assert cache.get(key) == EVALUATION
+    assert (cache.hits, cache.misses) == (1, 1)
+    # El tamaño se recupera al abrir de nuevo el directorio
+    assert ResponseCache(str(tmp_path))._size == cache._size == cache_bytes(cache)
+
+
+def test_corrupt_entry_counts_as_a_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    key = ResponseCache.key("modelo", "template", "puesto", "cv")
+    cache.put(key, EVALUATION)
+    with open(cache._path(key), "w") as f:
+        f.write('{"participant_id": ')
+    assert cache.get(key) is None
+    assert cache.misses == 1
+
+
+def test_eviction_drops_the_least_recently_used(tmp_path):
+    value = {"notes": "x" * 200}
+    # Entran justo diez entradas de ~213 bytes
+    cache = ResponseCache(str(tmp_path), max_bytes=2200)
+    keys = [ResponseCache.key("modelo", "template", "puesto", str(i)) for i in range(10)]
+    for i, key in enumerate(keys):
+        cache.put(key, value)
+        os.utime(cache._path(key), (time.time() - 100 + i, time.time() - 100 + i))
+    # Leer la primera la vuelve la más reciente: el desalojo arranca por la segunda
+    assert cache.get(keys[0]) == value
+    cache.put(ResponseCache.key("modelo", "template", "puesto", "nuevo"), value)
+    assert cache.get(keys[0]) == value
+    assert cache.get(keys[1]) is None
+    assert cache._size == cache_bytes(cache) <= cache.max_bytes * EVICT_TARGET_RATIO
+
+
+def test_concurrent_puts_of_one_key_count_its_size_once(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    key = ResponseCache.key("modelo", "template", "puesto", "cv")
+    start = threading.Barrier(8)
+
+    def put():
+        start.wait()
+        for _ in range(50):
+            cache.put(key, EVALUATION)
+
+    threads = [threading.Thread(target=put) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache._size == cache_bytes(cache)
@@ -0,0 +1,84 @@
+import json
+import os
+
+from result_sink import (DetailLog, JsonlSink, TeeSink, export_json_array, import_json_array, read_jsonl,
+                         rotate_outputs)
+
+ROWS = [{"participant_id": f"id{i}", "participant_name": f"Candidata {i}", "score": i} for i in range(5)]
+
+
+def test_jsonl_sink_appends_across_runs(tmp_path):
+    path = str(tmp_path / "output.jsonl")
+    with JsonlSink(path) as sink:
+        sink.write(ROWS[0])
+        sink.write_many(ROWS[1:3])
+    with JsonlSink(path) as sink:
+        sink.write_many(ROWS[3:])
+    assert list(read_jsonl(path)) == ROWS
+    with JsonlSink(path, truncate=True) as sink:
+        sink.write(ROWS[0])
+    assert list(read_jsonl(path)) == ROWS[:1]
+
+
+def test_truncated_line_from_a_crash_is_skipped_and_not_glued(tmp_path):
+    path = str(tmp_path / "output.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(ROWS[0]) + "\n" + json.dumps(ROWS[1])[:10])
+    with JsonlSink(path) as sink:
+        sink.write(ROWS[2])
+    assert list(read_jsonl(path)) == [ROWS[0], ROWS[2]]
+
+
+def test_export_and_import_round_trip(tmp_path):
+    jsonl = str(tmp_path / "output.jsonl")
+    array = str(tmp_path / "output.json")
+    with JsonlSink(jsonl) as sink:
+        sink.write_many(ROWS)
+    export_json_array(jsonl, array)
+    with open(array, encoding="utf-8") as f:
+        assert json.load(f) == ROWS
+
+    # Un output de antes del JSONL siembra el JSONL una sola vez
+    os.remove(jsonl)
+    import_json_array(array, jsonl)
+    import_json_array(array, jsonl)
+    assert list(read_jsonl(jsonl)) == ROWS
+
+
+def test_export_of_an_empty_run_is_an_empty_array(tmp_path):
+    array = str(tmp_path / "output.json")
+    export_json_array(str(tmp_path / "no-existe.jsonl"), array)
+    with open(array, encoding="utf-8") as f:
+        assert json.load(f) == []
+
+
+def test_rotate_outputs_keeps_the_previous_files(tmp_path):
+    array = tmp_path / "output.json"
+    jsonl = tmp_path / "output.jsonl"
+    array.write_text("[]")
+    jsonl.write_text("")
+    rotate_outputs(str(array), str(jsonl), str(tmp_path / "token-usage.json"))
+    assert not array.exists() and not jsonl.exists()
+    rotated = sorted(p.name for p in tmp_path.iterdir())
+    assert len(rotated) == 2
+    assert rotated[0].startswith("output.") and rotated[0].endswith(".json")
+    assert rotated[1] == rotated[0] + "l"
+
+
+def test_tee_sink_writes_every_sink(tmp_path):
+    paths = [str(tmp_path / "a.jsonl"), str(tmp_path / "b.jsonl")]
+    with TeeSink(*(JsonlSink(path) for path in paths)) as sink:
+        sink.write_many(iter(ROWS))
+    assert [list(read_jsonl(path)) for path in paths] == [ROWS, ROWS]
+
+
+def test_detail_log_without_path_discards_records(tmp_path):
+    log = DetailLog(None)
+    log.write(ROWS[0])
+    log.close()
+    path = str(tmp_path / "detail.jsonl")
+    log = DetailLog(path)
+    assert not os.path.exists(path)
+    log.write(ROWS[0])
+    log.close()
+    assert list(read_jsonl(path)) == [ROWS[0]]
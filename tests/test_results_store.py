@@ -0,0 +1,104 @@
+import hashlib
+import json
+
+from response_cache import participant_id_for
+from results_store import CLASSIFICATION_JOB, ResultsStore
+
+SHAS = [hashlib.sha256(f"cv {i}".encode()).hexdigest() for i in range(4)]
+IDS = [participant_id_for(sha) for sha in SHAS]
+OUTPUT = "output-gemini.json"
+
+
+def open_store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    store.add_documents([{"sha256": sha, "filename": f"cv_{i}.pdf", "path": f"cvs/cv_{i}.pdf"}
+                         for i, sha in enumerate(SHAS)])
+    return store
+
+
+def evaluation(i, score, reasons=("Buena experiencia.",)):
+    return {"participant_id": IDS[i], "participant_name": f"Candidata {i}", "score": score, "reasons": list(reasons)}
+
+
+def test_top_k_follows_the_score_index(tmp_path):
+    with open_store(tmp_path) as store:
+        run_id = store.start_run(OUTPUT)
+        store.add_results(run_id, OUTPUT, [evaluation(i, score) for i, score in enumerate([40, 90, 75, 10])],
+                          job_id="job_description")
+        store.add_results(run_id, "output-openai.json", [evaluation(0, 99)], job_id="job_description")
+        top = store.top_k("job_description", k=2, output=OUTPUT)
+        assert [row["participant_id"] for row in top] == [IDS[1], IDS[2]]
+        assert top[0]["filename"] == "cv_1.pdf" and top[0]["participant_name"] == "Candidata 1"
+        assert top[0]["reasons"] == ["Buena experiencia."]
+        assert [row["score"] for row in store.top_k("job_description", min_score=50)] == [99, 90, 75]
+        assert store.top_k("otro_puesto") == []
+
+
+def test_a_new_evaluation_replaces_the_previous_one_and_its_reasons(tmp_path):
+    with open_store(tmp_path) as store:
+        run_id = store.start_run(OUTPUT)
+        store.add_results(run_id, OUTPUT, [evaluation(0, 40, ["uno", "dos", "tres"])], job_id="job_description")
+        store.add_results(run_id, OUTPUT, [evaluation(0, 80, ["otra"])], job_id="job_description")
+        [row] = store.top_k("job_description")
+        assert (row["score"], row["reasons"]) == (80, ["otra"])
+
+
+def test_files_with_the_same_content_keep_their_own_rows(tmp_path):
+    with open_store(tmp_path) as store:
+        run_id = store.start_run("classified_files.json")
+        rows = [{"filename": "ana.pdf", "participant_name": "Ana", "job_type": "Ventas"},
+                dict(participant_id=IDS[0], filename="ana_copia.pdf", participant_name="Ana", job_type="Ventas",
+                     duplicate_of=IDS[0], duplicate_match="exact")]
+        store.add_results(run_id, "classified_files.json", rows)
+        store.add_results(run_id, "classified_files.json", rows)
+        export = tmp_path / "classified.json"
+        store.export("classified_files.json", str(export))
+        assert json.loads(export.read_text(encoding="utf-8")) == rows
+
+
+def test_joint_rows_store_the_classification_and_one_score_per_job(tmp_path):
+    record = {"participant_id": IDS[2], "participant_name": "Carla", "job_type": "Datos",
+              "scores": [{"job_id": "analista", "score": 70, "reasons": ["SQL"]},
+                         {"job_id": "cientifica", "score": 85, "reasons": []}]}
+    with open_store(tmp_path) as store:
+        run_id = store.start_run("output-joint.json")
+        store.add_results(run_id, "output-joint.json", [record])
+        assert [row["score"] for row in store.top_k("analista")] == [70]
+        assert [row["participant_name"] for row in store.top_k("cientifica")] == ["Carla"]
+        assert store.top_k(CLASSIFICATION_JOB) == []
+        export = tmp_path / "joint.json"
+        store.export("output-joint.json", str(export))
+        assert json.loads(export.read_text(encoding="utf-8")) == [record]
+
+
+def test_usage_by_run_sums_its_rows(tmp_path):
+    with open_store(tmp_path) as store:
+        first = store.start_run(OUTPUT, provider="gemini", model="gemini-2.5-flash")
+        store.add_usage(first, [{"participant_id": IDS[0], "prompt_tokens": 100, "prompt_tokens_cached": 40,
+                                 "response_tokens": 20, "total_tokens": 120},
+                                {"participant_id": IDS[1], "prompt_tokens": 50, "response_tokens": 5,
+                                 "total_tokens": 55}], output="token-usage.json")
+        store.finish_run(first)
+        second = store.start_run(OUTPUT)
+        [first_run, second_run] = store.usage_by_run()
+        assert (first_run["rows"], first_run["prompt_tokens"], first_run["cached_tokens"],
+                first_run["total_tokens"]) == (2, 150, 40, 175)
+        assert first_run["finished_at"] is not None
+        assert (second_run["rows"], second_run["total_tokens"], second_run["finished_at"]) == (0, 0, None)
+        assert store.usage_by_run(second) == [second_run]
+
+
+def test_export_import_round_trip_and_clear(tmp_path):
+    rows = [evaluation(i, 10 * i) for i in range(4)]
+    array = tmp_path / OUTPUT
+    array.write_text(json.dumps(rows), encoding="utf-8")
+    with open_store(tmp_path) as store:
+        run_id, count = store.import_json(str(array), job_id="job_description")
+        assert count == 4
+        exported = tmp_path / "exportado.json"
+        store.export(OUTPUT, str(exported))
+        assert json.loads(exported.read_text(encoding="utf-8")) == rows
+        store.clear(OUTPUT)
+        store.export(OUTPUT, str(exported))
+        assert json.loads(exported.read_text(encoding="utf-8")) == []
+        assert store.usage_by_run(run_id)[0]["script"] == "import"
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from scoring_prompt import RESPONSE_SCHEMA, EvaluationParser, EvaluationStreamParser, build_parts, validate
+
+EVALUATIONS = [
+    {"participant_id": "a1", "participant_name": "Ana {la} \"Negrita\"", "score": 8,
+     "reasons": ["ruta C:\\cvs\\ana.pdf } y un { suelto"]},
+    {"participant_id": "b2", "participant_name": "Beto", "score": 5, "detail": {"nested": {"ok": True}}},
+    {"participant_id": "c3", "participant_name": "Caro", "score": 9, "reasons": ["\\\""]},
+]
+RESPONSE = "```json\n" + json.dumps(EVALUATIONS, ensure_ascii=False, indent=2) + "\n```"
+
+
+def chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(RESPONSE)])
+def test_stream_parser_is_independent_of_chunk_boundaries(size):
+    parser = EvaluationStreamParser()
+    evaluations = []
+    for chunk in chunks(RESPONSE, size):
+        evaluations.extend(parser.feed(chunk))
+    assert evaluations == EVALUATIONS
+
+
+def test_stream_parser_emits_each_object_as_soon_as_it_closes():
+    parser = EvaluationStreamParser()
+    first = json.dumps(EVALUATIONS[0])
+    assert parser.feed("[" + first[:-1]) == []
+    # La llave que cierra el primer objeto basta para entregarlo, sin esperar al resto del array
+    assert parser.feed(first[-1] + ", ") == [EVALUATIONS[0]]
+
+
+def test_stream_parser_drops_a_truncated_object():
+    parser = EvaluationStreamParser()
+    text = json.dumps(EVALUATIONS)
+    assert parser.feed(text[:text.index('"b2"')]) == [EVALUATIONS[0]]
+
+
+def test_stream_parser_reads_loose_objects_between_prose():
+    text = "Acá van:\n" + "\n".join(json.dumps(e) for e in EVALUATIONS) + "\nListo."
+    assert EvaluationStreamParser().feed(text) == EVALUATIONS
+
+
+def test_validate_reports_missing_and_mistyped_fields():
+    schema = RESPONSE_SCHEMA["items"]
+    assert validate({"participant_id": "a1", "score": 8, "reasons": ["ok"]}, schema) == []
+    errors = validate({"participant_id": "a1", "score": True, "reasons": ["ok", 3]}, schema)
+    assert len(errors) == 2
+    assert validate({"participant_id": "a1", "reasons": []}, schema)
+
+
+def test_build_parts_keeps_the_constant_prefix_first():
+    batch = [{"id": "a1", "text": "Currículum de texto", "inline_data": None},
+             {"id": "b2", "text": None, "inline_data": {"mime_type": "image/png", "data": "AAAA"}}]
+    parts = build_parts(None, batch, prompt_base="Instrucciones")
+    assert parts[0] == "Instrucciones"
+    assert "a1 - Currículum de texto" in parts[1]
+    assert {"inline_data": batch[1]["inline_data"]} in parts
+
+
+def test_copy_of_an_exact_duplicate_is_dropped_only_without_a_filename():
+    parser = EvaluationParser()
+    member = {"filename": "copia.pdf"}
+    exact = {"participant_id": "a1", "score": 8, "duplicate_of": "a1", "duplicate_match": "exact"}
+    assert parser.copy(exact, member) is None
+    assert parser.copy(dict(exact, filename="ana.pdf"), member) == dict(exact, filename="copia.pdf")
+    near = dict(exact, participant_id="b2", duplicate_match="text")
+    assert parser.copy(near, member) == near
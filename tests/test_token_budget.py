@@ -0,0 +1,68 @@
+from token_budget import BatchPacker
+
+MODEL = "gemini-2.5-flash-preview-04-17"
+
+
+def make_items(*tokens):
+    return [{"id": f"cv{i}", "tokens": t} for i, t in enumerate(tokens)]
+
+
+def check_batches(packer, batches):
+    for batch in batches:
+        assert len(batch) <= packer.max_cvs
+        if len(batch) > 1:
+            tokens = sum(item["tokens"] for item in batch)
+            assert packer.base_tokens + tokens + len(batch) * packer.response_tokens_per_cv <= packer.context_budget
+
+
+def test_pack_respects_max_cvs_and_budget():
+    packer = BatchPacker(MODEL, base_tokens=2_000, max_cvs=4)
+    items = make_items(*[1_000 + 700 * (i % 5) for i in range(30)])
+    batches = packer.pack(items)
+    check_batches(packer, batches)
+    assert sorted(item["id"] for batch in batches for item in batch) == sorted(item["id"] for item in items)
+    assert len(batches) == 8
+
+
+def test_pack_uses_the_token_budget_when_cvs_are_large():
+    packer = BatchPacker(MODEL, base_tokens=2_000)
+    budget = packer.context_budget
+    batches = packer.pack(make_items(*[budget // 3] * 6))
+    check_batches(packer, batches)
+    assert [len(batch) for batch in batches] == [2, 2, 2]
+
+
+def test_oversized_cv_goes_alone(capsys):
+    packer = BatchPacker(MODEL, base_tokens=2_000)
+    items = make_items(packer.context_budget * 2, 500, 500)
+    batches = packer.pack(items)
+    assert batches[0] == [items[0]]
+    assert [item["id"] for item in batches[1]] == ["cv1", "cv2"]
+    assert "excede el presupuesto" in capsys.readouterr().out
+
+
+def test_iter_batches_yields_every_item_once():
+    packer = BatchPacker(MODEL, base_tokens=2_000, max_cvs=5)
+    items = make_items(*[500 + 900 * (i % 7) for i in range(47)])
+    batches = list(packer.iter_batches(items))
+    check_batches(packer, batches)
+    ids = [item["id"] for batch in batches for item in batch]
+    assert sorted(ids) == sorted(item["id"] for item in items)
+    assert len(ids) == len(set(ids))
+
+
+def test_iter_batches_emits_before_the_input_is_exhausted():
+    packer = BatchPacker(MODEL, base_tokens=2_000, max_cvs=3)
+    consumed = []
+
+    def items():
+        for item in make_items(*[1_000] * 100):
+            consumed.append(item["id"])
+            yield item
+
+    batches = packer.iter_batches(items())
+    first = next(batches)
+    # Un batch lleno sale sin esperar a que termine la ingesta
+    assert len(first) == 3
+    assert len(consumed) == 3
+    assert sum(len(batch) for batch in batches) == 97
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+
+from work_manifest import DONE, FAILED, IN_FLIGHT, MAX_ATTEMPTS, PENDING, WorkManifest
+
+CONTEXT = {"model": "gemini-2.5-flash-preview-04-17", "prompt": "abc"}
+
+
+def make_doc(tmp_path, name, content="contenido"):
+    path = tmp_path / name
+    path.write_text(content)
+    return {"path": str(path), "filename": name, "sha256": hashlib.sha256(content.encode()).hexdigest()}
+
+
+def reopen(path, manifest, context=CONTEXT):
+    manifest.close()
+    return WorkManifest(path, context)
+
+
+def test_replay_keeps_done_and_returns_in_flight_to_pending(tmp_path):
+    path = str(tmp_path / "output.manifest.jsonl")
+    done, cut, waiting = (make_doc(tmp_path, f"cv_{i}.pdf", str(i)) for i in range(3))
+    manifest = WorkManifest(path, CONTEXT)
+    assert manifest.fresh
+    for doc in (done, cut, waiting):
+        manifest.mark_pending(doc)
+    manifest.mark_in_flight(done)
+    manifest.mark_done(done)
+    manifest.mark_in_flight(cut)
+
+    manifest = reopen(path, manifest)
+    assert not manifest.fresh
+    # La corrida se cortó con un CV en vuelo: vuelve a pendiente
+    assert manifest.entries[cut["sha256"]]["state"] == PENDING
+    assert manifest.entries[waiting["sha256"]]["state"] == PENDING
+    assert manifest.is_done(done["sha256"])
+    assert not manifest.should_process(done["sha256"])
+    assert manifest.should_process(cut["sha256"])
+    assert manifest.counts() == {PENDING: 2, IN_FLIGHT: 0, DONE: 1, FAILED: 0, "skipped": 0}
+    manifest.close()
+
+
+def test_failed_cv_gives_up_after_max_attempts(tmp_path):
+    path = str(tmp_path / "output.manifest.jsonl")
+    doc = make_doc(tmp_path, "cv.pdf")
+    manifest = WorkManifest(path, CONTEXT)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        assert manifest.should_process(doc["sha256"])
+        manifest.mark_in_flight(doc)
+        manifest.mark_failed(doc, ValueError("JSON inválido"))
+        manifest = reopen(path, manifest)
+        assert manifest.entries[doc["sha256"]] == {"state": FAILED, "attempts": attempt}
+    assert not manifest.should_process(doc["sha256"])
+    assert list(manifest.filter_paths([doc["path"]])) == []
+    manifest.close()
+
+
+def test_filter_paths_skips_only_unchanged_finished_files(tmp_path):
+    path = str(tmp_path / "output.manifest.jsonl")
+    same, changed, new = (make_doc(tmp_path, f"cv_{i}.pdf", str(i)) for i in range(3))
+    manifest = WorkManifest(path, CONTEXT)
+    manifest.mark_done(same)
+    manifest.mark_done(changed)
+    manifest = reopen(path, manifest)
+
+    with open(changed["path"], "a") as f:
+        f.write(" editado")
+    paths = [same["path"], changed["path"], new["path"]]
+    assert list(manifest.filter_paths(paths)) == [changed["path"], new["path"]]
+    manifest.close()
+
+
+def test_changed_context_starts_fresh(tmp_path):
+    path = str(tmp_path / "output.manifest.jsonl")
+    doc = make_doc(tmp_path, "cv.pdf")
+    manifest = WorkManifest(path, CONTEXT)
+    manifest.mark_done(doc)
+
+    manifest = reopen(path, manifest, context=dict(CONTEXT, prompt="otro"))
+    assert manifest.fresh
+    assert manifest.entries == {}
+    assert manifest.should_process(doc["sha256"])
+    assert list(manifest.filter_paths([doc["path"]])) == [doc["path"]]
+    manifest.close()
+
+
+def test_concurrent_failures_count_every_attempt(tmp_path):
+    path = str(tmp_path / "output.manifest.jsonl")
+    doc = make_doc(tmp_path, "cv.pdf")
+    manifest = WorkManifest(path, CONTEXT, max_attempts=1000)
+    start = threading.Barrier(8)
+
+    def fail():
+        start.wait()
+        for _ in range(25):
+            manifest.mark_failed(doc, "falla")
+
+    threads = [threading.Thread(target=fail) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert manifest.entries[doc["sha256"]]["attempts"] == 200
+    manifest = reopen(path, manifest, context=CONTEXT)
+    assert manifest.entries[doc["sha256"]]["attempts"] == 200
+    manifest.close()
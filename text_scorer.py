@@ -0,0 +1,19 @@
+import asyncio
+import os
+from functools import partial
+
+from cv_ingest import extract_text_from_pdf, load_cv_routed
+from pipeline import run_pipeline
+from scoring_prompt import EvaluationParser, scoring_prompt
+
+
+async def score_text_cvs(provider, model, cv_dir, job_description_file, output_json_file, **kwargs):
+    # Los PDFs con capa de texto usable van como texto y los escaneos como imagen, en el mismo batch
+    job_description = extract_text_from_pdf(job_description_file)
+    prompt = scoring_prompt(job_description, job_id=os.path.splitext(os.path.basename(job_description_file))[0])
+    await run_pipeline(prompt, partial(load_cv_routed, provider=provider), EvaluationParser(),
+                       provider, model, cv_dir, output_json_file, **kwargs)
+
+
+def run_text_scorer(provider, model, cv_dir, job_description_file, output_json_file, **kwargs):
+    asyncio.run(score_text_cvs(provider, model, cv_dir, job_description_file, output_json_file, **kwargs))
@@ -0,0 +1,153 @@
+# Límites por modelo: ventana de contexto, tokens de salida máximos y reserva para
+# razonamiento interno (los modelos "o" de OpenAI lo descuentan del límite de salida).
+MODEL_LIMITS = {
+    "o4-mini-2025-04-16": {"context": 200_000, "output": 100_000, "reasoning_reserve": 16_000},
+    "claude-3-5-haiku-20241022": {"context": 200_000, "output": 8_192, "reasoning_reserve": 0},
+    "gemini-2.5-flash-preview-04-17": {"context": 1_048_576, "output": 65_536, "reasoning_reserve": 8_000},
+}
+DEFAULT_LIMITS = {"context": 128_000, "output": 8_192, "reasoning_reserve": 0}
+
+# Caracteres por token para CVs en español. Gemini está calibrado con token-usage.json
+# (891 tokens estimados con len // 4 contra ~990 reales); Anthropic usa su tokenizer más fino.
+CHARS_PER_TOKEN = {
+    "openai": 3.8,
+    "anthropic": 3.3,
+    "gemini": 3.6,
+}
+
+# Respuesta observada por candidato en token-usage.json (~170-210 tokens) más margen
+RESPONSE_TOKENS_PER_CV = 250
+CONTEXT_FRACTION = 0.5
+OUTPUT_FRACTION = 0.8
+# Batches abiertos a la vez al empaquetar en streaming; los scripts pasan su max_in_flight,
+# así lo retenido (batches abiertos × CVs por batch) alcanza justo para tener la red ocupada
+OPEN_BINS = 4
+
+CALIBRATION_WEIGHT = 0.2
+
+
+def model_limits(model):
+    return MODEL_LIMITS.get(model, DEFAULT_LIMITS)
+
+
+def _tiktoken_encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken descarga el BPE la primera vez; sin red se usa el estimador
+        print(f"⚠️ tiktoken no disponible ({type(e).__name__}); se usa el estimador de tokens")
+        return None
+
+
+class TokenCounter:
+    """Cuenta tokens por proveedor.
+
+    Para OpenAI usa tiktoken si está instalado. Para el resto (o sin tiktoken)
+    usa un estimador de caracteres por token que se recalibra con el uso real
+    que informa cada respuesta.
+    """
+
+    def __init__(self, provider, model):
+        self.provider = provider
+        self._encoding = _tiktoken_encoding(model) if provider == "openai" else None
+        self.chars_per_token = CHARS_PER_TOKEN.get(provider, 4.0)
+
+    @property
+    def exact(self):
+        return self._encoding is not None
+
+    def count(self, text):
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return int(len(text) / self.chars_per_token) + 1
+
+    def observe(self, text_chars, actual_tokens):
+        if self.exact or not text_chars or (actual_tokens or 0) <= 0:
+            return
+        observed = text_chars / actual_tokens
+        self.chars_per_token += CALIBRATION_WEIGHT * (observed - self.chars_per_token)
+
+
+class BatchPacker:
+    """Arma batches de CVs por presupuesto de tokens en lugar de tamaño fijo.
+
+    Cada batch respeta una fracción de la ventana de contexto (prompt base +
+    CVs + respuestas reservadas) y una fracción del límite de salida, dejando
+    ``response_tokens_per_cv`` por candidato para que la respuesta no se corte.
+    ``max_cvs`` limita además la cantidad de CVs por batch (p. ej. imágenes).
+    """
+
+    def __init__(self, model, base_tokens, response_tokens_per_cv=RESPONSE_TOKENS_PER_CV,
+                 context_fraction=CONTEXT_FRACTION, output_fraction=OUTPUT_FRACTION, max_cvs=None):
+        limits = model_limits(model)
+        self.base_tokens = base_tokens
+        self.response_tokens_per_cv = response_tokens_per_cv
+        self.context_budget = int(limits["context"] * context_fraction)
+        output_budget = int(limits["output"] * output_fraction) - limits["reasoning_reserve"]
+        self.max_cvs = max(1, output_budget // response_tokens_per_cv)
+        if max_cvs:
+            self.max_cvs = min(self.max_cvs, max_cvs)
+        self.max_tokens = limits["output"]
+
+    def fits(self, input_tokens, count, tokens):
+        if count + 1 > self.max_cvs:
+            return False
+        total = self.base_tokens + input_tokens + tokens + (count + 1) * self.response_tokens_per_cv
+        return total <= self.context_budget
+
+    def pack(self, items):
+        # First-fit decreasing sobre los tokens de cada CV (item["tokens"])
+        bins = []
+        for item in sorted(items, key=lambda it: it["tokens"], reverse=True):
+            for b in bins:
+                if self.fits(b["tokens"], len(b["items"]), item["tokens"]):
+                    b["items"].append(item)
+                    b["tokens"] += item["tokens"]
+                    break
+            else:
+                if not self.fits(0, 0, item["tokens"]):
+                    print(f"⚠️ CV {item.get('id')} ({item['tokens']} tokens) excede el presupuesto; va solo")
+                bins.append({"items": [item], "tokens": item["tokens"]})
+        return [b["items"] for b in bins]
+
+    def iter_batches(self, items, open_bins=OPEN_BINS):
+        """Empaqueta a medida que llegan los CVs: first-fit sobre hasta
+        ``open_bins`` batches abiertos, y cada batch sale apenas se llena (no
+        le entra un CV de tamaño promedio), sin esperar al resto de la ingesta.
+        Si un CV no entra en ninguno y no se pueden abrir más, sale el más lleno."""
+        bins = []
+        seen = seen_tokens = emitted = 0
+
+        def close(b):
+            nonlocal emitted
+            bins.remove(b)
+            emitted += 1
+            return b["items"]
+
+        for item in items:
+            seen += 1
+            seen_tokens += item["tokens"]
+            target = next((b for b in bins if self.fits(b["tokens"], len(b["items"]), item["tokens"])), None)
+            if target is None:
+                if len(bins) >= open_bins:
+                    yield close(max(bins, key=lambda b: b["tokens"]))
+                if not self.fits(0, 0, item["tokens"]):
+                    print(f"⚠️ CV {item.get('id')} ({item['tokens']} tokens) excede el presupuesto; va solo")
+                target = {"items": [], "tokens": 0}
+                bins.append(target)
+            target["items"].append(item)
+            target["tokens"] += item["tokens"]
+            if not self.fits(target["tokens"], len(target["items"]), seen_tokens / seen):
+                yield close(target)
+
+        for b in sorted(bins, key=lambda b: b["tokens"], reverse=True):
+            yield close(b)
+        if seen:
+            print(f"📦 {seen} CVs empaquetados en {emitted} batches")
@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+from metrics import registry as metrics
+from result_sink import JsonlSink, read_jsonl
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+# Descartado por la preselección local: no se manda al LLM
+SKIPPED = "skipped"
+
+# Un CV que falla se reintenta en las corridas siguientes hasta este número de corridas
+MAX_ATTEMPTS = 3
+WATCH_INTERVAL = 30
+# Un archivo recién copiado puede estar a medio escribir: se espera a que no cambie
+SETTLE_SECONDS = 2
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class WorkManifest:
+    """Estado persistente de cada CV (pending, in_flight, done, failed) por hash
+    de contenido, para que una corrida cortada retome donde quedó.
+
+    Es un log JSONL append-only: cada cambio de estado es una línea y al abrir
+    se reproduce quedándose con la última de cada hash. Los ``in_flight`` de
+    una corrida que se cortó vuelven a ``pending``. ``context`` identifica el
+    trabajo (modelo, prompt, descripción del puesto): si cambia, el manifest
+    arranca de cero y ``fresh`` queda en True.
+    """
+
+    def __init__(self, path, context=None, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.context = context
+        self.max_attempts = max_attempts
+        self.entries = {}
+        # ruta -> [tamaño, mtime] de lo que ya no hay que procesar, para saltearlo sin leerlo
+        self._signatures = {}
+        self._lock = threading.Lock()
+
+        self.fresh = not self._load()
+        self._sink = JsonlSink(path, truncate=self.fresh, stage="manifest")
+        if self.fresh:
+            self._sink.write({"context": context})
+
+    def _load(self):
+        records = read_jsonl(self.path)
+        header = next(records, None)
+        if header is None or header.get("context") != self.context:
+            return False
+        for record in records:
+            entry = self.entries.setdefault(record["sha256"], {"attempts": 0})
+            self._update(entry, record)
+            # Varias rutas pueden tener el mismo contenido: se recuerda la firma de cada una
+            if self._settled(entry) and record.get("signature"):
+                self._signatures[record["path"]] = record["signature"]
+        for entry in self.entries.values():
+            if entry["state"] == IN_FLIGHT:
+                entry["state"] = PENDING
+        return True
+
+    @staticmethod
+    def _update(entry, fields):
+        # En memoria solo el estado y los intentos: el resto (ruta, error, ts) queda en el log
+        if "state" in fields:
+            entry["state"] = fields["state"]
+        if "attempts" in fields:
+            entry["attempts"] = fields["attempts"]
+
+    def _settled(self, entry):
+        return entry["state"] in (DONE, SKIPPED) or (entry["state"] == FAILED and entry["attempts"] >= self.max_attempts)
+
+    def _append(self, sha256, failed=False, **fields):
+        with self._lock:
+            entry = self.entries.setdefault(sha256, {"attempts": 0})
+            if failed:
+                # El intento se cuenta bajo el lock: dos fallas simultáneas del mismo CV no pierden ninguna
+                fields["attempts"] = entry["attempts"] + 1
+            self._update(entry, fields)
+            record = dict(fields, sha256=sha256, ts=time.time())
+            if self._settled(entry) and fields.get("path"):
+                self._signatures[fields["path"]] = fields.get("signature")
+        self._sink.write(record)
+
+    def is_settled(self, path):
+        try:
+            return self._signatures.get(path) == file_signature(path)
+        except OSError:
+            return False
+
+    def is_known(self, path):
+        # Ruta ya terminada en esta corrida o en una anterior, aunque después se haya tocado el archivo
+        with self._lock:
+            return path in self._signatures
+
+    def filter_paths(self, paths):
+        # Los archivos terminados (o que agotaron sus intentos) y sin cambios no se vuelven a leer
+        return (p for p in paths if not self.is_settled(p))
+
+    def is_done(self, sha256):
+        entry = self.entries.get(sha256)
+        return entry is not None and entry["state"] == DONE
+
+    def should_process(self, sha256):
+        entry = self.entries.get(sha256)
+        return entry is None or not self._settled(entry)
+
+    def _doc_fields(self, doc):
+        try:
+            signature = file_signature(doc["path"])
+        except OSError:
+            signature = None
+        return {"path": doc["path"], "filename": doc["filename"], "signature": signature}
+
+    def mark_pending(self, doc):
+        self._append(doc["sha256"], state=PENDING, **self._doc_fields(doc))
+
+    def mark_in_flight(self, doc):
+        self._append(doc["sha256"], state=IN_FLIGHT)
+
+    def mark_done(self, doc):
+        self._append(doc["sha256"], state=DONE, error=None, **self._doc_fields(doc))
+
+    def mark_skipped(self, doc, reason):
+        self._append(doc["sha256"], state=SKIPPED, error=reason, **self._doc_fields(doc))
+
+    def mark_failed(self, doc, error):
+        # Un intento es una corrida que terminó sin resultado para el CV
+        self._append(doc["sha256"], failed=True, state=FAILED, error=str(error), **self._doc_fields(doc))
+
+    def counts(self):
+        with self._lock:
+            counts = {PENDING: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0, SKIPPED: 0}
+            for entry in self.entries.values():
+                counts[entry["state"]] += 1
+        return counts
+
+    def print_summary(self):
+        counts = self.counts()
+        skipped = f", {counts[SKIPPED]} descartados" if counts[SKIPPED] else ""
+        print(f"🗂️ Manifest: {counts[DONE]} terminados, {counts[FAILED]} fallidos, "
+              f"{counts[PENDING] + counts[IN_FLIGHT]} pendientes{skipped}")
+
+    def flush(self):
+        self._sink.flush()
+
+    def close(self):
+        self._sink.close()
+
+
+def run_args(description, shortlist=False, cascade=False, batch=False):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--watch", action="store_true",
+                        help="seguir corriendo y procesar los CVs nuevos o modificados a medida que llegan")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL,
+                        help="segundos entre revisiones de la carpeta en modo --watch")
+    # Pool de ingesta (render, encode, base64) y cuánto se adelanta a las llamadas (ver cv_ingest.py)
+    parser.add_argument("--workers", type=int, help="procesos de ingesta (por defecto, los núcleos menos uno)")
+    parser.add_argument("--prefetch", type=int,
+                        help="documentos que la ingesta procesa por delante de las llamadas (4 por proceso)")
+    if shortlist:
+        # Preselección BM25 contra la descripción del puesto (ver cv_prerank.py)
+        parser.add_argument("--top-k", type=int, help="mandar al LLM solo los K CVs mejor rankeados por pasada")
+        parser.add_argument("--min-score", type=float, help="mandar al LLM solo los CVs con puntaje BM25 >= este valor")
+        parser.add_argument("--labels", dest="labels_file",
+                            help="JSON {archivo: true/false} para medir el recall de la preselección")
+    if cascade:
+        # Cascada de dos modelos (ver model_cascade.py)
+        parser.add_argument("--review", metavar="PROVEEDOR:MODELO",
+                            help="modelo fuerte que reevalúa los puntajes dudosos, p. ej. openai:o4-mini")
+        parser.add_argument("--band", metavar="MIN:MAX", help="banda de puntajes dudosos del triage (35:70 por defecto)")
+        parser.add_argument("--agreement-sample", type=float,
+                            help="fracción de decisiones claras que también se revisan para medir el acuerdo")
+    if batch:
+        # API de batch del proveedor (ver batch_jobs.py)
+        parser.add_argument("--batch", nargs="?", const="provider", choices=["provider", "local"],
+                            help="enviar los batches como un job de la API de batch (mitad de precio, resultados "
+                                 "en horas); 'local' usa el stand-in en archivos de batch_jobs.py")
+    return parser.parse_args()
+
+
+def settled_paths(paths, settle_seconds=SETTLE_SECONDS):
+    now = time.time()
+    for path in paths:
+        try:
+            if now - os.stat(path).st_mtime >= settle_seconds:
+                yield path
+        except OSError:
+            continue
+
+
+class PathStream:
+    """Las rutas de una pasada, consumidas de a una sin armar la lista.
+
+    ``bool()`` mira la primera ruta sin perderla (una pasada vacía no arranca
+    el pipeline) y ``count`` dice cuántas se entregaron, para ``run_passes``.
+    """
+
+    def __init__(self, paths):
+        self._paths = iter(paths)
+        self._head = []
+        self.count = 0
+
+    def __bool__(self):
+        if not self._head:
+            self._head = [path for path in [next(self._paths, None)] if path is not None]
+        return bool(self._head)
+
+    def __iter__(self):
+        while True:
+            if self._head:
+                path = self._head.pop()
+            else:
+                path = next(self._paths, None)
+                if path is None:
+                    return
+            self.count += 1
+            yield path
+
+
+async def run_passes(run_pass, watch=False, interval=WATCH_INTERVAL):
+    """Ejecuta ``await run_pass()`` una vez o, con ``watch``, cada ``interval``
+    segundos. ``run_pass`` devuelve cuántos CVs procesó."""
+    first = True
+    while True:
+        processed = await run_pass()
+        # En modo --watch las métricas quedan al día después de cada pasada
+        metrics.flush()
+        if not watch:
+            return
+        if processed or first:
+            first = False
+            print(f"👀 Esperando CVs nuevos (revisión cada {interval:.0f}s)...")
+        await asyncio.sleep(interval)